@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+'''
+Module with asyncio preference algorithms
+
+Records come from an async iterator (or any iterable) and are read in the
+event loop, the CPU stages run in an executor (loop default executor if
+'executor' is None), so the event loop is not blocked:
+    - Best records are computed by one executor task, so 'executor' may
+      be any concurrent.futures executor (including process pools)
+    - Top-k levels are computed one at a time by executor tasks and each
+      level is yielded when it is ready (levels generators are used, so
+      'executor' must run threads)
+    - Streaming best records are computed by batches of records (see
+      streaming.py), also in a thread executor
+
+Cancelling a task stops it when it awaits, an executor task already
+running ends its level (or batch) but no other one is started. Async
+record sources are closed (aclose()) when records are not read anymore,
+also when the task is cancelled.
+
+AsyncTableReader reads records of SQLite tables by batches fetched in an
+executor (an async data source without other dependencies)
+'''
+
+import asyncio
+import sqlite3
+import threading
+import weakref
+
+from preference.compiled import get_compiled_theory
+from algorithms.planner import BNL_ALGORITHM, PARTITION_ALGORITHM, \
+    MAXPREF_ALGORITHM, get_group_best, get_group_levels
+from algorithms.sqlite_reader import DEFAULT_BATCH_SIZE, TableReader
+from algorithms.streaming import PartitionStream
+
+
+async def aclose_iterator(iterator):
+    '''
+    Close an async iterator (if it has aclose())
+    '''
+    if hasattr(iterator, 'aclose'):
+        await iterator.aclose()
+
+
+async def aiter_records(record_source):
+    '''
+    Generate the records of an async iterator or of an iterable
+    (the async iterator is closed when the generator ends or is closed)
+    '''
+    if hasattr(record_source, '__aiter__'):
+        record_iter = record_source.__aiter__()
+        try:
+            async for rec in record_iter:
+                yield rec
+        finally:
+            await aclose_iterator(record_iter)
+    else:
+        for rec in record_source:
+            yield rec
+
+
+async def collect_records(record_source):
+    '''
+    Get the list of records of an async iterator or of an iterable
+    '''
+    record_iter = aiter_records(record_source)
+    try:
+        return [rec async for rec in record_iter]
+    finally:
+        await record_iter.aclose()
+
+
+async def _get_theory(preference_text, executor):
+    '''
+    Get the compiled theory of a preference text (parsing and compilation
+    run in executor), None is returned for inconsistent theories
+    '''
+    loop = asyncio.get_running_loop()
+    theory = await loop.run_in_executor(executor, get_compiled_theory,
+                                        preference_text)
+    if not theory.is_consistent():
+        return None
+    return theory
+
+
+async def _get_best_async(preference_text, record_source, algorithm,
+                          executor):
+    '''
+    Get best records of an algorithm (computed in executor)
+    '''
+    theory = await _get_theory(preference_text, executor)
+    record_list = await collect_records(record_source)
+    if theory is None:
+        return []
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, get_group_best, theory,
+                                      algorithm, record_list)
+
+
+async def get_best_async(preference_text, record_source, executor=None):
+    '''
+    Get best records according to CPTheory (BNL in executor)
+    '''
+    return await _get_best_async(preference_text, record_source,
+                                 BNL_ALGORITHM, executor)
+
+
+async def get_best_partition_async(preference_text, record_source,
+                                   executor=None):
+    '''
+    Get best records according to CPTheory
+    (partition algorithm in executor)
+    '''
+    return await _get_best_async(preference_text, record_source,
+                                 PARTITION_ALGORITHM, executor)
+
+
+async def get_mbest_partition_async(preference_text, record_source,
+                                    executor=None):
+    '''
+    Get best comparable records according to CPTheory
+    (maxpref partition algorithm in executor)
+    '''
+    return await _get_best_async(preference_text, record_source,
+                                 MAXPREF_ALGORITHM, executor)
+
+
+async def topk_levels_async(preference_text, record_source, k,
+                            algorithm=PARTITION_ALGORITHM, executor=None):
+    '''
+    Generate the levels of records until there are k records
+    (each level is computed by an executor task)
+
+    Records of last level are not cut, so levels may have more than k
+    records
+    '''
+    if k <= 0:
+        return
+    theory = await _get_theory(preference_text, executor)
+    record_list = await collect_records(record_source)
+    if theory is None:
+        return
+    loop = asyncio.get_running_loop()
+    level_iter = get_group_levels(theory, algorithm, record_list)
+    record_number = 0
+    while record_number < k:
+        level = await loop.run_in_executor(executor, next, level_iter, None)
+        if level is None:
+            break
+        record_number += len(level)
+        yield level
+
+
+async def _get_topk_async(preference_text, record_source, k, algorithm,
+                          executor):
+    '''
+    Get top-k records of an algorithm (levels computed in executor)
+    '''
+    topk_list = []
+    async for level in topk_levels_async(preference_text, record_source, k,
+                                         algorithm, executor):
+        topk_list += level
+    return topk_list[:k]
+
+
+async def get_topk_async(preference_text, record_source, k, executor=None):
+    '''
+    Returns the top-k records (BNL levels in executor)
+    '''
+    return await _get_topk_async(preference_text, record_source, k,
+                                 BNL_ALGORITHM, executor)
+
+
+async def get_topk_partition_async(preference_text, record_source, k,
+                                   executor=None):
+    '''
+    Returns the top-k records (partition levels in executor)
+    '''
+    return await _get_topk_async(preference_text, record_source, k,
+                                 PARTITION_ALGORITHM, executor)
+
+
+async def get_mtopk_partition_async(preference_text, record_source, k,
+                                    executor=None):
+    '''
+    Returns the top-k comparable records
+    (maxpref partition levels in executor)
+    '''
+    return await _get_topk_async(preference_text, record_source, k,
+                                 MAXPREF_ALGORITHM, executor)
+
+
+def _add_batch(stream, record_list):
+    '''
+    Add a batch of records to a partition stream
+    (return the confirmed best records)
+    '''
+    best_list = []
+    for rec in record_list:
+        best_list += stream.add(rec)
+    return best_list
+
+
+async def stream_best_partition_async(preference_text, record_source,
+                                      comparable_only=False, executor=None,
+                                      batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Generate best records according to CPTheory by streaming partition
+    algorithm (records are added by batches in executor and best records
+    are yielded as soon as they are confirmed, see streaming.py)
+    '''
+    theory = await _get_theory(preference_text, executor)
+    if theory is None:
+        return
+    loop = asyncio.get_running_loop()
+    stream = PartitionStream(theory, comparable_only)
+    batch = []
+    record_iter = aiter_records(record_source)
+    try:
+        async for rec in record_iter:
+            batch.append(rec)
+            if len(batch) >= batch_size:
+                for best_rec in await loop.run_in_executor(
+                        executor, _add_batch, stream, batch):
+                    yield best_rec
+                batch = []
+    finally:
+        await record_iter.aclose()
+    if batch:
+        for best_rec in await loop.run_in_executor(executor, _add_batch,
+                                                   stream, batch):
+            yield best_rec
+    for best_rec in await loop.run_in_executor(executor, stream.flush):
+        yield best_rec
+
+
+class AsyncTableReader(object):
+    '''
+    Class to read records of a SQLite table asynchronously
+
+    Batches of rows are fetched by executor tasks (see TableReader), use
+    it with 'async with' statement or call aclose() (open batch generators
+    are closed before the connection)
+    '''
+
+    def __init__(self, data_file, table, theory=None,
+                 batch_size=DEFAULT_BATCH_SIZE, executor=None):
+        # Connection is used by executor threads (one at a time)
+        self._connection = sqlite3.connect(data_file,
+                                           check_same_thread=False)
+        self._reader = TableReader(self._connection, table, theory,
+                                   batch_size)
+        self._executor = executor
+        # A cancelled task may close batches while a fetch still runs
+        self._lock = threading.Lock()
+        # Open batch generators (async) and batch iterators of reader
+        self._generator_set = weakref.WeakSet()
+        self._batch_iter_list = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    def __aiter__(self):
+        return self.records()
+
+    def _call(self, function, *argument_list):
+        '''
+        Call a function holding the lock (in executor)
+        '''
+        with self._lock:
+            return function(*argument_list)
+
+    def _open_batches(self):
+        '''
+        Open a batch iterator of reader (holding the lock)
+        '''
+        batch_iter = self._reader.batches()
+        self._batch_iter_list.append(batch_iter)
+        return batch_iter
+
+    def _close_batches(self, batch_iter):
+        '''
+        Close a batch iterator of reader (holding the lock)
+        '''
+        if batch_iter in self._batch_iter_list:
+            self._batch_iter_list.remove(batch_iter)
+            batch_iter.close()
+
+    def _track(self, generator):
+        '''
+        Add a generator to the open batch generators
+        '''
+        self._generator_set.add(generator)
+        return generator
+
+    def batches(self):
+        '''
+        Generate batches of rows (tuples of values in attribute order)
+        '''
+        return self._track(self._batches(False))
+
+    def records(self):
+        '''
+        Generate the records of the table
+        '''
+        return self._track(self._batches(True))
+
+    async def _batches(self, record_flag):
+        '''
+        Generate batches of rows (or their records if 'record_flag' is
+        True) fetched in executor
+        '''
+        loop = asyncio.get_running_loop()
+        attribute_list = self._reader.get_attribute_list()
+        batch_iter = await loop.run_in_executor(self._executor, self._call,
+                                                self._open_batches)
+        try:
+            while True:
+                row_list = await loop.run_in_executor(
+                    self._executor, self._call, next, batch_iter, None)
+                if row_list is None:
+                    break
+                if not record_flag:
+                    yield row_list
+                    continue
+                for row in row_list:
+                    yield dict(zip(attribute_list, row))
+        finally:
+            await loop.run_in_executor(self._executor, self._call,
+                                       self._close_batches, batch_iter)
+
+    def close(self):
+        '''
+        Close batch iterators and the database connection
+        (it waits for a running fetch, use aclose() in the event loop)
+        '''
+        with self._lock:
+            for batch_iter in self._batch_iter_list:
+                batch_iter.close()
+            self._batch_iter_list = []
+            self._connection.close()
+
+    async def aclose(self):
+        '''
+        Close open batch generators and the database connection
+        (the connection is closed in executor)
+        '''
+        for generator in list(self._generator_set):
+            # Generators running in other tasks find their batch iterators
+            # closed (see close)
+            if not generator.ag_running:
+                await generator.aclose()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.close)
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for parallel BNL scaling benchmark
+
+Usage: bench_parallel.py [<records> [<max workers>]]
+Random records of example_soccer (default 2000) are queried by serial BNL
+and by parallel BNL (chunks merged by tree and by a final round) with
+1 to <max workers> worker processes (default is the number of cores).
+Column 'shared' is the tree time with records sent to workers by a shared
+record store instead of pickled
+'''
+
+import os
+import random
+import sys
+import timeit
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Preference file of benchmark
+PREF_FILE_NAME = os.path.join(PATH, 'example_soccer', 'pref1.txt')
+# Default number of records
+RECORD_NUMBER = 2000
+
+
+def random_records(size, seed=0):
+    '''
+    Generate random records of example_soccer
+    '''
+    rand = random.Random(seed)
+    return [{'name': 'player' + str(rand.randint(0, 99)),
+             'function': rand.choice(['attack', 'midfield', 'defense']),
+             'goals': rand.randint(0, 40),
+             'league': rand.choice(['spanish', 'brazilian', 'english'])}
+            for _ in range(size)]
+
+
+if __name__ == '__main__':
+    from algorithms.nested_loops import get_best_and_worst
+    from algorithms.parallel import PartitionPool
+    from preference.compiled import get_compiled_theory
+    if len(sys.argv) > 1:
+        RECORD_NUMBER = int(sys.argv[1])
+    MAX_WORKERS = os.cpu_count() or 1
+    if len(sys.argv) > 2:
+        MAX_WORKERS = int(sys.argv[2])
+    with open(PREF_FILE_NAME) as pref_file:
+        THEORY = get_compiled_theory(pref_file.read())
+    RECORD_LIST = random_records(RECORD_NUMBER)
+    SERIAL_TIME = timeit.timeit(
+        lambda: get_best_and_worst(THEORY, list(RECORD_LIST)), number=1)
+    print('Records: %d, cores: %d' % (RECORD_NUMBER, os.cpu_count() or 1))
+    print('%8s %12s %12s %10s %12s %10s %12s' % ('workers', 'start (s)',
+                                                 'tree (s)', 'speedup',
+                                                 'final (s)', 'speedup',
+                                                 'shared (s)'))
+    print('%8s %12s %12.4f %10.2f %12s %10s %12s' % ('serial', '-',
+                                                     SERIAL_TIME, 1.0, '-',
+                                                     '-', '-'))
+    for worker_number in range(1, MAX_WORKERS + 1):
+        START_TIME = timeit.default_timer()
+        with PartitionPool(THEORY, worker_number) as pool:
+            # First task waits for workers to start
+            pool.bnl_best(RECORD_LIST[:1])
+            START_TIME = timeit.default_timer() - START_TIME
+            TREE_TIME = timeit.timeit(
+                lambda: pool.bnl_best(RECORD_LIST), number=1)
+            FINAL_TIME = timeit.timeit(
+                lambda: pool.bnl_best(RECORD_LIST, tree_merge=False),
+                number=1)
+        with PartitionPool(THEORY, worker_number,
+                           shared_store=True) as pool:
+            pool.bnl_best(RECORD_LIST[:1])
+            SHARED_TIME = timeit.timeit(
+                lambda: pool.bnl_best(RECORD_LIST), number=1)
+        print('%8d %12.4f %12.4f %10.2f %12.4f %10.2f %12.4f' %
+              (worker_number, START_TIME, TREE_TIME,
+               SERIAL_TIME / TREE_TIME, FINAL_TIME,
+               SERIAL_TIME / FINAL_TIME, SHARED_TIME))
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for pipelined reading benchmark
+
+Usage: bench_pipeline.py [<records> [<batch size>]]
+Random records of example_soccer (default 50000) are stored in a temporary
+database and best records are queried by streaming algorithms reading
+batches serially (0 buffers) and by a producer thread (2 buffers)
+'''
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Preference file of benchmark
+PREF_FILE_NAME = os.path.join(PATH, 'example_soccer', 'pref1.txt')
+# Default number of records
+RECORD_NUMBER = 50000
+
+
+def create_database(file_name, record_list):
+    '''
+    Create a database with a table of records
+    '''
+    connection = sqlite3.connect(file_name)
+    attribute_list = list(record_list[0])
+    connection.execute('CREATE TABLE players (' +
+                       ', '.join(attribute_list) + ');')
+    connection.executemany(
+        'INSERT INTO players VALUES (' +
+        ', '.join(['?'] * len(attribute_list)) + ');',
+        [tuple([rec[att] for att in attribute_list])
+         for rec in record_list])
+    connection.commit()
+    connection.close()
+
+
+if __name__ == '__main__':
+    from algorithms.bench_parallel import random_records
+    from algorithms.sqlite_reader import DEFAULT_BATCH_SIZE
+    from algorithms.pipeline import get_best_partition_pipelined, \
+        get_mbest_partition_pipelined, FETCH_TIME_STAT, WAIT_TIME_STAT, \
+        EVALUATION_TIME_STAT, TOTAL_TIME_STAT
+    if len(sys.argv) > 1:
+        RECORD_NUMBER = int(sys.argv[1])
+    BATCH_SIZE = DEFAULT_BATCH_SIZE
+    if len(sys.argv) > 2:
+        BATCH_SIZE = int(sys.argv[2])
+    with open(PREF_FILE_NAME) as pref_file:
+        PREF_TEXT = pref_file.read()
+    DATA_DIR = tempfile.mkdtemp()
+    DATA_FILE = os.path.join(DATA_DIR, 'bench.db3')
+    create_database(DATA_FILE, random_records(RECORD_NUMBER))
+    print('Records: %d, batch size: %d' % (RECORD_NUMBER, BATCH_SIZE))
+    print('%10s %8s %10s %10s %10s %10s %8s' %
+          ('algorithm', 'buffers', 'fetch (s)', 'wait (s)', 'eval (s)',
+           'total (s)', 'best'))
+    try:
+        for NAME, FUNCTION in [('partition', get_best_partition_pipelined),
+                               ('maxpref', get_mbest_partition_pipelined)]:
+            for BUFFER_NUMBER in [0, 2]:
+                STATS = {}
+                BEST_LIST = FUNCTION(PREF_TEXT, DATA_FILE, 'players',
+                                     BATCH_SIZE, BUFFER_NUMBER, STATS)
+                print('%10s %8d %10.4f %10.4f %10.4f %10.4f %8d' %
+                      (NAME, BUFFER_NUMBER, STATS[FETCH_TIME_STAT],
+                       STATS[WAIT_TIME_STAT], STATS[EVALUATION_TIME_STAT],
+                       STATS[TOTAL_TIME_STAT], len(BEST_LIST)))
+    finally:
+        os.remove(DATA_FILE)
+        os.rmdir(DATA_DIR)
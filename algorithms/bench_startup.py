@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for startup time benchmark
+
+Usage: bench_startup.py [<example directory> [<repeat>]]
+Every measure runs in a new interpreter (best of <repeat> runs, default 5):
+    import time of modules of algorithms, preference and grammar packages;
+    first query (import, theory and best records) of an example
+    (default example_soccer) with the preference text parsed by each parser
+    backend and with a precompiled theory artifact
+'''
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+ROOT_PATH = os.path.realpath(os.path.join(PATH, '..'))
+sys.path.append(ROOT_PATH)
+
+# Default example directory
+EXAMPLE_DIR = os.path.join(PATH, 'example_soccer')
+# Default number of runs of each measure
+REPEAT = 5
+# Modules measured
+MODULE_LIST = ['grammar.theory_grammar', 'grammar.descent_grammar',
+               'preference.artifact', 'preference.compiled',
+               'preference.theory', 'algorithms.nested_loops',
+               'algorithms.partition', 'algorithms.maxpref']
+
+# Code to measure import time of a module (argument: module)
+IMPORT_CODE = '''
+import sys, time
+sys.path.append(sys.argv[1])
+start = time.perf_counter()
+__import__(sys.argv[2])
+print('%f %f %d' % (time.perf_counter() - start, 0,
+                    'pyparsing' in sys.modules))
+'''
+
+# Code to measure a first query
+# (arguments: preference file, database script, artifact file or '')
+QUERY_CODE = '''
+import sys, time, sqlite3
+sys.path.append(sys.argv[1])
+con = sqlite3.connect(':memory:')
+con.row_factory = sqlite3.Row
+with open(sys.argv[3]) as sql_file:
+    con.executescript(sql_file.read())
+table = con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+table = table.fetchone()[0]
+record_list = [dict(rec) for rec in con.execute('SELECT * FROM ' + table)]
+with open(sys.argv[2]) as pref_file:
+    preference = pref_file.read()
+start = time.perf_counter()
+from algorithms.partition import get_best_partition
+if sys.argv[4]:
+    from preference.artifact import load_compiled_theory
+    preference = load_compiled_theory(sys.argv[4], preference)
+import_time = time.perf_counter() - start
+get_best_partition(preference, record_list)
+print('%f %f %d' % (import_time, time.perf_counter() - start - import_time,
+                    'pyparsing' in sys.modules))
+'''
+
+
+def run_measure(code, argument_list, repeat, environment=None):
+    '''
+    Run a measure code in new interpreters, return best times
+    (import time, query time) and if pyparsing was imported
+    '''
+    result_list = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', code, ROOT_PATH] + argument_list,
+            env=environment)
+        import_time, query_time, pyparsing = output.split()
+        result_list.append((float(import_time) + float(query_time),
+                            float(import_time), float(query_time),
+                            pyparsing == b'1'))
+    return min(result_list)[1:]
+
+
+def get_environment(backend):
+    '''
+    Get environment with a parser backend
+    '''
+    from grammar.parsers import BACKEND_VARIABLE
+    environment = dict(os.environ)
+    environment[BACKEND_VARIABLE] = backend
+    return environment
+
+
+def print_measure(name, measure):
+    '''
+    Print a measure line
+    '''
+    import_time, query_time, pyparsing = measure
+    print('%-40s %10.2f %10.2f %10s' % (name, import_time * 1000,
+                                        query_time * 1000,
+                                        'yes' if pyparsing else 'no'))
+
+
+if __name__ == '__main__':
+    from grammar.parsers import BACKEND_LIST
+    from preference.artifact import save_compiled_theory
+    from preference.compiled import get_compiled_theory
+    if len(sys.argv) > 1:
+        EXAMPLE_DIR = sys.argv[1]
+    if len(sys.argv) > 2:
+        REPEAT = int(sys.argv[2])
+    PREF_FILE_NAME = os.path.join(EXAMPLE_DIR, 'pref1.txt')
+    SQL_FILE_NAME = os.path.join(EXAMPLE_DIR, 'db.sql')
+    print('%-40s %10s %10s %10s' % ('measure', 'import(ms)', 'query(ms)',
+                                    'pyparsing'))
+    for module in MODULE_LIST:
+        print_measure('import ' + module,
+                      run_measure(IMPORT_CODE, [module], REPEAT))
+    QUERY_ARGUMENT_LIST = [PREF_FILE_NAME, SQL_FILE_NAME]
+    for backend in BACKEND_LIST:
+        print_measure('first query (' + backend + ' parser)',
+                      run_measure(QUERY_CODE, QUERY_ARGUMENT_LIST + [''],
+                                  REPEAT, get_environment(backend)))
+    with open(PREF_FILE_NAME) as pref_file:
+        PREF_TEXT = pref_file.read()
+    ARTIFACT_DIR = tempfile.mkdtemp()
+    ARTIFACT_FILE_NAME = os.path.join(ARTIFACT_DIR, 'pref.cpt')
+    try:
+        save_compiled_theory(get_compiled_theory(PREF_TEXT), PREF_TEXT,
+                             ARTIFACT_FILE_NAME)
+        print_measure('first query (precompiled artifact)',
+                      run_measure(QUERY_CODE,
+                                  QUERY_ARGUMENT_LIST + [ARTIFACT_FILE_NAME],
+                                  REPEAT))
+    finally:
+        os.remove(ARTIFACT_FILE_NAME)
+        os.rmdir(ARTIFACT_DIR)
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+'''
+Module with sharded preference algorithms (coordinator and workers)
+
+Each worker holds a shard of records (pairs (position, record), where
+positions are global row ids). For each query, the coordinator sends the
+compiled theory to every worker and the workers run in three steps:
+    1. Shuffle: records are hashed by group key (values of frozen
+       attributes, see planner.py) and sent to the worker of their hash,
+       so all records that may be compared are in the same worker
+    2. Each worker runs the partition (or maxpref) algorithm over its
+       groups of records
+    3. Workers send back their levels of records (one level for best
+       records) and the coordinator merges them into the global result
+
+Messages are sent by a transport (see SocketTransport and UnixTransport).
+Any object with listen() (returning a listener with accept(), close() and
+an 'address') and connect(address) (returning a connection with send(),
+recv() and close()) may be used as transport.
+Workers may run on other machines (see serve_worker) or as local processes
+(see Coordinator.start_local_workers)
+
+If a worker fails (error, lost connection or no result before the
+coordinator timeout), the coordinator aborts the query on every worker
+(workers waiting for buckets of other workers get an abort message), stops
+the workers and raises the error to the caller
+'''
+
+import multiprocessing
+import os
+import pickle
+import threading
+import timeit
+import traceback
+import zlib
+from multiprocessing.connection import Listener, Client, wait
+
+from preference.compiled import get_compiled_theory
+from algorithms.planner import PARTITION_ALGORITHM, MAXPREF_ALGORITHM, \
+    get_frozen_attributes, get_group_key, group_records, run_best_batch, \
+    run_topk_batch
+from algorithms.parallel import get_chunks
+
+# Messages of protocol
+READY_MESSAGE = 'ready'
+QUERY_MESSAGE = 'query'
+RESULT_MESSAGE = 'result'
+ERROR_MESSAGE = 'error'
+STOP_MESSAGE = 'stop'
+ABORT_MESSAGE = 'abort'
+
+# Default time (seconds) of coordinator waiting for results of workers
+DEFAULT_TIMEOUT = 60.0
+
+# Size of random authentication keys
+AUTHKEY_SIZE = 16
+
+
+class SocketTransport(object):
+    '''
+    Class to represent a transport over TCP sockets
+
+    Workers on other machines must use a transport with the same
+    'authkey' (a random key is generated by default)
+    '''
+
+    def __init__(self, host='localhost', authkey=None):
+        if authkey is None:
+            authkey = os.urandom(AUTHKEY_SIZE)
+        self._host = host
+        self._authkey = authkey
+
+    def listen(self):
+        '''
+        Create a listener (on a free port)
+        '''
+        return Listener((self._host, 0), 'AF_INET', authkey=self._authkey)
+
+    def connect(self, address):
+        '''
+        Connect to the listener of an address
+        '''
+        return Client(address, 'AF_INET', authkey=self._authkey)
+
+
+class UnixTransport(SocketTransport):
+    '''
+    Class to represent a transport over Unix sockets (local workers)
+    '''
+
+    def __init__(self, authkey=None):
+        SocketTransport.__init__(self, None, authkey)
+
+    def listen(self):
+        '''
+        Create a listener (on a temporary file)
+        '''
+        return Listener(family='AF_UNIX', authkey=self._authkey)
+
+    def connect(self, address):
+        '''
+        Connect to the listener of an address
+        '''
+        return Client(address, 'AF_UNIX', authkey=self._authkey)
+
+
+def get_stable_hash(group_key):
+    '''
+    Get a hash of a group key that is the same in every process
+    (hash() of strings changes among processes)
+
+    Numbers are converted to float, so equal keys have equal hashes
+    '''
+    value_list = [float(value) if isinstance(value, (int, float)) else value
+                  for value in group_key]
+    return zlib.crc32(repr(value_list).encode('utf-8'))
+
+
+def get_buckets(theory, pair_list, bucket_number):
+    '''
+    Split pairs (position, record) in buckets by hash of group key
+    '''
+    bucket_list = [[] for _ in range(bucket_number)]
+    if not pair_list:
+        return bucket_list
+    attribute_list = get_frozen_attributes(theory, [pair_list[0][1]])
+    for pair in pair_list:
+        group_key = get_group_key(pair[1], attribute_list)
+        bucket_list[get_stable_hash(group_key) % bucket_number].append(pair)
+    return bucket_list
+
+
+def shuffle(theory, worker_id, pair_list, address_list, listener,
+            transport, query_id):
+    '''
+    Exchange records among workers by group key
+
+    Each worker sends a bucket to each other worker and receives a bucket
+    from each other worker (by a thread, so sending does not block
+    receiving). Return the pairs of worker in position order
+
+    Messages are pairs (query id, bucket), messages of other queries are
+    discarded and an abort message of the coordinator stops receiving
+    '''
+    bucket_list = get_buckets(theory, pair_list, len(address_list))
+    received_list = []
+    error_list = []
+
+    def receive():
+        '''
+        Receive the buckets of other workers
+        '''
+        try:
+            received_number = 0
+            while received_number < len(address_list) - 1:
+                connection = listener.accept()
+                try:
+                    message_id, bucket = connection.recv()
+                finally:
+                    connection.close()
+                if message_id != query_id:
+                    # Late message of an aborted query
+                    continue
+                if bucket == ABORT_MESSAGE:
+                    raise RuntimeError('Query aborted by coordinator')
+                received_list.extend(bucket)
+                received_number += 1
+        except Exception as error:  # IGNORE:broad-except
+            error_list.append(error)
+
+    thread = threading.Thread(target=receive)
+    thread.start()
+    try:
+        for peer_id, address in enumerate(address_list):
+            if peer_id != worker_id:
+                connection = transport.connect(address)
+                try:
+                    connection.send((query_id, bucket_list[peer_id]))
+                finally:
+                    connection.close()
+    finally:
+        thread.join()
+    if error_list:
+        raise error_list[0]
+    local_list = bucket_list[worker_id] + received_list
+    local_list.sort(key=lambda pair: pair[0])
+    return local_list
+
+
+def run_worker_query(theory, pair_list, algorithm, k):
+    '''
+    Get the levels (lists of pairs (position, record)) of the records of
+    a worker after shuffle (only best records if k is None)
+    '''
+    record_list = [rec for _, rec in pair_list]
+    batch = [[pair_list[position] for position in group]
+             for group in group_records(theory, record_list)]
+    record_dict = dict(pair_list)
+    if k is None:
+        level_list = [run_best_batch(theory, batch, algorithm)]
+    else:
+        level_list = run_topk_batch(theory, batch, algorithm, k)
+    return [[(position, record_dict[position]) for position in level]
+            for level in level_list]
+
+
+def serve_worker(worker_id, coordinator_address, transport, pair_list):
+    '''
+    Run a worker holding a shard of pairs (position, record) until the
+    coordinator stops it (worker ids are 0, 1, ..., number of workers - 1)
+
+    The worker also stops if the connection to coordinator is lost
+    '''
+    listener = transport.listen()
+    connection = transport.connect(coordinator_address)
+    try:
+        connection.send((READY_MESSAGE, worker_id, listener.address))
+        while True:
+            message = connection.recv()
+            if message[0] == STOP_MESSAGE:
+                break
+            _, query_id, theory_bytes, algorithm, k, address_list = message
+            try:
+                theory = pickle.loads(theory_bytes)
+                local_list = shuffle(theory, worker_id, pair_list,
+                                     address_list, listener, transport,
+                                     query_id)
+                reply = (RESULT_MESSAGE,
+                         run_worker_query(theory, local_list, algorithm, k))
+            except Exception:  # IGNORE:broad-except
+                reply = (ERROR_MESSAGE, traceback.format_exc())
+            connection.send(reply)
+    except (EOFError, OSError):
+        # Coordinator stopped (failed query)
+        pass
+    finally:
+        connection.close()
+        listener.close()
+
+
+def send_abort(transport, address, query_id):
+    '''
+    Send the abort message of a query to the listener of a worker
+    (errors are ignored, the worker may have stopped)
+    '''
+    try:
+        connection = transport.connect(address)
+        try:
+            connection.send((query_id, ABORT_MESSAGE))
+        finally:
+            connection.close()
+    except Exception:  # IGNORE:broad-except
+        pass
+
+
+def merge_level_pairs(result_list, k=None):
+    '''
+    Merge levels (lists of pairs (position, record)) of workers
+    (pairs of a level are returned in position order, all levels are
+    returned if k is None)
+    '''
+    level_list = []
+    for worker_level_list in result_list:
+        for index, level in enumerate(worker_level_list):
+            if index == len(level_list):
+                level_list.append([])
+            level_list[index] += level
+    pair_list = []
+    for level in level_list:
+        if k is not None and len(pair_list) >= k:
+            break
+        pair_list += sorted(level, key=lambda pair: pair[0])
+    return pair_list if k is None else pair_list[:k]
+
+
+class Coordinator(object):
+    '''
+    Class to represent the coordinator of sharded queries
+
+    Workers connect to the coordinator address, they may be started as
+    local processes (start_local_workers) or run elsewhere by serve_worker
+    (accept_workers waits for them). Use it with 'with' statement or call
+    close() to stop workers
+
+    A query fails if some worker does not send its result in 'timeout'
+    seconds (None waits forever), failed queries close the coordinator
+    '''
+
+    def __init__(self, transport=None, timeout=DEFAULT_TIMEOUT):
+        if transport is None:
+            transport = SocketTransport()
+        self._transport = transport
+        self._timeout = timeout
+        # Id of last query (late messages of other queries are discarded)
+        self._query_id = 0
+        self._listener = transport.listen()
+        # Connections and peer addresses of workers (by worker id)
+        self._connection_list = []
+        self._address_list = []
+        self._process_list = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_):
+        self.close()
+
+    def get_address(self):
+        '''
+        Get the address of coordinator (for workers)
+        '''
+        return self._listener.address
+
+    def get_worker_number(self):
+        '''
+        Get the number of workers
+        '''
+        return len(self._connection_list)
+
+    def start_local_workers(self, shard_list):
+        '''
+        Start a worker process for each shard (list of pairs
+        (position, record)) and wait for them
+        '''
+        for worker_id, shard in enumerate(shard_list):
+            process = multiprocessing.Process(
+                target=serve_worker,
+                args=(worker_id, self.get_address(), self._transport, shard))
+            process.daemon = True
+            process.start()
+            self._process_list.append(process)
+        self.accept_workers(len(shard_list))
+
+    def accept_workers(self, worker_number):
+        '''
+        Wait for workers to connect
+        '''
+        worker_dict = {}
+        for _ in range(worker_number):
+            connection = self._listener.accept()
+            _, worker_id, address = connection.recv()
+            worker_dict[worker_id] = (connection, address)
+        if sorted(worker_dict) != list(range(worker_number)):
+            raise ValueError('Invalid worker ids: ' + str(sorted(worker_dict)))
+        for worker_id in range(worker_number):
+            connection, address = worker_dict[worker_id]
+            self._connection_list.append(connection)
+            self._address_list.append(address)
+
+    def _query(self, theory, algorithm, k):
+        '''
+        Run a query in all workers and get their levels
+        (the query is aborted if a worker fails)
+        '''
+        if not self._connection_list:
+            raise RuntimeError('Coordinator without workers')
+        self._query_id += 1
+        message = (QUERY_MESSAGE, self._query_id,
+                   pickle.dumps(theory, pickle.HIGHEST_PROTOCOL),
+                   algorithm, k, self._address_list)
+        result_dict = {}
+        error = None
+        for worker_id, connection in enumerate(self._connection_list):
+            try:
+                connection.send(message)
+            except OSError:
+                error = 'Lost connection to worker %d' % worker_id
+                break
+        pending_list = list(self._connection_list)
+        start_time = timeit.default_timer()
+        while pending_list and error is None:
+            timeout = None
+            if self._timeout is not None:
+                timeout = max(0.0, start_time + self._timeout -
+                              timeit.default_timer())
+            ready_list = wait(pending_list, timeout)
+            if not ready_list:
+                error = 'No result of %d workers in %s seconds' % \
+                    (len(pending_list), self._timeout)
+            for connection in ready_list:
+                pending_list.remove(connection)
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    error = 'Lost connection to worker %d' % \
+                        self._connection_list.index(connection)
+                    break
+                if message[0] == ERROR_MESSAGE:
+                    error = message[1]
+                    break
+                result_dict[connection] = message[1]
+        if error is not None:
+            self._abort()
+            raise RuntimeError('Worker error:\n' + error)
+        return [result_dict[connection]
+                for connection in self._connection_list]
+
+    def _abort(self):
+        '''
+        Abort the current query on every worker and stop workers
+        '''
+        for address in self._address_list:
+            # Workers not waiting for buckets do not accept (so threads)
+            thread = threading.Thread(
+                target=send_abort,
+                args=(self._transport, address, self._query_id))
+            thread.daemon = True
+            thread.start()
+        self.close()
+
+    def best(self, theory, algorithm=PARTITION_ALGORITHM):
+        '''
+        Get the pairs (position, record) of best records
+        (in position order)
+        '''
+        return merge_level_pairs(self._query(theory, algorithm, None))
+
+    def topk(self, theory, k, algorithm=PARTITION_ALGORITHM):
+        '''
+        Get the pairs (position, record) of top-k records
+        (records of a level are in position order)
+        '''
+        if k <= 0:
+            return []
+        return merge_level_pairs(self._query(theory, algorithm, k), k)
+
+    def close(self):
+        '''
+        Stop workers
+        '''
+        for connection in self._connection_list:
+            try:
+                connection.send((STOP_MESSAGE,))
+            except (OSError, EOFError):
+                pass
+            connection.close()
+        self._connection_list = []
+        self._address_list = []
+        for process in self._process_list:
+            process.join(self._timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._process_list = []
+        self._listener.close()
+
+
+def get_shards(record_list, shard_number):
+    '''
+    Split records in shards of consecutive pairs (position, record)
+    '''
+    return [[(position, record_list[position]) for position in chunk]
+            for chunk in get_chunks(record_list, shard_number)]
+
+
+def _run_distributed(preference_text, record_list, worker_number,
+                     transport, function):
+    '''
+    Run a function over a coordinator with local workers holding shards
+    of records and map result pairs to input records
+    (an empty list is returned for inconsistent theories)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    if worker_number is None:
+        worker_number = os.cpu_count() or 1
+    with Coordinator(transport) as coordinator:
+        coordinator.start_local_workers(get_shards(record_list,
+                                                   worker_number))
+        pair_list = function(coordinator, theory)
+    return [record_list[position] for position, _ in pair_list]
+
+
+def get_best_partition_distributed(preference_text, record_list,
+                                   worker_number=None, transport=None):
+    '''
+    Get best records according to CPTheory
+    (partition algorithm in sharded workers)
+    '''
+    return _run_distributed(preference_text, record_list, worker_number,
+                            transport,
+                            lambda coordinator, theory:
+                            coordinator.best(theory))
+
+
+def get_topk_partition_distributed(preference_text, record_list, k,
+                                   worker_number=None, transport=None):
+    '''
+    Returns the top-k records (partition algorithm in sharded workers)
+    '''
+    return _run_distributed(preference_text, record_list, worker_number,
+                            transport,
+                            lambda coordinator, theory:
+                            coordinator.topk(theory, k))
+
+
+def get_mbest_partition_distributed(preference_text, record_list,
+                                    worker_number=None, transport=None):
+    '''
+    Get best comparable records according to CPTheory
+    (maxpref partition algorithm in sharded workers)
+    '''
+    return _run_distributed(preference_text, record_list, worker_number,
+                            transport,
+                            lambda coordinator, theory:
+                            coordinator.best(theory, MAXPREF_ALGORITHM))
+
+
+def get_mtopk_partition_distributed(preference_text, record_list, k,
+                                    worker_number=None, transport=None):
+    '''
+    Returns the top-k comparable records
+    (maxpref partition algorithm in sharded workers)
+    '''
+    return _run_distributed(preference_text, record_list, worker_number,
+                            transport,
+                            lambda coordinator, theory:
+                            coordinator.topk(theory, k, MAXPREF_ALGORITHM))
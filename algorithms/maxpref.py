@@ -3,8 +3,10 @@
 Module with extended partition algorithms for Maxpref CPref-SQL operators
 '''
 
-from preference.theory import build_cptheory
-from partition import partition
+from preference.compiled import get_compiled_theory
+from algorithms.partition import partition, partition_levels
+from algorithms.optimizer import prune_comparisons, get_ordered_comparisons
+from algorithms.planner import get_position_records, get_positions
 
 
 def incomparable(comparisons, record_list):
@@ -17,78 +19,97 @@ def incomparable(comparisons, record_list):
     return comparables, non_comparables
 
 
-def get_mbest_partition(preference_text, record_list):
+def get_mbest_partition(preference_text, record_list, stats=None):
     '''
     Get best records according to CPTheory (partition algorithm)
     A record is best if it is not dominated by any other record
+    Optimizer statistics are stored in 'stats' (a dictionary)
     '''
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         return []
-    # Build formulas
-    theory.build_formulas()
-    # Build comparisons from formulas
-    theory.build_comparisons()
     # Apply partition algorithm
-    result = partition_mbest(theory, record_list)
+    result = partition_mbest(theory, record_list, stats=stats)
     return result
 
 
-def partition_mbest(theory, record_list):
+def partition_mbest(theory, record_list, optimize=True, stats=None):
     '''
     Get best records by partitioning the record list
     based on each comparison and separating the dominant
     records and discarding the dominated ones
+
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped and comparisons removing more records (estimated on a sample)
+    are used first (see optimizer.py)
     '''
 
     dominants = list(record_list)
-    dominants, _ = incomparable(theory.get_comparison_list(), dominants)
+    comparison_list = theory.get_comparison_list()
+    matching_list = comparison_list
+    if optimize:
+        comparison_list, matching_list = \
+            prune_comparisons(comparison_list, dominants, stats)
+        comparison_list = get_ordered_comparisons(comparison_list,
+                                                  dominants)
+    dominants, _ = incomparable(matching_list, dominants)
 
     # for each comparison, verify dominant records
-    for comp in theory.get_comparison_list():
+    for comp in comparison_list:
         dominants, _, non_comparables = partition(dominants, comp)
         dominants = dominants + non_comparables
     return dominants
 
 
-def get_mtopk_partition(preference_text, record_list, k):
+def get_mtopk_partition(preference_text, record_list, k, stats=None):
     '''
     Returns the top-k records (partition algorithm)
+    Optimizer statistics are stored in 'stats' (a dictionary)
     '''
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         return []
-    # Build formulas
-    theory.build_formulas()
-    # Build comparisons
-    theory.build_comparisons()
     # Apply algorithm
-    result = partition_mtopk(theory, record_list, k)
+    result = partition_mtopk(theory, record_list, k, stats=stats)
     return result
 
 
-def partition_mtopk(theory, record_list, k):
+def partition_mtopk(theory, record_list, k, optimize=True, stats=None):
     '''
     Separate the top-k most dominant tuples
     The algorithm repeatedly scans the set of dominated tuples
     progressively populating the return list
+
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped (see optimizer.py)
     '''
-    # initially assumes all dominant
     return_list = []
-    dominant_recs = list(record_list)
-    dominant_recs, _ = \
-        incomparable(theory.get_comparison_list(), dominant_recs)
-
-    while len(return_list) < k and dominant_recs:
-        temporary_list = []
-        # for each comparison, verify dominant records
-        for comp in theory.get_comparison_list():
-            dominant_recs, non_dominant_recs, non_comparable = \
-                partition(dominant_recs, comp)
-            temporary_list = temporary_list + non_dominant_recs
-            dominant_recs = dominant_recs + non_comparable
-        return_list = return_list + dominant_recs
-        dominant_recs = temporary_list
+    level_iter = partition_mlevels(theory, record_list, optimize, stats)
+    while len(return_list) < k:
+        level_list = next(level_iter, None)
+        if level_list is None:
+            break
+        return_list = return_list + level_list
     return return_list[0:k]
+
+
+def partition_mlevels(theory, record_list, optimize=True, stats=None):
+    '''
+    Generate the levels of comparable records (first level has the
+    dominant records, next level has the dominant records of remaining
+    ones and so on), records of a level are in input order
+
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped (see optimizer.py)
+    '''
+    comparison_list = theory.get_comparison_list()
+    matching_list = comparison_list
+    if optimize:
+        comparison_list, matching_list = \
+            prune_comparisons(comparison_list, record_list, stats)
+    comparable_list, _ = incomparable(
+        matching_list, get_position_records(enumerate(record_list)))
+    comparable_list = [record_list[position]
+                       for position in sorted(get_positions(comparable_list))]
+    return partition_levels(theory, comparable_list,
+                            comparison_list=comparison_list)
@@ -3,7 +3,7 @@
 '''
 Module with nested loop algorithms
 '''
-from preference.theory import build_cptheory
+from preference.compiled import get_compiled_theory
 
 
 def get_best_and_worst(theory, record_list):
@@ -60,8 +60,7 @@ def get_best(preference_text, record_list):
     A record is best if it is not dominated by any other record
     '''
     # build theory
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         return []
     result, _ = get_best_and_worst(theory, record_list)
@@ -73,15 +72,28 @@ def get_topk(preference_text, record_list, k):
     Returns the top-k records with lowest level according to a cp-theory
     '''
     # build theory
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         return []
-    worst_list = record_list
+    level_iter = get_levels(theory, record_list)
     topk_list = []
-    while len(topk_list) < k and worst_list:
-        best_list, worst_list = get_best_and_worst(theory, worst_list)
+    while len(topk_list) < k:
+        best_list = next(level_iter, None)
+        if best_list is None:
+            break
         topk_list += best_list
     if len(topk_list) > k:
         topk_list = topk_list[:k]
     return topk_list
+
+
+def get_levels(theory, record_list):
+    '''
+    Generate the levels of records according to a cp-theory
+    (first level has the best records, next level has the best of remaining
+    records and so on)
+    '''
+    worst_list = record_list
+    while worst_list:
+        best_list, worst_list = get_best_and_worst(theory, worst_list)
+        yield best_list
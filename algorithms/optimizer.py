@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+'''
+Module to prune and order comparisons for partition algorithms
+
+Comparisons whose formulas are satisfied by no input record can not fire,
+so they are removed before the algorithms run (per attribute value indexes
+are used, so a formula is kept if each of its intervals contains some
+input value).
+
+The comparisons of a theory are sorted by indifferent set and formula
+sizes, which say nothing about how many records each comparison removes.
+The pruning power of each comparison is estimated on a sample of the
+records, so comparisons removing more records run first and later passes
+scan fewer records
+'''
+
+from algorithms.partition import partition
+from preference.interval import ValueIndex
+
+# Statistics keys
+COMPARISONS_STAT = 'comparisons'
+SKIPPED_COMPARISONS_STAT = 'skipped_comparisons'
+
+# Default number of sample records
+DEFAULT_SAMPLE_SIZE = 200
+# Minimum number of records to order comparisons
+# (for less records, estimation costs more than it saves)
+MIN_RECORD_NUMBER = 2 * DEFAULT_SAMPLE_SIZE
+
+
+def get_sample(record_list, sample_size=DEFAULT_SAMPLE_SIZE):
+    '''
+    Get a sample of records (evenly spaced, so sample is deterministic)
+    '''
+    if len(record_list) <= sample_size:
+        return list(record_list)
+    step = len(record_list) / float(sample_size)
+    return [record_list[int(index * step)] for index in range(sample_size)]
+
+
+def estimate_selectivity(comparison, sample_list):
+    '''
+    Estimate the pruning power of a comparison over a sample
+
+    Return a tuple (number of removed records, number of records
+    satisfying non preferred formula)
+    '''
+    _, non_dominant_list, _ = partition(sample_list, comparison)
+    worst_number = len([rec for rec in sample_list
+                        if comparison.is_worst_record(rec)])
+    return len(non_dominant_list), worst_number
+
+
+def get_ordered_comparisons(comparison_list, record_list,
+                            sample_size=DEFAULT_SAMPLE_SIZE,
+                            min_record_number=MIN_RECORD_NUMBER):
+    '''
+    Get comparisons ordered by estimated pruning power (most selective
+    first). Comparisons with the same estimation keep their order.
+    For less than 'min_record_number' records the order is not changed
+    '''
+    comparison_list = list(comparison_list)
+    if len(record_list) < min_record_number or len(comparison_list) < 2:
+        return comparison_list
+    sample_list = get_sample(record_list, sample_size)
+    key_list = []
+    for index, comp in enumerate(comparison_list):
+        removed_number, worst_number = \
+            estimate_selectivity(comp, sample_list)
+        key_list.append((-removed_number, -worst_number, index))
+    key_list.sort()
+    return [comparison_list[index] for _, _, index in key_list]
+
+
+def get_value_indexes(record_list, attribute_set):
+    '''
+    Get the value index of each attribute over the records
+    '''
+    value_dict = {att: set() for att in attribute_set}
+    for rec in record_list:
+        for att in attribute_set:
+            if att in rec:
+                value_dict[att].add(rec[att])
+    return {att: ValueIndex(value_dict[att]) for att in value_dict}
+
+
+def is_satisfiable(formula, index_dict):
+    '''
+    Check if a formula may be satisfied by the indexed records
+    (every interval contains some value of its attribute)
+    '''
+    for att in formula:
+        if not index_dict[att].contains_any(formula[att]):
+            return False
+    return True
+
+
+def prune_comparisons(comparison_list, record_list, stats=None):
+    '''
+    Prune the comparisons that can not fire on the records
+
+    Return the list of comparisons with preferred and non preferred
+    formulas satisfied by some records (they may remove records) and the
+    list of comparisons with any formula satisfied (they may separate
+    comparable records, see maxpref.incomparable).
+    The number of comparisons and of skipped ones (not in first list) are
+    stored in 'stats'
+    '''
+    comparison_list = list(comparison_list)
+    attribute_set = set()
+    for comp in comparison_list:
+        attribute_set.update(comp.get_preferred_formula())
+        attribute_set.update(comp.get_notpreferred_formula())
+    index_dict = get_value_indexes(record_list, attribute_set)
+    # Satisfiability of formulas (by formula id, formulas are shared)
+    satisfiable_dict = {}
+    firing_list = []
+    matching_list = []
+    for comp in comparison_list:
+        result_list = []
+        for formula in [comp.get_preferred_formula(),
+                        comp.get_notpreferred_formula()]:
+            if id(formula) not in satisfiable_dict:
+                satisfiable_dict[id(formula)] = \
+                    is_satisfiable(formula, index_dict)
+            result_list.append(satisfiable_dict[id(formula)])
+        if all(result_list):
+            firing_list.append(comp)
+        if any(result_list):
+            matching_list.append(comp)
+    if stats is not None:
+        stats[COMPARISONS_STAT] = len(comparison_list)
+        stats[SKIPPED_COMPARISONS_STAT] = \
+            len(comparison_list) - len(firing_list)
+    return firing_list, matching_list
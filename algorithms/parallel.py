@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+'''
+Module with parallel preference algorithms (process pool)
+
+Records are hash-sharded by group key (values of frozen attributes, which
+are part of the partition key of every comparison, see planner.py), so
+records of different shards are never compared. Shards run in a pool of
+worker processes (concurrent.futures) and the compiled theory is sent
+once to each worker by the pool initializer.
+
+BNL is also run by divide and conquer: a best record is best in any chunk
+of records, so the best records of chunks are computed by workers and
+merged by BNL rounds over pairs of chunk results (tree merge) or by a
+single final round.
+
+Records of a query may be placed in an encoded columnar store in shared
+memory (see record_store.py), so tasks and results are vectors of row ids
+and records are not pickled to workers. Workers decode the records of each
+task, so it is slower than pickling for usual records (see
+bench_parallel.py) and it is not used by default.
+
+Results are merged by input position, so they do not depend on the number
+of workers and are the records of the serial algorithms in input order
+'''
+
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+
+from preference.compiled import get_compiled_theory
+from algorithms.nested_loops import get_best_and_worst
+from algorithms.planner import PARTITION_ALGORITHM, MAXPREF_ALGORITHM, \
+    get_frozen_attributes, get_group_key, group_records, get_batch_records, \
+    run_best_batch, run_topk_batch, merge_best_positions, \
+    merge_level_positions, get_position_records, get_positions
+from algorithms.record_store import RecordStore, get_row_ids
+
+# Number of shards of each worker (more shards balance workers load)
+SHARDS_PER_WORKER = 4
+
+# Compiled theory of worker process (set by pool initializer)
+_WORKER_THEORY = None
+
+
+def _init_worker(theory_bytes):
+    '''
+    Initialize a worker process with a pickled compiled theory
+    '''
+    global _WORKER_THEORY  # IGNORE:global-statement
+    _WORKER_THEORY = pickle.loads(theory_bytes)
+
+
+def _decode_batch(batch, store_name):
+    '''
+    Get the groups of a batch as lists of pairs (position, record)
+    (groups are vectors of row ids when records are in a store)
+
+    The store is closed after decoding, so workers do not keep the shared
+    memory of a query after its tasks
+    '''
+    if store_name is None:
+        return batch
+    store = RecordStore.attach(store_name)
+    try:
+        return [[(row_id, store.get_record(row_id)) for row_id in group]
+                for group in batch]
+    finally:
+        store.close()
+
+
+def _run_best_shard(batch, algorithm, store_name=None):
+    '''
+    Get positions of best records of a shard (in worker process)
+    '''
+    batch = _decode_batch(batch, store_name)
+    return get_row_ids(run_best_batch(_WORKER_THEORY, batch, algorithm))
+
+
+def _run_topk_shard(batch, algorithm, k, store_name=None):
+    '''
+    Get levels (lists of positions) of a shard (in worker process)
+    '''
+    batch = _decode_batch(batch, store_name)
+    return [get_row_ids(level)
+            for level in run_topk_batch(_WORKER_THEORY, batch, algorithm, k)]
+
+
+def _run_bnl_chunk(chunk, store_name=None):
+    '''
+    Get the best positions of a chunk by BNL (in worker process)
+    (a chunk is a list of pairs (position, record) or a vector of row ids)
+    '''
+    best_list, _ = get_best_and_worst(
+        _WORKER_THEORY,
+        get_position_records(_decode_batch([chunk], store_name)[0]))
+    return get_row_ids(sorted(get_positions(best_list)))
+
+
+def get_chunks(record_list, chunk_number):
+    '''
+    Split record positions in chunks of consecutive positions
+    (chunk sizes differ by one record at most)
+    '''
+    chunk_number = max(1, min(chunk_number, len(record_list)))
+    size, remainder = divmod(len(record_list), chunk_number)
+    chunk_list = []
+    start = 0
+    for index in range(chunk_number):
+        end = start + size + (1 if index < remainder else 0)
+        chunk_list.append(list(range(start, end)))
+        start = end
+    return chunk_list
+
+
+def get_shards(theory, record_list, shard_number):
+    '''
+    Hash-shard groups of records by group key
+
+    Return the list of shards (lists of groups of positions),
+    empty shards are removed
+    '''
+    attribute_list = get_frozen_attributes(theory, record_list)
+    shard_list = [[] for _ in range(shard_number)]
+    for group in group_records(theory, record_list):
+        group_key = get_group_key(record_list[group[0]], attribute_list)
+        shard_list[hash(group_key) % shard_number].append(group)
+    return [shard for shard in shard_list if shard]
+
+
+class PartitionPool(object):
+    '''
+    Class to represent a pool of worker processes for a compiled theory
+
+    The pool can run many queries (best and top-k records), use it with
+    'with' statement or call close().
+    If 'shared_store' is True, records of each query are sent to workers
+    by a record store in shared memory, otherwise they are pickled
+    '''
+
+    def __init__(self, theory, worker_number=None,
+                 shards_per_worker=SHARDS_PER_WORKER, shared_store=False):
+        if worker_number is None:
+            worker_number = os.cpu_count() or 1
+        self._theory = theory
+        self._worker_number = worker_number
+        self._shard_number = worker_number * shards_per_worker
+        self._shared_store = shared_store
+        if shared_store:
+            # Workers share the resource tracker of shared memory blocks
+            # (see record_store.py)
+            resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(
+            worker_number, initializer=_init_worker,
+            initargs=(pickle.dumps(theory, pickle.HIGHEST_PROTOCOL),))
+        # Start workers before any record store is created, so forked
+        # workers do not inherit the shared memory of a query
+        self._executor.submit(int).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        '''
+        Shut down worker processes
+        '''
+        self._executor.shutdown()
+
+    def get_worker_number(self):
+        '''
+        Get the number of worker processes
+        '''
+        return self._worker_number
+
+    def _run_query(self, record_list, function):
+        '''
+        Run a query function over records, the function gets the name of
+        the record store (None without shared store)
+        '''
+        if not self._shared_store:
+            return function(None)
+        store = RecordStore.create(record_list)
+        try:
+            return function(store.get_name())
+        finally:
+            store.unlink()
+
+    def _map(self, function, task_list, argument_list):
+        '''
+        Run a function over tasks in workers (results in task order)
+        '''
+        future_list = [self._executor.submit(function, task, *argument_list)
+                       for task in task_list]
+        return [future.result() for future in future_list]
+
+    def _get_batch_list(self, record_list, store_name):
+        '''
+        Get shards of records as tasks
+        '''
+        shard_list = get_shards(self._theory, record_list, self._shard_number)
+        if store_name is None:
+            return get_batch_records(record_list, shard_list)
+        return [[get_row_ids(group) for group in shard]
+                for shard in shard_list]
+
+    def best(self, record_list, algorithm=PARTITION_ALGORITHM):
+        '''
+        Get best records
+        '''
+        return self._run_query(
+            record_list,
+            lambda store_name: merge_best_positions(
+                record_list,
+                self._map(_run_best_shard,
+                          self._get_batch_list(record_list, store_name),
+                          [algorithm, store_name])))
+
+    def topk(self, record_list, k, algorithm=PARTITION_ALGORITHM):
+        '''
+        Get top-k records
+        '''
+        if k <= 0:
+            return []
+        return self._run_query(
+            record_list,
+            lambda store_name: merge_level_positions(
+                record_list,
+                self._map(_run_topk_shard,
+                          self._get_batch_list(record_list, store_name),
+                          [algorithm, k, store_name]), k))
+
+    def bnl_best(self, record_list, chunk_number=None, tree_merge=True):
+        '''
+        Get best records by BNL over chunks of records (one chunk for each
+        worker by default) merged by tree or by a final round
+        '''
+        if chunk_number is None:
+            chunk_number = self._worker_number
+        return self._run_query(
+            record_list,
+            lambda store_name: self._bnl_best(record_list, chunk_number,
+                                              tree_merge, store_name))
+
+    def _bnl_best(self, record_list, chunk_number, tree_merge, store_name):
+        '''
+        Run BNL over chunks of records (see bnl_best)
+        '''
+        def get_task(position_list):
+            '''
+            Get the task of a chunk of positions
+            '''
+            if store_name is None:
+                return [(position, record_list[position])
+                        for position in position_list]
+            return get_row_ids(position_list)
+        chunk_list = self._map(
+            _run_bnl_chunk,
+            [get_task(chunk)
+             for chunk in get_chunks(record_list, chunk_number)],
+            [store_name])
+        while len(chunk_list) > 1:
+            tail_list = []
+            if tree_merge:
+                # Merge pairs of consecutive chunks (last odd chunk waits)
+                merge_list = [chunk_list[index] + chunk_list[index + 1]
+                              for index in range(0, len(chunk_list) - 1, 2)]
+                if len(chunk_list) % 2 == 1:
+                    tail_list = [chunk_list[-1]]
+            else:
+                merge_list = [[position for chunk in chunk_list
+                               for position in chunk]]
+            chunk_list = self._map(_run_bnl_chunk,
+                                   [get_task(chunk) for chunk in merge_list],
+                                   [store_name]) + tail_list
+        return [record_list[position] for position in chunk_list[0]]
+
+
+def _run_parallel(preference_text, worker_number, function):
+    '''
+    Run a function over a pool of a preference text
+    (an empty list is returned for inconsistent theories)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    with PartitionPool(theory, worker_number) as pool:
+        return function(pool)
+
+
+def get_best_partition_parallel(preference_text, record_list,
+                                worker_number=None):
+    '''
+    Get best records according to CPTheory
+    (partition algorithm in worker processes)
+    '''
+    return _run_parallel(preference_text, worker_number,
+                         lambda pool: pool.best(record_list))
+
+
+def get_topk_partition_parallel(preference_text, record_list, k,
+                                worker_number=None):
+    '''
+    Returns the top-k records (partition algorithm in worker processes)
+    '''
+    return _run_parallel(preference_text, worker_number,
+                         lambda pool: pool.topk(record_list, k))
+
+
+def get_mbest_partition_parallel(preference_text, record_list,
+                                 worker_number=None):
+    '''
+    Get best comparable records according to CPTheory
+    (maxpref partition algorithm in worker processes)
+    '''
+    return _run_parallel(preference_text, worker_number,
+                         lambda pool: pool.best(record_list,
+                                                MAXPREF_ALGORITHM))
+
+
+def get_mtopk_partition_parallel(preference_text, record_list, k,
+                                 worker_number=None):
+    '''
+    Returns the top-k comparable records
+    (maxpref partition algorithm in worker processes)
+    '''
+    return _run_parallel(preference_text, worker_number,
+                         lambda pool: pool.topk(record_list, k,
+                                                MAXPREF_ALGORITHM))
+
+
+def get_best_parallel(preference_text, record_list, worker_number=None,
+                      chunk_number=None, tree_merge=True):
+    '''
+    Get best records according to CPTheory
+    (BNL over chunks in worker processes)
+    '''
+    return _run_parallel(preference_text, worker_number,
+                         lambda pool: pool.bnl_best(record_list, chunk_number,
+                                                    tree_merge))
@@ -3,39 +3,48 @@
 Module with partition algorithms for CPref-SQL preference queries
 '''
 
-from preference.theory import build_cptheory
+from preference.compiled import get_compiled_theory
+from algorithms.planner import get_position_records, get_positions
 
 
-def get_best_partition(preference_text, record_list):
+def get_best_partition(preference_text, record_list, stats=None):
     '''
     Get best records according to CPTheory (partition algorithm)
 
-    A record is best if it is not dominated by any other record
+    A record is best if it is not dominated by any other record.
+    Optimizer statistics are stored in 'stats' (a dictionary)
     '''
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         print('inconsistent!')
         return []
-    # Build formulas
-    theory.build_formulas()
-    # Build comparisons from formulas
-    theory.build_comparisons()
     # Apply partition algorithm
-    result = partition_best(theory, record_list)
+    result = partition_best(theory, record_list, stats=stats)
     return result
 
 
-def partition_best(theory, record_list):
+def partition_best(theory, record_list, optimize=True, stats=None):
     '''
     Get best records by partitioning the record list
     based on each comparison and separating the dominant
     records and discarding the dominated ones
+
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped and comparisons removing more records (estimated on a sample)
+    are used first (see optimizer.py)
     '''
 
     dominants = list(record_list)
+    comparison_list = theory.get_comparison_list()
+    if optimize:
+        from algorithms.optimizer import prune_comparisons, \
+            get_ordered_comparisons
+        comparison_list, _ = prune_comparisons(comparison_list, dominants,
+                                               stats)
+        comparison_list = get_ordered_comparisons(comparison_list,
+                                                  dominants)
     # for each comparison, verify dominant records
-    for comp in theory.get_comparison_list():
+    for comp in comparison_list:
         dominants, _, non_comparable = partition(dominants, comp)
         dominants = dominants + non_comparable
     return dominants
@@ -115,42 +124,68 @@ def create_partitions(tuple_list, comparison):
     return hash_table
 
 
-def get_topk_partition(preference_text, record_list, k):
+def get_topk_partition(preference_text, record_list, k, stats=None):
     '''
     Returns the top-k records (partition algorithm)
+    Optimizer statistics are stored in 'stats' (a dictionary)
     '''
-    theory = build_cptheory(preference_text)
-    theory.split_rules()
+    theory = get_compiled_theory(preference_text)
     if not theory.is_consistent():
         return []
-    # Build formulas
-    theory.build_formulas()
-    # Build comparisons
-    theory.build_comparisons()
     # Apply algorithm
-    result = partition_topk(theory, record_list, k)
+    result = partition_topk(theory, record_list, k, stats=stats)
     return result
 
 
-def partition_topk(theory, record_list, k):
+def partition_topk(theory, record_list, k, optimize=True, stats=None):
     '''
     Separate the top-k most dominant tuples
     The algorithm repeatedly scans the set of dominated tuples
-    progressively populating the return list
-    '''
+    progressively populating the return list (the last level is cut in
+    input order)
 
-    # initially assumes all dominant
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped (see optimizer.py)
+    '''
     return_list = []
-    dominant_recs = list(record_list)
-    while len(return_list) < k and dominant_recs:
+    level_iter = partition_levels(theory, record_list, optimize, stats)
+    while len(return_list) < k:
+        level_list = next(level_iter, None)
+        if level_list is None:
+            break
+        return_list = return_list + level_list
+    return return_list[0:k]
+
+
+def partition_levels(theory, record_list, optimize=True, stats=None,
+                     comparison_list=None):
+    '''
+    Generate the levels of records (first level has the dominant records,
+    next level has the dominant records of remaining ones and so on)
+
+    Records of a level are in input order, so levels do not depend on
+    the comparisons used.
+    If 'optimize' is True, comparisons that can not fire on the records are
+    skipped (see optimizer.py). A list of comparisons already pruned can be
+    given in 'comparison_list'
+    '''
+    # initially assumes all dominant (records carry input positions)
+    dominant_recs = get_position_records(enumerate(record_list))
+    if comparison_list is None:
+        comparison_list = theory.get_comparison_list()
+        if optimize:
+            from algorithms.optimizer import prune_comparisons
+            comparison_list, _ = prune_comparisons(comparison_list,
+                                                   dominant_recs, stats)
+    while dominant_recs:
         temporary_list = []
         # for each comparison, verify dominant records
-        for comp in theory.get_comparison_list():
+        for comp in comparison_list:
             dominant_recs, non_dominant_recs, non_comparable = \
                 partition(dominant_recs, comp)
 
             temporary_list = temporary_list + non_dominant_recs
             dominant_recs = dominant_recs + non_comparable
-        return_list = return_list + dominant_recs
+        yield [record_list[position]
+               for position in sorted(get_positions(dominant_recs))]
         dominant_recs = temporary_list
-    return return_list[0:k]
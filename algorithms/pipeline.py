@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+'''
+Module with pipelined preference queries over SQLite tables
+
+A producer thread fetches the next batches of rows (SQLite releases the
+GIL while it reads) while the consumer converts the current batch to
+records and feeds them to a streaming algorithm (see streaming.py).
+Batches are passed by a bounded queue (two buffers by default), so the
+producer is at most 'buffer_number' batches ahead of the consumer.
+
+Time of each stage is stored in 'stats' (a dictionary):
+    - fetch_time: time of producer fetching rows
+    - wait_time: time of consumer waiting for batches (fetch time when
+      there is no producer thread)
+    - evaluation_time: time of consumer building records and running the
+      algorithm (total time minus wait time)
+    - total_time: end-to-end time
+'''
+
+import sqlite3
+import threading
+import timeit
+from queue import Queue, Empty, Full
+
+from preference.compiled import get_compiled_theory
+from algorithms.sqlite_reader import DEFAULT_BATCH_SIZE, TableReader
+from algorithms.streaming import bnl_stream, partition_stream
+
+# Statistics keys
+FETCH_TIME_STAT = 'fetch_time'
+WAIT_TIME_STAT = 'wait_time'
+EVALUATION_TIME_STAT = 'evaluation_time'
+TOTAL_TIME_STAT = 'total_time'
+BATCHES_STAT = 'batches'
+ROWS_STAT = 'rows'
+
+# Default number of batches in queue (double buffering)
+DEFAULT_BUFFER_NUMBER = 2
+# Timeout of producer waiting for free buffers (to check if consumer stopped)
+_PUT_TIMEOUT = 0.1
+
+# Kinds of queue items
+_BATCH_ITEM = 'batch'
+_ERROR_ITEM = 'error'
+_END_ITEM = 'end'
+
+
+def prefetch(batch_function, buffer_number=DEFAULT_BUFFER_NUMBER,
+             stats=None):
+    '''
+    Generate the batches of the iterator returned by 'batch_function',
+    batches are fetched by a producer thread (the function is called by
+    the thread). If 'buffer_number' is 0, batches are fetched by the
+    caller (no thread)
+
+    Fetch and wait times, number of batches and number of rows are stored
+    in 'stats'
+    '''
+    if stats is None:
+        stats = {}
+    stats[FETCH_TIME_STAT] = 0.0
+    stats[WAIT_TIME_STAT] = 0.0
+    stats[BATCHES_STAT] = 0
+    stats[ROWS_STAT] = 0
+    if buffer_number <= 0:
+        batch_iter = iter(batch_function())
+        while True:
+            start_time = timeit.default_timer()
+            batch = next(batch_iter, None)
+            fetch_time = timeit.default_timer() - start_time
+            # Consumer waits while it fetches
+            stats[FETCH_TIME_STAT] += fetch_time
+            stats[WAIT_TIME_STAT] += fetch_time
+            if batch is None:
+                break
+            stats[BATCHES_STAT] += 1
+            stats[ROWS_STAT] += len(batch)
+            yield batch
+        return
+    batch_queue = Queue(buffer_number)
+    stop_event = threading.Event()
+
+    def put(item):
+        '''
+        Put an item in queue (unless consumer stopped)
+        '''
+        while not stop_event.is_set():
+            try:
+                batch_queue.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        '''
+        Fetch batches into queue
+        '''
+        fetch_time = 0.0
+        try:
+            batch_iter = iter(batch_function())
+            while True:
+                start_time = timeit.default_timer()
+                batch = next(batch_iter, None)
+                fetch_time += timeit.default_timer() - start_time
+                if batch is None or not put((_BATCH_ITEM, batch)):
+                    break
+            put((_END_ITEM, None))
+        except Exception as error:  # IGNORE:broad-except
+            put((_ERROR_ITEM, error))
+        finally:
+            stats[FETCH_TIME_STAT] = fetch_time
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            start_time = timeit.default_timer()
+            kind, batch = batch_queue.get()
+            stats[WAIT_TIME_STAT] += timeit.default_timer() - start_time
+            if kind == _END_ITEM:
+                break
+            if kind == _ERROR_ITEM:
+                raise batch
+            stats[BATCHES_STAT] += 1
+            stats[ROWS_STAT] += len(batch)
+            yield batch
+    finally:
+        # Stop producer (it may be waiting for a free buffer)
+        stop_event.set()
+        try:
+            while True:
+                batch_queue.get_nowait()
+        except Empty:
+            pass
+        thread.join()
+
+
+def pipeline_records(reader, buffer_number=DEFAULT_BUFFER_NUMBER,
+                     stats=None):
+    '''
+    Generate the records of a table reader (batches are fetched by a
+    producer thread while records of current batch are used)
+    '''
+    attribute_list = reader.get_attribute_list()
+    for row_list in prefetch(reader.batches, buffer_number, stats):
+        for row in row_list:
+            yield dict(zip(attribute_list, row))
+
+
+def _run_pipeline(preference_text, data_file, table, stream_function,
+                  batch_size, buffer_number, stats):
+    '''
+    Run a streaming algorithm over records of a table of a database file
+    '''
+    if stats is None:
+        stats = {}
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    start_time = timeit.default_timer()
+    # The producer thread uses the connection (one thread at a time)
+    connection = sqlite3.connect(data_file, check_same_thread=False)
+    try:
+        reader = TableReader(connection, table, batch_size=batch_size)
+        result_list = list(stream_function(
+            theory, pipeline_records(reader, buffer_number, stats)))
+    finally:
+        connection.close()
+    stats[TOTAL_TIME_STAT] = timeit.default_timer() - start_time
+    stats[EVALUATION_TIME_STAT] = \
+        stats[TOTAL_TIME_STAT] - stats[WAIT_TIME_STAT]
+    return result_list
+
+
+def get_best_pipelined(preference_text, data_file, table,
+                       batch_size=DEFAULT_BATCH_SIZE,
+                       buffer_number=DEFAULT_BUFFER_NUMBER, stats=None):
+    '''
+    Get best records of a table according to CPTheory
+    (streaming BNL with pipelined reading)
+    '''
+    return _run_pipeline(preference_text, data_file, table, bnl_stream,
+                         batch_size, buffer_number, stats)
+
+
+def get_best_partition_pipelined(preference_text, data_file, table,
+                                 batch_size=DEFAULT_BATCH_SIZE,
+                                 buffer_number=DEFAULT_BUFFER_NUMBER,
+                                 stats=None):
+    '''
+    Get best records of a table according to CPTheory
+    (streaming partition algorithm with pipelined reading)
+    '''
+    return _run_pipeline(preference_text, data_file, table,
+                         partition_stream, batch_size, buffer_number, stats)
+
+
+def get_mbest_partition_pipelined(preference_text, data_file, table,
+                                  batch_size=DEFAULT_BATCH_SIZE,
+                                  buffer_number=DEFAULT_BUFFER_NUMBER,
+                                  stats=None):
+    '''
+    Get best comparable records of a table according to CPTheory
+    (streaming maxpref partition algorithm with pipelined reading)
+    '''
+    return _run_pipeline(preference_text, data_file, table,
+                         lambda theory, record_iter:
+                         partition_stream(theory, record_iter, True),
+                         batch_size, buffer_number, stats)
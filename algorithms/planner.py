@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+'''
+Module to decompose preference queries into independent subproblems
+
+Under ceteris paribus semantics, a rule only changes its preference
+attribute and its indifferent attributes. Records differing on any other
+attribute (a frozen attribute) are never comparable, so the records are
+grouped by the values of frozen attributes and each group is an
+independent subproblem for BNL, partition or maxpref algorithms.
+
+Groups are batched (small groups are joined) and the batches run in order
+or are submitted to an executor (concurrent.futures).
+Results are ordered by input position, so they do not depend on batches
+'''
+
+from preference.compiled import get_compiled_theory
+
+# Algorithms of subproblems
+BNL_ALGORITHM = 'bnl'
+PARTITION_ALGORITHM = 'partition'
+MAXPREF_ALGORITHM = 'maxpref'
+ALGORITHM_LIST = [BNL_ALGORITHM, PARTITION_ALGORITHM, MAXPREF_ALGORITHM]
+
+# Default minimum number of records of a batch of groups
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_free_attributes(theory):
+    '''
+    Get the attributes changed by rules of a theory
+    (preference attributes and indifferent attributes)
+    '''
+    attribute_set = set()
+    for rule in theory.get_rule_list():
+        pref = rule.get_preference()
+        attribute_set.add(pref.get_preference_attribute())
+        attribute_set.update(pref.get_indifferent_set())
+    return attribute_set
+
+
+def get_frozen_attributes(theory, record_list):
+    '''
+    Get the sorted list of frozen attributes of records
+    (attributes not changed by any rule of a theory)
+    '''
+    if not record_list:
+        return []
+    free_set = get_free_attributes(theory)
+    return sorted([att for att in record_list[0] if att not in free_set])
+
+
+def get_group_key(record, attribute_list):
+    '''
+    Get the group key of a record (values of frozen attributes)
+    '''
+    return tuple([record.get(att) for att in attribute_list])
+
+
+def group_records(theory, record_list):
+    '''
+    Group records by values of frozen attributes
+
+    Return the list of groups (lists of record positions) in order of
+    first record
+    '''
+    attribute_list = get_frozen_attributes(theory, record_list)
+    group_dict = {}
+    group_list = []
+    for position, rec in enumerate(record_list):
+        group_key = get_group_key(rec, attribute_list)
+        if group_key not in group_dict:
+            group_dict[group_key] = []
+            group_list.append(group_dict[group_key])
+        group_dict[group_key].append(position)
+    return group_list
+
+
+def get_batches(group_list, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Join consecutive groups in batches of at least 'batch_size' records
+    (the last batch may be smaller)
+    '''
+    batch_list = []
+    batch = []
+    record_number = 0
+    for group in group_list:
+        batch.append(group)
+        record_number += len(group)
+        if record_number >= batch_size:
+            batch_list.append(batch)
+            batch = []
+            record_number = 0
+    if batch:
+        batch_list.append(batch)
+    return batch_list
+
+
+def get_group_levels(theory, algorithm, record_list):
+    '''
+    Get the level generator of an algorithm over a group of records
+    '''
+    if algorithm == BNL_ALGORITHM:
+        from algorithms.nested_loops import get_levels
+        return get_levels(theory, list(record_list))
+    elif algorithm == PARTITION_ALGORITHM:
+        from algorithms.partition import partition_levels
+        return partition_levels(theory, record_list)
+    elif algorithm == MAXPREF_ALGORITHM:
+        from algorithms.maxpref import partition_mlevels
+        return partition_mlevels(theory, record_list)
+    raise ValueError('Invalid algorithm: ' + str(algorithm))
+
+
+def get_group_best(theory, algorithm, record_list):
+    '''
+    Get the best records of a group of records by an algorithm
+    '''
+    if algorithm == BNL_ALGORITHM:
+        from algorithms.nested_loops import get_best_and_worst
+        return get_best_and_worst(theory, list(record_list))[0]
+    elif algorithm == PARTITION_ALGORITHM:
+        from algorithms.partition import partition_best
+        return partition_best(theory, record_list)
+    elif algorithm == MAXPREF_ALGORITHM:
+        from algorithms.maxpref import partition_mbest
+        return partition_mbest(theory, record_list)
+    raise ValueError('Invalid algorithm: ' + str(algorithm))
+
+
+class PositionRecord(dict):
+    '''
+    Class to represent a record with its input position
+
+    It is a copy of the record, so algorithms use it as any record and
+    result records give their positions (also for repeated records)
+    '''
+
+    __slots__ = ('position',)
+
+    def __init__(self, position, record):
+        dict.__init__(self, record)
+        self.position = position
+
+
+def get_position_records(pair_list):
+    '''
+    Get position records of pairs (position, record)
+    '''
+    return [PositionRecord(position, rec) for position, rec in pair_list]
+
+
+def get_positions(record_list):
+    '''
+    Get the positions of position records
+    '''
+    return [rec.position for rec in record_list]
+
+
+def run_best_batch(theory, batch, algorithm):
+    '''
+    Get the positions of best records of a batch of groups
+    (a group is a list of pairs (position, record))
+    '''
+    result_list = []
+    for group in batch:
+        best_list = get_group_best(theory, algorithm,
+                                   get_position_records(group))
+        result_list += get_positions(best_list)
+    return result_list
+
+
+def run_topk_batch(theory, batch, algorithm, k):
+    '''
+    Get the levels (lists of positions) of records of a batch of groups
+    (a group is a list of pairs (position, record))
+
+    Only the first levels with at least k records of each group are built
+    (no other record of a group can be in the top-k)
+    '''
+    level_list = []
+    for group in batch:
+        record_number = 0
+        for index, level in enumerate(
+                get_group_levels(theory, algorithm,
+                                 get_position_records(group))):
+            if index == len(level_list):
+                level_list.append([])
+            level_list[index] += get_positions(level)
+            record_number += len(level)
+            if record_number >= k:
+                break
+    return level_list
+
+
+def get_batch_records(record_list, batch_list):
+    '''
+    Replace positions of groups by pairs (position, record)
+    '''
+    return [[[(position, record_list[position]) for position in group]
+             for group in batch]
+            for batch in batch_list]
+
+
+def _run_batches(function, theory, batch_list, argument_list, executor):
+    '''
+    Run a function over batches (by an executor, if it is not None)
+    and return results in batch order
+    '''
+    if executor is None:
+        return [function(theory, batch, *argument_list)
+                for batch in batch_list]
+    future_list = [executor.submit(function, theory, batch, *argument_list)
+                   for batch in batch_list]
+    return [future.result() for future in future_list]
+
+
+def decomposed_best(theory, record_list, algorithm=PARTITION_ALGORITHM,
+                    executor=None, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Get best records of a compiled theory solving each group of records
+    (by frozen attributes) as an independent subproblem
+    '''
+    batch_list = get_batch_records(
+        record_list, get_batches(group_records(theory, record_list),
+                                 batch_size))
+    return merge_best_positions(
+        record_list, _run_batches(run_best_batch, theory, batch_list,
+                                  [algorithm], executor))
+
+
+def decomposed_topk(theory, record_list, k, algorithm=PARTITION_ALGORITHM,
+                    executor=None, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Get top-k records of a compiled theory solving each group of records
+    (by frozen attributes) as an independent subproblem
+
+    Levels of groups are joined (a record level in its group is its level
+    in all records), records of a level are ordered by input position
+    '''
+    if k <= 0:
+        return []
+    batch_list = get_batch_records(
+        record_list, get_batches(group_records(theory, record_list),
+                                 batch_size))
+    return merge_level_positions(
+        record_list, _run_batches(run_topk_batch, theory, batch_list,
+                                  [algorithm, k], executor), k)
+
+
+def merge_best_positions(record_list, result_list):
+    '''
+    Merge positions of best records of batches
+    (records are returned in input order)
+    '''
+    position_list = []
+    for batch_result in result_list:
+        position_list += batch_result
+    return [record_list[position] for position in sorted(position_list)]
+
+
+def merge_level_positions(record_list, result_list, k):
+    '''
+    Merge levels (lists of positions) of batches and get top-k records
+    (records of a level are returned in input order)
+    '''
+    level_list = []
+    for batch_level_list in result_list:
+        for index, level in enumerate(batch_level_list):
+            if index == len(level_list):
+                level_list.append([])
+            level_list[index] += level
+    topk_list = []
+    for level in level_list:
+        if len(topk_list) >= k:
+            break
+        topk_list += [record_list[position] for position in sorted(level)]
+    return topk_list[:k]
+
+
+def get_best_decomposed(preference_text, record_list,
+                        algorithm=PARTITION_ALGORITHM, executor=None,
+                        batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Get best records according to CPTheory (decomposed by frozen attributes)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return decomposed_best(theory, record_list, algorithm, executor,
+                           batch_size)
+
+
+def get_topk_decomposed(preference_text, record_list, k,
+                        algorithm=PARTITION_ALGORITHM, executor=None,
+                        batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Get top-k records according to CPTheory
+    (decomposed by frozen attributes)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return decomposed_topk(theory, record_list, k, algorithm, executor,
+                           batch_size)
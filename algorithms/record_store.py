@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+'''
+Module with encoded columnar record store in shared memory
+
+Values of each attribute are encoded as integer codes (dictionary
+encoding) and stored by column in a block of shared memory:
+    <metadata size> <metadata> <codes of attribute 1> ... <codes of att. n>
+Metadata (attributes, dictionaries and number of rows) is pickled.
+
+Worker processes attach to the block by its name (no copy of records), so
+tasks and results are just vectors of row ids (see parallel.py)
+'''
+
+import pickle
+import struct
+from array import array
+from multiprocessing import shared_memory
+
+# Type code of codes and row ids (signed 32 bits integer)
+CODE_TYPE = 'i'
+# Code of missing attribute values
+MISSING_CODE = -1
+# Header with metadata size (unsigned 64 bits integer)
+_HEADER = struct.Struct('<Q')
+
+
+def _attach_memory(name):
+    '''
+    Attach to a block of shared memory without tracking it
+    (the block is unlinked by its creator)
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 tracks attached blocks too, worker processes share
+        # the resource tracker of their creator, so the block is tracked
+        # once and it is untracked by unlink()
+        return shared_memory.SharedMemory(name=name)
+
+
+def get_row_ids(position_list):
+    '''
+    Get a vector of row ids (compact to send to processes)
+    '''
+    return array(CODE_TYPE, position_list)
+
+
+class StoreBuilder(object):
+    '''
+    Class to encode records by column before creating a record store
+
+    Records are added by batches (dictionaries or tuples of values in
+    attribute order), so rows read from a database are encoded without
+    building record lists (see sqlite_reader.py)
+    '''
+
+    def __init__(self, attribute_list):
+        self._attribute_list = list(attribute_list)
+        # Codes by value key, values by code and codes of each attribute
+        self._code_dict_list = [{} for _ in self._attribute_list]
+        self._value_list_list = [[] for _ in self._attribute_list]
+        self._code_list_list = [array(CODE_TYPE)
+                                for _ in self._attribute_list]
+        self._row_number = 0
+
+    def __len__(self):
+        return self._row_number
+
+    def _encode(self, index, value_iter):
+        '''
+        Encode values of an attribute
+        '''
+        code_dict = self._code_dict_list[index]
+        value_list = self._value_list_list[index]
+        code_list = self._code_list_list[index]
+        for value in value_iter:
+            # Values are keyed with their types (1 and 1.0 differ)
+            value_key = (type(value), value)
+            code = code_dict.get(value_key)
+            if code is None:
+                code = code_dict[value_key] = len(value_list)
+                value_list.append(value)
+            code_list.append(code)
+
+    def add_rows(self, row_list):
+        '''
+        Add rows (tuples of values in attribute order)
+        '''
+        for index in range(len(self._attribute_list)):
+            self._encode(index, [row[index] for row in row_list])
+        self._row_number += len(row_list)
+
+    def add_records(self, record_list):
+        '''
+        Add records (dictionaries, missing attributes are allowed)
+        '''
+        for index, att in enumerate(self._attribute_list):
+            code_list = self._code_list_list[index]
+            for rec in record_list:
+                if att in rec:
+                    self._encode(index, [rec[att]])
+                else:
+                    code_list.append(MISSING_CODE)
+        self._row_number += len(record_list)
+
+    def build(self):
+        '''
+        Create a record store in a new block of shared memory
+        '''
+        metadata = pickle.dumps((self._attribute_list,
+                                 self._value_list_list, self._row_number),
+                                pickle.HIGHEST_PROTOCOL)
+        # Codes start aligned to 8 bytes
+        code_offset = _HEADER.size + len(metadata)
+        code_offset += -code_offset % 8
+        code_size = array(CODE_TYPE).itemsize * self._row_number * \
+            len(self._attribute_list)
+        memory = shared_memory.SharedMemory(
+            create=True, size=max(1, code_offset + code_size))
+        _HEADER.pack_into(memory.buf, 0, len(metadata))
+        memory.buf[_HEADER.size:_HEADER.size + len(metadata)] = metadata
+        offset = code_offset
+        for code_list in self._code_list_list:
+            code_bytes = code_list.tobytes()
+            memory.buf[offset:offset + len(code_bytes)] = code_bytes
+            offset += len(code_bytes)
+        return RecordStore(memory, self._attribute_list,
+                           self._value_list_list, self._row_number,
+                           code_offset)
+
+
+class RecordStore(object):
+    '''
+    Class to represent an encoded columnar record store in shared memory
+
+    Use create() to store records and attach() to use the store in other
+    processes. The creator must call unlink() to free the memory
+    '''
+
+    def __init__(self, memory, attribute_list, value_list_list, row_number,
+                 code_offset):
+        # Shared memory block
+        self._memory = memory
+        # Attributes and their dictionaries (values by code)
+        self._attribute_list = attribute_list
+        self._value_list_list = value_list_list
+        self._row_number = row_number
+        # Codes by column (view of shared memory)
+        code_size = array(CODE_TYPE).itemsize * row_number * \
+            len(attribute_list)
+        self._code_view = \
+            memory.buf[code_offset:code_offset + code_size].cast(CODE_TYPE)
+
+    def __len__(self):
+        return self._row_number
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @classmethod
+    def create(cls, record_list):
+        '''
+        Create a store in a new block of shared memory
+        '''
+        attribute_list = []
+        for rec in record_list:
+            for att in rec:
+                if att not in attribute_list:
+                    attribute_list.append(att)
+        builder = StoreBuilder(attribute_list)
+        builder.add_records(record_list)
+        return builder.build()
+
+    @classmethod
+    def attach(cls, name):
+        '''
+        Attach to the store of a block of shared memory
+        '''
+        memory = _attach_memory(name)
+        metadata_size = _HEADER.unpack_from(memory.buf, 0)[0]
+        attribute_list, value_list_list, row_number = pickle.loads(
+            memory.buf[_HEADER.size:_HEADER.size + metadata_size])
+        code_offset = _HEADER.size + metadata_size
+        code_offset += -code_offset % 8
+        return cls(memory, attribute_list, value_list_list, row_number,
+                   code_offset)
+
+    def get_name(self):
+        '''
+        Get the name of shared memory block
+        '''
+        return self._memory.name
+
+    def get_attribute_list(self):
+        '''
+        Get the list of attributes
+        '''
+        return self._attribute_list
+
+    def get_codes(self, attribute):
+        '''
+        Get the codes of an attribute (view of shared memory)
+        '''
+        index = self._attribute_list.index(attribute)
+        return self._code_view[index * self._row_number:
+                               (index + 1) * self._row_number]
+
+    def get_values(self, attribute):
+        '''
+        Get the dictionary of an attribute (values by code)
+        '''
+        return self._value_list_list[self._attribute_list.index(attribute)]
+
+    def get_record(self, row_id):
+        '''
+        Decode a record
+        '''
+        record = {}
+        for index, att in enumerate(self._attribute_list):
+            code = self._code_view[index * self._row_number + row_id]
+            if code != MISSING_CODE:
+                record[att] = self._value_list_list[index][code]
+        return record
+
+    def get_records(self, row_id_list):
+        '''
+        Decode records of a vector of row ids
+        '''
+        return [self.get_record(row_id) for row_id in row_id_list]
+
+    def close(self):
+        '''
+        Close access to the store (in this process)
+        '''
+        if self._code_view is not None:
+            self._code_view.release()
+            self._code_view = None
+            self._memory.close()
+
+    def unlink(self):
+        '''
+        Free the shared memory block (only by the creator)
+        '''
+        self.close()
+        self._memory.unlink()
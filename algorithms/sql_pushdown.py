@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+'''
+Module with partition algorithms computed by SQLite (SQL pushdown)
+
+Each comparison of a compiled theory is translated to SQL:
+    - Preferred and non preferred formulas are predicates over the
+      intervals of their attributes (NULL results are false)
+    - The partition of a record (attributes not in the indifferent set)
+      is matched by NULL-safe equality (IS) of those columns
+    - A record is dominated if it satisfies the non preferred formula (and
+      not the preferred one) and there is a record of its partition
+      satisfying the preferred formula (NOT EXISTS anti-join)
+
+Best records are selected by one query. Top-k records are computed by
+levels: rows of a temporary table get their level by an UPDATE for each
+level (rows not dominated by rows without level), until there are k rows
+with levels. Only result rows are read by Python. The temporary table is
+used inside a savepoint, so the transaction state of the connection is
+not changed
+'''
+
+import uuid
+
+from preference.compiled import get_compiled_theory
+from preference.interval import Interval, MINUS_INF, PLUS_INF, \
+    EQUAL_KIND, DIFFERENT_KIND
+from algorithms.sqlite_reader import quote_name, get_table_columns
+
+# Column of levels in temporary tables
+LEVEL_COLUMN = '_pref_level'
+# Aliases of records (dominated and dominant ones)
+RECORD_ALIAS = 'r'
+OTHER_ALIAS = 'o'
+
+
+def join_sql(sql_list, operator):
+    '''
+    Join SQL predicates by an operator (AND, OR) as a balanced tree, so
+    long lists do not exceed SQLite expression depth
+    '''
+    if len(sql_list) == 1:
+        return sql_list[0]
+    middle = len(sql_list) // 2
+    return '(' + join_sql(sql_list[:middle], operator) + ' ' + operator + \
+        ' ' + join_sql(sql_list[middle:], operator) + ')'
+
+
+def get_interval_sql(column, interval):
+    '''
+    Get the SQL predicate (and its parameters) of a column in an interval
+    '''
+    if not isinstance(interval, Interval):
+        return column + ' = ?', [interval]
+    if interval.get_kind() == EQUAL_KIND:
+        return column + ' = ?', [interval.get_low()]
+    if interval.get_kind() == DIFFERENT_KIND:
+        return column + ' IS NOT ?', [interval.get_low()]
+    sql_list = []
+    parameter_list = []
+    if interval.get_low() != MINUS_INF:
+        operator = ' >= ?' if interval.is_low_closed() else ' > ?'
+        sql_list.append(column + operator)
+        parameter_list.append(interval.get_low())
+    if interval.get_high() != PLUS_INF:
+        operator = ' <= ?' if interval.is_high_closed() else ' < ?'
+        sql_list.append(column + operator)
+        parameter_list.append(interval.get_high())
+    if not sql_list:
+        return '1', []
+    return join_sql(sql_list, 'AND'), parameter_list
+
+
+def get_formula_sql(formula, alias, column_list):
+    '''
+    Get the SQL predicate (and its parameters) of a formula over the
+    columns of an alias (NULL results are false)
+    '''
+    sql_list = []
+    parameter_list = []
+    for att in sorted(formula):
+        if att not in column_list:
+            # Records without the attribute do not satisfy the formula
+            return '0', []
+        sql, att_parameter_list = \
+            get_interval_sql(alias + '.' + quote_name(att), formula[att])
+        sql_list.append('(' + sql + ')')
+        parameter_list += att_parameter_list
+    if not sql_list:
+        return '1', []
+    return 'COALESCE(' + join_sql(sql_list, 'AND') + ', 0)', parameter_list
+
+
+def get_dominated_sql(comparison, column_list, table_sql, other_filter):
+    '''
+    Get the SQL predicate (and its parameters) of a record dominated by
+    other record of a table according to a comparison
+
+    'other_filter' is a predicate over other records (for levels)
+    '''
+    best_sql, best_list = get_formula_sql(
+        comparison.get_preferred_formula(), RECORD_ALIAS, column_list)
+    worst_sql, worst_list = get_formula_sql(
+        comparison.get_notpreferred_formula(), RECORD_ALIAS, column_list)
+    other_sql, other_list = get_formula_sql(
+        comparison.get_preferred_formula(), OTHER_ALIAS, column_list)
+    # Partition: same values of attributes not in indifferent set
+    sql_list = [other_sql]
+    for att in column_list:
+        if att not in comparison.get_indifferent_set():
+            sql_list.append(OTHER_ALIAS + '.' + quote_name(att) + ' IS ' +
+                            RECORD_ALIAS + '.' + quote_name(att))
+    if other_filter:
+        sql_list.append(other_filter)
+    sql = '(' + worst_sql + ' AND NOT ' + best_sql + \
+        ' AND EXISTS (SELECT 1 FROM ' + table_sql + ' AS ' + OTHER_ALIAS + \
+        ' WHERE ' + join_sql(sql_list, 'AND') + '))'
+    return sql, worst_list + best_list + other_list
+
+
+def get_best_sql(theory, column_list, table_sql, other_filter=None):
+    '''
+    Get the SQL predicate (and its parameters) of a record not dominated
+    by any record of a table
+    '''
+    sql_list = []
+    parameter_list = []
+    for comp in theory.get_comparison_list():
+        sql, comp_parameter_list = get_dominated_sql(comp, column_list,
+                                                     table_sql, other_filter)
+        sql_list.append('NOT ' + sql)
+        parameter_list += comp_parameter_list
+    if not sql_list:
+        return '1', []
+    return join_sql(sql_list, 'AND'), parameter_list
+
+
+def get_comparable_sql(theory, column_list):
+    '''
+    Get the SQL predicate (and its parameters) of a record satisfying some
+    formula of a comparison (see maxpref.py)
+    '''
+    sql_list = []
+    parameter_list = []
+    for comp in theory.get_comparison_list():
+        for formula in [comp.get_preferred_formula(),
+                        comp.get_notpreferred_formula()]:
+            sql, formula_parameter_list = \
+                get_formula_sql(formula, RECORD_ALIAS, column_list)
+            sql_list.append(sql)
+            parameter_list += formula_parameter_list
+    if not sql_list:
+        return '0', []
+    return join_sql(sql_list, 'OR'), parameter_list
+
+
+def _get_records(cursor, column_list):
+    '''
+    Get the records of a cursor
+    '''
+    return [dict(zip(column_list, row)) for row in cursor.fetchall()]
+
+
+def partition_best_sql(theory, connection, table, comparable_only=False):
+    '''
+    Get best records of a table computed by SQLite
+    (only comparable records if 'comparable_only' is True)
+    '''
+    column_list = get_table_columns(connection, table)
+    table_sql = quote_name(table)
+    sql, parameter_list = get_best_sql(theory, column_list, table_sql)
+    if comparable_only:
+        comparable_sql, comparable_list = \
+            get_comparable_sql(theory, column_list)
+        sql = '(' + comparable_sql + ') AND (' + sql + ')'
+        parameter_list = comparable_list + parameter_list
+    cursor = connection.execute(
+        'SELECT ' + ', '.join([RECORD_ALIAS + '.' + quote_name(col)
+                               for col in column_list]) +
+        ' FROM ' + table_sql + ' AS ' + RECORD_ALIAS + ' WHERE ' + sql + ';',
+        parameter_list)
+    return _get_records(cursor, column_list)
+
+
+def partition_topk_sql(theory, connection, table, k, comparable_only=False):
+    '''
+    Get top-k records of a table computed by SQLite
+    (only comparable records if 'comparable_only' is True)
+
+    Records of a level are in table order and the last level is cut in
+    table order (as decomposed_topk, see planner.py), so records of a cut
+    level may differ from the ones of partition_topk
+    '''
+    if k <= 0:
+        return []
+    column_list = get_table_columns(connection, table)
+    column_sql = ', '.join([quote_name(col) for col in column_list])
+    level_name = quote_name('_pref_' + uuid.uuid4().hex)
+    # Releasing the outermost savepoint ends the transaction it began
+    connection.execute('SAVEPOINT ' + level_name + ';')
+    try:
+        return _partition_topk_sql(theory, connection, table, k,
+                                   comparable_only, column_list,
+                                   column_sql, level_name)
+    finally:
+        connection.execute('RELEASE ' + level_name + ';')
+
+
+def _partition_topk_sql(theory, connection, table, k, comparable_only,
+                        column_list, column_sql, level_table):
+    '''
+    Get top-k records of a table by levels of a temporary table
+    (see partition_topk_sql)
+    '''
+    where_sql = ''
+    parameter_list = []
+    if comparable_only:
+        where_sql, parameter_list = get_comparable_sql(theory, column_list)
+        where_sql = ' WHERE ' + where_sql
+    # Rows of temporary table are in table order (rowid is the position)
+    connection.execute('CREATE TEMP TABLE ' + level_table + ' AS SELECT ' +
+                       'NULL AS ' + LEVEL_COLUMN + ', ' + column_sql +
+                       ' FROM ' + quote_name(table) + ' AS ' + RECORD_ALIAS +
+                       where_sql + ';', parameter_list)
+    try:
+        level_column = quote_name(LEVEL_COLUMN)
+        best_sql, parameter_list = get_best_sql(
+            theory, column_list, level_table,
+            OTHER_ALIAS + '.' + level_column + ' IS NULL')
+        # Rows of a level are selected before update (IN is not correlated)
+        update_sql = \
+            'UPDATE ' + level_table + ' SET ' + level_column + ' = ? ' + \
+            'WHERE rowid IN (SELECT ' + RECORD_ALIAS + '.rowid FROM ' + \
+            level_table + ' AS ' + RECORD_ALIAS + ' WHERE ' + \
+            RECORD_ALIAS + '.' + level_column + ' IS NULL AND ' + \
+            best_sql + ');'
+        level = 0
+        record_number = 0
+        while record_number < k:
+            level += 1
+            cursor = connection.execute(update_sql, [level] + parameter_list)
+            if cursor.rowcount <= 0:
+                break
+            record_number += cursor.rowcount
+        cursor = connection.execute(
+            'SELECT ' + column_sql + ' FROM ' + level_table + ' WHERE ' +
+            level_column + ' IS NOT NULL ORDER BY ' + level_column +
+            ', rowid LIMIT ?;', [k])
+        return _get_records(cursor, column_list)
+    finally:
+        connection.execute('DROP TABLE ' + level_table + ';')
+
+
+def load_records(connection, table, record_list):
+    '''
+    Create a table with records (attributes of first record)
+    '''
+    attribute_list = list(record_list[0]) if record_list else []
+    connection.execute('CREATE TABLE ' + quote_name(table) + ' (' +
+                       ', '.join([quote_name(att)
+                                  for att in attribute_list]) + ');')
+    connection.executemany(
+        'INSERT INTO ' + quote_name(table) + ' VALUES (' +
+        ', '.join(['?'] * len(attribute_list)) + ');',
+        [tuple([rec[att] for att in attribute_list])
+         for rec in record_list])
+
+
+def get_best_partition_sql(preference_text, connection, table):
+    '''
+    Get best records of a table according to CPTheory (computed by SQLite)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return partition_best_sql(theory, connection, table)
+
+
+def get_topk_partition_sql(preference_text, connection, table, k):
+    '''
+    Returns the top-k records of a table (computed by SQLite)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return partition_topk_sql(theory, connection, table, k)
+
+
+def get_mbest_partition_sql(preference_text, connection, table):
+    '''
+    Get best comparable records of a table according to CPTheory
+    (computed by SQLite)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return partition_best_sql(theory, connection, table, True)
+
+
+def get_mtopk_partition_sql(preference_text, connection, table, k):
+    '''
+    Returns the top-k comparable records of a table (computed by SQLite)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    return partition_topk_sql(theory, connection, table, k, True)
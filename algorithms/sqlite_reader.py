@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+'''
+Module to read records from SQLite tables
+
+Rows are fetched by batches (cursor.fetchmany) in a single scan of the
+table and converted to records (dictionaries) or encoded by column in a
+record store (see record_store.py), without sqlite3.Row objects.
+
+Records may be projected on the attributes used by a theory. Other columns
+are only compared for equality (ceteris paribus), so they are replaced by
+a digest of their values (attribute DIGEST_ATTRIBUTE)
+'''
+
+import hashlib
+
+from preference.compiled import get_compiled_theory
+from algorithms.planner import get_free_attributes
+from algorithms.record_store import StoreBuilder
+
+# Default number of rows of each batch
+DEFAULT_BATCH_SIZE = 1000
+# Attribute with the digest of columns not used by theory
+DIGEST_ATTRIBUTE = '_digest'
+# Size of digests (bytes)
+DIGEST_SIZE = 16
+
+
+def quote_name(name):
+    '''
+    Quote a SQL identifier (table or column name)
+    '''
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_table_columns(connection, table):
+    '''
+    Get the list of columns of a table
+    '''
+    cursor = connection.execute('SELECT * FROM ' + quote_name(table) +
+                                ' LIMIT 0;')
+    return [description[0] for description in cursor.description]
+
+
+def get_theory_attributes(theory):
+    '''
+    Get the attributes used by a theory (attributes of comparison formulas
+    and attributes changed by rules)
+    '''
+    attribute_set = get_free_attributes(theory)
+    for comp in theory.get_comparison_list():
+        attribute_set.update(comp.get_preferred_formula())
+        attribute_set.update(comp.get_notpreferred_formula())
+        attribute_set.update(comp.get_indifferent_set())
+    return attribute_set
+
+
+def get_digest(value_list):
+    '''
+    Get the digest of a list of values
+    (integral floats are converted to int, so 1 and 1.0 are equal as they
+    are in Python)
+    '''
+    value_list = [int(value) if isinstance(value, float) and
+                  value.is_integer() else value
+                  for value in value_list]
+    return hashlib.blake2b(repr(value_list).encode('utf-8'),
+                           digest_size=DIGEST_SIZE).digest()
+
+
+class TableReader(object):
+    '''
+    Class to read the records of a table by batches
+
+    If a theory (preference text or compiled theory) is given, records have
+    only the columns used by the theory and a digest of other columns
+    '''
+
+    def __init__(self, connection, table, theory=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self._connection = connection
+        self._table = table
+        self._batch_size = batch_size
+        column_list = get_table_columns(connection, table)
+        if theory is None:
+            self._column_list = column_list
+            self._digest_list = []
+        else:
+            attribute_set = \
+                get_theory_attributes(get_compiled_theory(theory))
+            self._column_list = [col for col in column_list
+                                 if col in attribute_set]
+            self._digest_list = [col for col in column_list
+                                 if col not in attribute_set]
+        self._attribute_list = list(self._column_list)
+        if self._digest_list:
+            self._attribute_list.append(DIGEST_ATTRIBUTE)
+
+    def get_attribute_list(self):
+        '''
+        Get the attributes of records
+        '''
+        return self._attribute_list
+
+    def batches(self):
+        '''
+        Generate batches of rows (tuples of values in attribute order)
+        by a single scan of the table
+        '''
+        column_list = self._column_list + self._digest_list
+        cursor = self._connection.execute(
+            'SELECT ' + ', '.join([quote_name(col) for col in column_list]) +
+            ' FROM ' + quote_name(self._table) + ';')
+        try:
+            column_number = len(self._column_list)
+            while True:
+                row_list = cursor.fetchmany(self._batch_size)
+                if not row_list:
+                    break
+                if self._digest_list:
+                    row_list = [row[:column_number] +
+                                (get_digest(row[column_number:]),)
+                                for row in row_list]
+                yield row_list
+        finally:
+            cursor.close()
+
+    def records(self):
+        '''
+        Generate the records of the table
+        '''
+        attribute_list = self._attribute_list
+        for row_list in self.batches():
+            for row in row_list:
+                yield dict(zip(attribute_list, row))
+
+    def read_records(self):
+        '''
+        Get the list of records of the table
+        '''
+        return list(self.records())
+
+    def read_store(self):
+        '''
+        Encode the rows of the table in a record store
+        (the caller must unlink the store)
+        '''
+        builder = StoreBuilder(self._attribute_list)
+        for row_list in self.batches():
+            builder.add_rows(row_list)
+        return builder.build()
+
+
+def read_table(data_file, table, theory=None,
+               batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Get the list of records of a table of a database file
+    '''
+    import sqlite3
+    connection = sqlite3.connect(data_file)
+    try:
+        return TableReader(connection, table, theory,
+                           batch_size).read_records()
+    finally:
+        connection.close()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+'''
+Module with streaming preference algorithms (generators)
+
+Records are read from an iterator (for example a database cursor) and
+best records are yielded as soon as they are confirmed:
+    - A record satisfying no non preferred formula of any comparison can
+      not be dominated, so it is yielded when it is read
+    - Other records wait until the end of the input, then the remaining
+      ones are yielded ordered by level of max formulas (records of
+      first levels first, see CPTheory.get_max_formula_levels)
+
+Confirmed records are not kept, except by BNL when they may dominate
+next records (partition algorithm keeps only partition keys)
+'''
+
+from preference.compiled import get_compiled_theory
+from preference.rule import is_dict_satisfied_by
+
+
+def get_formula_levels(theory):
+    '''
+    Get the levels of max formulas of a compiled theory
+    (lists of formulas)
+    '''
+    formula_tuple = theory.get_max_formulas()
+    return [[formula_tuple[index] for index in level]
+            for level in theory.get_max_formula_levels()]
+
+
+def get_record_level(record, level_list):
+    '''
+    Get the level of the first max formula satisfied by a record
+    (records satisfying no max formula are after last level)
+    '''
+    for index, formula_list in enumerate(level_list):
+        for formula in formula_list:
+            if is_dict_satisfied_by(formula, record):
+                return index
+    return len(level_list)
+
+
+def sort_by_level(theory, record_list):
+    '''
+    Sort records by level of max formulas (stable sort)
+    '''
+    level_list = get_formula_levels(theory)
+    return sorted(record_list,
+                  key=lambda rec: get_record_level(rec, level_list))
+
+
+def is_undominated(theory, record):
+    '''
+    Check if a record can not be dominated by any record
+    (it satisfies no non preferred formula)
+    '''
+    for comp in theory.get_comparison_list():
+        if comp.is_worst_record(record):
+            return False
+    return True
+
+
+def can_dominate(theory, record):
+    '''
+    Check if a record may dominate other records
+    (it satisfies some preferred formula)
+    '''
+    for comp in theory.get_comparison_list():
+        if comp.is_best_record(record):
+            return True
+    return False
+
+
+def bnl_stream(theory, record_iter):
+    '''
+    Generate best records of an iterator by BNL
+
+    The window has the records not dominated by previous records,
+    a record dominated by a window record is discarded (every record it
+    dominates is dominated by the window record too)
+    '''
+    # Window of pairs [record, confirmed]
+    window_list = []
+    for rec in record_iter:
+        dominated = False
+        for other_rec, _ in window_list:
+            if theory.dominates(other_rec, rec):
+                dominated = True
+                break
+        if dominated:
+            continue
+        window_list = [item for item in window_list
+                       if not theory.dominates(rec, item[0])]
+        if is_undominated(theory, rec):
+            yield rec
+            # Confirmed records are kept only to dominate next records
+            if can_dominate(theory, rec):
+                window_list.append([rec, True])
+        else:
+            window_list.append([rec, False])
+    for rec in sort_by_level(theory, [rec for rec, confirmed in window_list
+                                      if not confirmed]):
+        yield rec
+
+
+class PartitionStream(object):
+    '''
+    Class to represent the state of streaming partition algorithm
+
+    For each comparison, the partition keys of records satisfying the
+    preferred formula are kept. A record satisfying the non preferred
+    formula is dominated if there is a record with the same key
+    satisfying the preferred formula (before or after it), so records
+    wait (pending) until the end of the input or until they are dominated.
+    If 'comparable_only' is True, records satisfying no formula of any
+    comparison are discarded (see maxpref.py)
+    '''
+
+    def __init__(self, theory, comparable_only=False):
+        self._theory = theory
+        self._comparable_only = comparable_only
+        self._comparison_list = theory.get_comparison_list()
+        # Partition key attributes of each comparison (set by first record)
+        self._key_list = None
+        # Keys of records satisfying preferred formula of each comparison
+        self._best_key_list = [set() for _ in self._comparison_list]
+        # Pending records (by serial number) and their serial numbers by
+        # key for each comparison with the non preferred formula satisfied
+        self._pending_dict = {}
+        self._worst_key_list = [{} for _ in self._comparison_list]
+        self._serial = 0
+
+    def _get_key(self, index, record):
+        '''
+        Get the partition key of a record for a comparison
+        '''
+        return tuple([record[att] for att in self._key_list[index]])
+
+    def add(self, record):
+        '''
+        Add a record and return the list of confirmed best records
+        '''
+        if self._key_list is None:
+            self._key_list = [
+                sorted(att for att in record
+                       if att not in comp.get_indifferent_set())
+                for comp in self._comparison_list]
+        worst_list = []
+        dominated = False
+        comparable = False
+        for index, comp in enumerate(self._comparison_list):
+            if comp.is_best_record(record):
+                comparable = True
+                key = self._get_key(index, record)
+                self._best_key_list[index].add(key)
+                # Pending records of this key are dominated
+                for serial in self._worst_key_list[index].pop(key, []):
+                    self._pending_dict.pop(serial, None)
+            elif comp.is_worst_record(record):
+                comparable = True
+                key = self._get_key(index, record)
+                if key in self._best_key_list[index]:
+                    dominated = True
+                else:
+                    worst_list.append((index, key))
+        if dominated or (self._comparable_only and not comparable):
+            return []
+        if not worst_list:
+            return [record]
+        self._serial += 1
+        self._pending_dict[self._serial] = record
+        for index, key in worst_list:
+            self._worst_key_list[index].setdefault(key, []).append(
+                self._serial)
+        return []
+
+    def flush(self):
+        '''
+        Get the pending best records (end of input) ordered by level of
+        max formulas
+        '''
+        record_list = [self._pending_dict[serial]
+                       for serial in sorted(self._pending_dict)]
+        self._pending_dict = {}
+        self._worst_key_list = [{} for _ in self._comparison_list]
+        return sort_by_level(self._theory, record_list)
+
+
+def partition_stream(theory, record_iter, comparable_only=False):
+    '''
+    Generate best records of an iterator by streaming partition algorithm
+    (only comparable records if 'comparable_only' is True)
+    '''
+    stream = PartitionStream(theory, comparable_only)
+    for rec in record_iter:
+        for best_rec in stream.add(rec):
+            yield best_rec
+    for best_rec in stream.flush():
+        yield best_rec
+
+
+def get_best_stream(preference_text, record_iter):
+    '''
+    Generate best records according to CPTheory (BNL over an iterator)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return
+    for rec in bnl_stream(theory, record_iter):
+        yield rec
+
+
+def get_best_partition_stream(preference_text, record_iter):
+    '''
+    Generate best records according to CPTheory
+    (partition algorithm over an iterator)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return
+    for rec in partition_stream(theory, record_iter):
+        yield rec
+
+
+def get_mbest_partition_stream(preference_text, record_iter):
+    '''
+    Generate best comparable records according to CPTheory
+    (maxpref partition algorithm over an iterator)
+    '''
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return
+    for rec in partition_stream(theory, record_iter, True):
+        yield rec
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for asyncio algorithms testing
+(records are read from the database by an async reader)
+'''
+
+import asyncio
+import os
+import sys
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Time (seconds) of reading each record when cancelled
+CANCEL_DELAY = 0.01
+
+
+async def slow_records(record_source):
+    '''
+    Generate records slowly (to be cancelled while reading)
+    '''
+    async for rec in record_source:
+        await asyncio.sleep(CANCEL_DELAY)
+        yield rec
+
+
+async def print_records(record_iter):
+    '''
+    Print records of an async iterator
+    '''
+    async for rec in record_iter:
+        print(rec)
+
+
+async def run_queries(preference, data_file, data_table):
+    '''
+    Run best, top-3 (by levels) and streaming best queries
+    '''
+    from algorithms.async_algorithms import AsyncTableReader, \
+        get_best_partition_async, topk_levels_async, \
+        stream_best_partition_async
+
+    async with AsyncTableReader(data_file, data_table) as reader:
+        print('\n\nBest records:')
+        for rec in await get_best_partition_async(preference, reader):
+            print(rec)
+
+    async with AsyncTableReader(data_file, data_table) as reader:
+        print('\n\nTop-3 records (by levels):')
+        async for level in topk_levels_async(preference, reader, 3):
+            print('Level:')
+            for rec in level:
+                print(rec)
+
+    async with AsyncTableReader(data_file, data_table) as reader:
+        print('\n\nBest records (streaming):')
+        async for rec in stream_best_partition_async(preference, reader):
+            print(rec)
+
+    # Reader is closed while a cancelled task had a batch generator open
+    async with AsyncTableReader(data_file, data_table,
+                                batch_size=1) as reader:
+        print('\n\nBest records (streaming, cancelled):')
+        task = asyncio.ensure_future(print_records(
+            stream_best_partition_async(preference, slow_records(reader),
+                                        batch_size=1)))
+        await asyncio.sleep(CANCEL_DELAY * 3.5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            print('Cancelled')
+
+
+if __name__ == '__main__':
+    from preference.artifact import read_preference_file
+
+    if len(sys.argv) != 4:
+        exit(0)
+    PREF_TEXT, COMPILED = read_preference_file(sys.argv[1])
+    # Precompiled theory is used if it is up to date (see precompile.py)
+    PREFERENCE = PREF_TEXT if COMPILED is None else COMPILED
+    print('\n\nPreferences:')
+    print(PREF_TEXT)
+    asyncio.run(run_queries(PREFERENCE, sys.argv[2], sys.argv[3]))
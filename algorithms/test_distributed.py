@@ -0,0 +1,55 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for sharded best algorithm testing
+
+Usage: test_distributed.py <preference file> <database> <table> [<workers>]
+Records are split in shards held by local worker processes (default 3)
+'''
+
+import os
+import sys
+import sqlite3
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Default number of workers
+WORKER_NUMBER = 3
+
+
+if __name__ == '__main__':
+    from preference.artifact import read_preference_file
+    from algorithms.sqlite_reader import TableReader
+    from algorithms.distributed import get_best_partition_distributed, \
+        get_topk_partition_distributed
+
+    if len(sys.argv) not in [4, 5]:
+        exit(0)
+    PREF_TEXT, COMPILED = read_preference_file(sys.argv[1])
+    # Precompiled theory is used if it is up to date (see precompile.py)
+    PREFERENCE = PREF_TEXT if COMPILED is None else COMPILED
+    DATA_FILE = sys.argv[2]
+    DATA_TABLE = sys.argv[3]
+    if len(sys.argv) == 5:
+        WORKER_NUMBER = int(sys.argv[4])
+    print('\n\nPreferences:')
+    print(PREF_TEXT)
+    CON = sqlite3.connect(DATA_FILE)
+    REC_LIST = TableReader(CON, DATA_TABLE).read_records()
+    print('\n\nInput records:')
+    for rec in REC_LIST:
+        print(rec)
+
+    print('\n\nBest records (%d workers):' % WORKER_NUMBER)
+    BEST_LIST = get_best_partition_distributed(PREFERENCE, REC_LIST,
+                                               WORKER_NUMBER)
+    for rec in BEST_LIST:
+        print(rec)
+
+    print('\n\nTop-3 records (%d workers):' % WORKER_NUMBER)
+    BEST_LIST = get_topk_partition_distributed(PREFERENCE, REC_LIST, 3,
+                                               WORKER_NUMBER)
+    for rec in BEST_LIST:
+        print(rec)
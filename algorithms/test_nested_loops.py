@@ -14,38 +14,32 @@ sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
 
 
 if __name__ == '__main__':
+    from preference.artifact import read_preference_file
+    from algorithms.sqlite_reader import TableReader
     from algorithms.nested_loops import get_best, get_topk
 
     if len(sys.argv) != 4:
         exit(0)
-    PREF_FILE = open(sys.argv[1])
-    PREF_TEXT = PREF_FILE.read()
+    PREF_TEXT, COMPILED = read_preference_file(sys.argv[1])
+    # Precompiled theory is used if it is up to date (see precompile.py)
+    PREFERENCE = PREF_TEXT if COMPILED is None else COMPILED
     DATA_FILE = sys.argv[2]
     DATA_TABLE = sys.argv[3]
-    REC_LIST = []
     print('\n\nPreferences:')
     print(PREF_TEXT)
     CON = sqlite3.connect(DATA_FILE)
-    CON.row_factory = sqlite3.Row
-    CURSOR = CON.cursor()
-    CURSOR.execute('SELECT * FROM ' + DATA_TABLE + ';')
+    # Records are read once (single scan), BNL changes its input lists
+    REC_LIST = TableReader(CON, DATA_TABLE).read_records()
     print('\n\nInput records:')
-    for rec in CURSOR.fetchall():
-        REC_LIST.append(dict(rec))
-        print(dict(rec))
+    for rec in REC_LIST:
+        print(rec)
+
     print('\n\nBest records:')
-    BEST_LIST = get_best(PREF_TEXT, REC_LIST)
+    BEST_LIST = get_best(PREFERENCE, list(REC_LIST))
     for rec in BEST_LIST:
         print(rec)
 
-    REC_LIST = []
-    CURSOR.execute('SELECT * FROM ' + DATA_TABLE + ';')
-    print('\n\nInput records:')
-    for rec in CURSOR.fetchall():
-        REC_LIST.append(dict(rec))
-        print(dict(rec))
-
     print('\n\nTop-3 records:')
-    BEST_LIST = get_topk(PREF_TEXT, REC_LIST, 3)
+    BEST_LIST = get_topk(PREFERENCE, list(REC_LIST), 3)
     for rec in BEST_LIST:
         print(rec)
@@ -0,0 +1,40 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for streaming best algorithms testing
+(records are read from the database cursor while best records are printed)
+'''
+
+import os
+import sys
+import sqlite3
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+
+if __name__ == '__main__':
+    from preference.artifact import read_preference_file
+    from algorithms.sqlite_reader import TableReader
+    from algorithms.streaming import get_best_stream, \
+        get_best_partition_stream, get_mbest_partition_stream
+
+    if len(sys.argv) != 4:
+        exit(0)
+    PREF_TEXT, COMPILED = read_preference_file(sys.argv[1])
+    # Precompiled theory is used if it is up to date (see precompile.py)
+    PREFERENCE = PREF_TEXT if COMPILED is None else COMPILED
+    DATA_FILE = sys.argv[2]
+    DATA_TABLE = sys.argv[3]
+    print('\n\nPreferences:')
+    print(PREF_TEXT)
+    CON = sqlite3.connect(DATA_FILE)
+    READER = TableReader(CON, DATA_TABLE)
+
+    for NAME, FUNCTION in [('BNL', get_best_stream),
+                           ('partition', get_best_partition_stream),
+                           ('maxpref', get_mbest_partition_stream)]:
+        print('\n\nBest records (%s):' % NAME)
+        for rec in FUNCTION(PREFERENCE, READER.records()):
+            print(rec)
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module to verify that SQL pushdown produces the in-memory results
+
+Usage: verify_sql.py [<records>]
+For each example (tables of db.sql in an in-memory database) and for
+random records of example_soccer (default 2000), best and top-k records
+computed by SQLite (see sql_pushdown.py) must be the records of partition
+and maxpref algorithms decomposed by frozen attributes (see planner.py).
+Top-k records are checked with all levels and with values of k cutting
+levels (records of a cut level are kept in input order by both)
+'''
+
+import glob
+import os
+import sqlite3
+import sys
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Default number of random records
+RECORD_NUMBER = 2000
+
+
+def get_examples():
+    '''
+    Get the list of examples (database script, preference files)
+    '''
+    example_list = []
+    for dir_name in sorted(glob.glob(os.path.join(PATH, 'example_*'))):
+        example_list.append(
+            (os.path.join(dir_name, 'db.sql'),
+             sorted(glob.glob(os.path.join(dir_name, 'pref*.txt')))))
+    return example_list
+
+
+def get_tables(connection):
+    '''
+    Get the list of tables of a database
+    '''
+    return [row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table';")]
+
+
+def get_k_list(record_number, best_number):
+    '''
+    Get the values of k to verify: all records and values cutting the
+    first and second levels (when they have more than one record)
+    '''
+    k_set = set([record_number, best_number - 1, best_number + 1])
+    return sorted([k for k in k_set if 0 < k <= record_number])
+
+
+def verify_table(preference_text, connection, table):
+    '''
+    Verify a table, return the list of queries with differences
+    '''
+    from preference.compiled import get_compiled_theory
+    from algorithms.planner import PARTITION_ALGORITHM, MAXPREF_ALGORITHM, \
+        decomposed_best, decomposed_topk
+    from algorithms.sqlite_reader import TableReader
+    from algorithms.sql_pushdown import partition_best_sql, \
+        partition_topk_sql
+    theory = get_compiled_theory(preference_text)
+    if not theory.is_consistent():
+        return []
+    record_list = TableReader(connection, table).read_records()
+    diff_list = []
+    for name, algorithm, comparable_only in \
+            [('partition', PARTITION_ALGORITHM, False),
+             ('maxpref', MAXPREF_ALGORITHM, True)]:
+        best_list = decomposed_best(theory, record_list, algorithm)
+        if partition_best_sql(theory, connection, table,
+                              comparable_only) != best_list:
+            diff_list.append(name + ' best')
+        for k in get_k_list(len(record_list), len(best_list)):
+            if partition_topk_sql(theory, connection, table, k,
+                                  comparable_only) != \
+                    decomposed_topk(theory, record_list, k, algorithm):
+                diff_list.append(name + ' top-' + str(k))
+    return diff_list
+
+
+if __name__ == '__main__':
+    from algorithms.bench_parallel import random_records
+    from algorithms.sql_pushdown import load_records
+    if len(sys.argv) > 1:
+        RECORD_NUMBER = int(sys.argv[1])
+    CASE_LIST = []
+    for SCRIPT_FILE, PREF_LIST in get_examples():
+        CON = sqlite3.connect(':memory:')
+        with open(SCRIPT_FILE) as script_file:
+            CON.executescript(script_file.read())
+        for TABLE in get_tables(CON):
+            for PREF_FILE in PREF_LIST:
+                CASE_LIST.append((PREF_FILE, CON, TABLE))
+    CON = sqlite3.connect(':memory:')
+    load_records(CON, 'random_players', random_records(RECORD_NUMBER))
+    for PREF_FILE in sorted(glob.glob(os.path.join(PATH, 'example_soccer',
+                                                   'pref*.txt'))):
+        CASE_LIST.append((PREF_FILE, CON, 'random_players'))
+    DIFFERENT_NUMBER = 0
+    for PREF_FILE, CON, TABLE in CASE_LIST:
+        with open(PREF_FILE) as pref_file:
+            DIFF_LIST = verify_table(pref_file.read(), CON, TABLE)
+        CASE_NAME = os.path.relpath(PREF_FILE, PATH) + ' (' + TABLE + ')'
+        if DIFF_LIST:
+            DIFFERENT_NUMBER += 1
+            print('different: ' + CASE_NAME + ' (' +
+                  ', '.join(DIFF_LIST) + ')')
+        else:
+            print('same: ' + CASE_NAME)
+    print('%d of %d cases with differences' % (DIFFERENT_NUMBER,
+                                               len(CASE_LIST)))
+    if DIFFERENT_NUMBER:
+        exit(1)
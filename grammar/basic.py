@@ -3,40 +3,14 @@
 Module for basic grammar used by others grammars
 '''
 
+import re
+
 # PyParsing import
 from pyparsing import Suppress, Word, alphas, alphanums, \
-    oneOf, nums, Optional, sglQuotedString, Combine
+    oneOf, sglQuotedString, Regex
 
 from grammar.symbols import MINUS_OP, COMPARISON_OP_SET
-from preference.interval import parse_interval, get_str_predicate
-
-
-class ParsedPredicate(object):
-    '''
-    Class to represent parsed predicates
-    '''
-
-    def __init__(self, term):
-        self._attribute = term.attribute
-        self._interval = parse_interval(term)
-
-    def __str__(self):
-        return get_str_predicate(self._attribute, self._interval)
-
-    def __repr__(self):
-        return self.__str__()
-
-    def get_attribute(self):
-        '''
-        Return the predicate attribute
-        '''
-        return self._attribute
-
-    def get_interval(self):
-        '''
-        Return the predicate interval
-        '''
-        return self._interval
+from grammar.parsed import ParsedPredicate
 
 
 def identifier_token():
@@ -57,7 +31,8 @@ def string_value():
     '''
     Grammar for string values
     '''
-    string_token = sglQuotedString
+    # Copy, so the parse action does not change pyparsing shared object
+    string_token = sglQuotedString.copy()
     string_token.setParseAction(lambda t: t[0][1:-1])
     return string_token
 
@@ -67,7 +42,8 @@ def float_value():
     Grammar for float values
     '''
     from grammar.symbols import DOT
-    float_t = Combine(Optional(MINUS_OP) + Word(nums) + DOT + Word(nums))
+    # Single regular expression (faster than combined tokens)
+    float_t = Regex(re.escape(MINUS_OP) + r'?\d+' + re.escape(DOT) + r'\d+')
     float_t.setParseAction(lambda t: float(t[0]))
     return float_t
 
@@ -76,7 +52,7 @@ def integer_value():
     '''
     Grammar for integer numbers
     '''
-    integer_t = Combine(Optional(MINUS_OP) + Word(nums))
+    integer_t = Regex(re.escape(MINUS_OP) + r'?\d+')
     integer_t.setParseAction(lambda t: int(t[0]))
     return integer_t
 
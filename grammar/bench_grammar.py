@@ -0,0 +1,98 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for grammar parse time benchmark
+
+Usage: bench_grammar.py [<size> ...]
+Random theories of increasing number of rules are parsed with the shared
+grammar, with the recursive-descent parser and then again with packrat
+memoization enabled
+'''
+
+import os
+import random
+import sys
+import timeit
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Default theory sizes (number of rules)
+SIZE_LIST = [10, 100, 1000, 5000]
+# Number of attributes in generated theories
+ATTRIBUTE_NUMBER = 20
+
+
+def random_predicate(rand, att):
+    '''
+    Generate a random predicate over an attribute
+    '''
+    kind = rand.randint(0, 4)
+    if kind == 0:
+        return "%s = '%s'" % (att, rand.choice(['red', 'blue', 'dark red']))
+    elif kind == 1:
+        return '%s <= %d' % (att, rand.randint(0, 100))
+    elif kind == 2:
+        return '%d < %s <= %d' % (rand.randint(0, 50), att,
+                                  rand.randint(51, 100))
+    elif kind == 3:
+        return '%s <> %.1f' % (att, rand.random() * 10)
+    return '%s > -%d' % (att, rand.randint(0, 9))
+
+
+def random_theory(size, seed=0):
+    '''
+    Generate a random theory text with 'size' rules
+    '''
+    rand = random.Random(seed)
+    att_list = ['att' + str(index) for index in range(ATTRIBUTE_NUMBER)]
+    rule_list = []
+    for _ in range(size):
+        att = rand.choice(att_list)
+        rule = ''
+        if rand.random() < 0.5:
+            cond_list = [random_predicate(rand, rand.choice(att_list))
+                         for _ in range(rand.randint(1, 3))]
+            rule = 'IF ' + ' AND '.join(cond_list) + ' THEN '
+        rule += '(' + random_predicate(rand, att) + ') ' + \
+            rand.choice(['BETTER', '>']) + \
+            ' (' + random_predicate(rand, att) + ')'
+        if rand.random() < 0.5:
+            rule += '[' + ', '.join(rand.sample(att_list, 2)) + ']'
+        rule_list.append(rule)
+    return '\nAND\n'.join(rule_list)
+
+
+def bench_parse(text, repeat=3, backend=None):
+    '''
+    Get best parse time of a text (default is current parser backend)
+    '''
+    from grammar.parsers import get_theory_grammar
+    grammar = get_theory_grammar(backend)
+    return min(timeit.repeat(lambda: grammar.parse(text),
+                             number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    from grammar.parsers import DESCENT_BACKEND
+    from grammar.theory_grammar import TheoryGrammar
+    if len(sys.argv) > 1:
+        SIZE_LIST = [int(arg) for arg in sys.argv[1:]]
+    TEXT_LIST = [random_theory(size) for size in SIZE_LIST]
+    FIRST_TIME = timeit.timeit(lambda: TheoryGrammar.parse(TEXT_LIST[0]),
+                               number=1)
+    print('First parse (building grammar): %.4fs' % FIRST_TIME)
+    TIME_LIST = [bench_parse(text) for text in TEXT_LIST]
+    DESCENT_LIST = [bench_parse(text, backend=DESCENT_BACKEND)
+                    for text in TEXT_LIST]
+    TheoryGrammar.enable_packrat()
+    PACKRAT_LIST = [bench_parse(text) for text in TEXT_LIST]
+    print('%8s %12s %12s %12s %14s' % ('rules', 'parse (s)', 'descent (s)',
+                                       'packrat (s)', 'rules/s'))
+    for size, parse_time, descent_time, packrat_time in \
+            zip(SIZE_LIST, TIME_LIST, DESCENT_LIST, PACKRAT_LIST):
+        print('%8d %12.4f %12.4f %12.4f %14.1f' % (size, parse_time,
+                                                   descent_time,
+                                                   packrat_time,
+                                                   size / parse_time))
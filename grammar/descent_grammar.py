@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+'''
+Module for conditional preference theory grammar
+(hand-written tokenizer and recursive-descent parser)
+
+This parser accepts the same language of TheoryGrammar and produces the
+same parsed rules, but it does not need pyparsing
+'''
+
+import re
+
+from grammar.parsed import PredicateTerm, ParsedPredicate, ParsedRule
+from preference.symbols import IF_SYM, AND_SYM, THEN_SYM, BETTER_SYM, \
+    LEFT_BRA, RIGHT_BRA, LEFT_PAR, RIGHT_PAR, COMMA, DOT, UNDERLINE, \
+    MINUS_OP, GREATER_OP, COMPARISON_OP_SET, INTERVAL_OP_SET
+
+# Kinds of tokens
+STRING_TOKEN = 'string'
+FLOAT_TOKEN = 'float'
+INTEGER_TOKEN = 'integer'
+IDENTIFIER_TOKEN = 'identifier'
+OPERATOR_TOKEN = 'operator'
+SYMBOL_TOKEN = 'symbol'
+END_TOKEN = 'end'
+# Kinds of value tokens
+VALUE_TOKEN_SET = set([STRING_TOKEN, FLOAT_TOKEN, INTEGER_TOKEN])
+
+# Spaces between tokens (same as pyparsing default white spaces)
+_SPACE_RE = re.compile('[ \t\n\r]*')
+# Quoted string without the closing quote (same as pyparsing sglQuotedString)
+_STRING_RE = re.compile(r"'(?:[^'\n\r\\]|''|\\(?:[^x]|x[0-9a-fA-F]+))*")
+# End of numbers (keywords of TheoryGrammar can not follow identifier
+# characters, so numbers followed by them are invalid)
+_NUMBER_END = '(?![A-Za-z0-9' + UNDERLINE + '])'
+# Other tokens (operators are sorted from longest to shortest)
+_TOKEN_RE = re.compile(
+    '(?P<' + FLOAT_TOKEN + '>' + re.escape(MINUS_OP) + r'?\d+' +
+    re.escape(DOT) + r'\d+' + _NUMBER_END + ')|' +
+    '(?P<' + INTEGER_TOKEN + '>' + re.escape(MINUS_OP) + r'?\d+' +
+    _NUMBER_END + ')|' +
+    '(?P<' + IDENTIFIER_TOKEN + '>[A-Za-z' + UNDERLINE + ']' +
+    '[A-Za-z0-9' + UNDERLINE + ']*)|' +
+    '(?P<' + OPERATOR_TOKEN + '>' +
+    '|'.join(re.escape(operator)
+             for operator in sorted(COMPARISON_OP_SET, key=len,
+                                    reverse=True)) + ')|' +
+    '(?P<' + SYMBOL_TOKEN + '>' +
+    '|'.join(re.escape(symbol)
+             for symbol in [LEFT_BRA, RIGHT_BRA, LEFT_PAR, RIGHT_PAR,
+                            COMMA]) + ')')
+
+
+class DescentParseError(Exception):
+    '''
+    Exception for invalid theory texts
+    '''
+
+    def __init__(self, message, string, position):
+        Exception.__init__(self, message)
+        self.string = string
+        self.position = position
+        # Line and column of the error (as pyparsing)
+        self.lineno = string.count('\n', 0, position) + 1
+        line_start = string.rfind('\n', 0, position) + 1
+        self.col = position - line_start + 1
+        line_end = string.find('\n', position)
+        if line_end < 0:
+            line_end = len(string)
+        self.line = string[line_start:line_end]
+
+    def __str__(self):
+        return '%s (at char %d), (line:%d, col:%d)' % \
+            (self.args[0], self.position, self.lineno, self.col)
+
+
+def tokenize(string):
+    '''
+    Get the list of tokens of a string
+
+    A token is a tuple (<kind>, <value>, <position>), the last token has
+    kind END_TOKEN
+    '''
+    token_list = []
+    position = _SPACE_RE.match(string).end()
+    while position < len(string):
+        if string[position] == "'":
+            match = _STRING_RE.match(string, position)
+            end = match.end()
+            # The closing quote is not backtracked (as pyparsing)
+            if end >= len(string) or string[end] != "'":
+                raise DescentParseError('Unterminated string', string,
+                                        position)
+            end += 1
+            token_list.append((STRING_TOKEN, string[position + 1:end - 1],
+                               position))
+        else:
+            match = _TOKEN_RE.match(string, position)
+            if match is None:
+                raise DescentParseError('Invalid token', string, position)
+            kind = match.lastgroup
+            value = match.group()
+            if kind == FLOAT_TOKEN:
+                value = float(value)
+            elif kind == INTEGER_TOKEN:
+                value = int(value)
+            end = match.end()
+            token_list.append((kind, value, position))
+        position = _SPACE_RE.match(string, end).end()
+    token_list.append((END_TOKEN, None, len(string)))
+    return token_list
+
+
+class _DescentParser(object):
+    '''
+    Recursive-descent parser over a list of tokens
+    '''
+
+    def __init__(self, string):
+        self._string = string
+        self._token_list = tokenize(string)
+        self._index = 0
+
+    def _error(self, expected):
+        '''
+        Raise a parse error at current token
+        '''
+        position = self._token_list[self._index][2]
+        raise DescentParseError('Expected ' + expected, self._string,
+                                position)
+
+    def _peek(self):
+        '''
+        Get current token
+        '''
+        return self._token_list[self._index]
+
+    def _is_keyword(self, keyword):
+        '''
+        Check if current token is a keyword (case insensitive)
+        '''
+        kind, value = self._token_list[self._index][:2]
+        return kind == IDENTIFIER_TOKEN and value.upper() == keyword
+
+    def _is_symbol(self, symbol):
+        '''
+        Check if current token is a symbol or operator
+        '''
+        kind, value = self._token_list[self._index][:2]
+        return kind in (SYMBOL_TOKEN, OPERATOR_TOKEN) and value == symbol
+
+    def _expect_keyword(self, keyword):
+        '''
+        Consume a keyword
+        '''
+        if not self._is_keyword(keyword):
+            self._error('"' + keyword + '"')
+        self._index += 1
+
+    def _expect_symbol(self, symbol):
+        '''
+        Consume a symbol
+        '''
+        if not self._is_symbol(symbol):
+            self._error('"' + symbol + '"')
+        self._index += 1
+
+    def _identifier(self):
+        '''
+        Consume an identifier (converted to lower case)
+        '''
+        kind, value = self._peek()[:2]
+        if kind != IDENTIFIER_TOKEN:
+            self._error('identifier')
+        self._index += 1
+        return value.lower()
+
+    def _value(self):
+        '''
+        Consume a value (string, float or integer)
+        '''
+        kind, value = self._peek()[:2]
+        if kind not in VALUE_TOKEN_SET:
+            self._error('value')
+        self._index += 1
+        return value
+
+    def _operator(self, operator_set):
+        '''
+        Consume an operator of a set
+        '''
+        kind, value = self._peek()[:2]
+        if kind != OPERATOR_TOKEN or value not in operator_set:
+            self._error('operator')
+        self._index += 1
+        return value
+
+    def theory(self):
+        '''
+        <rule-term> {'AND' <rule-term>}*
+        '''
+        rule_list = [self.rule()]
+        while self._is_keyword(AND_SYM):
+            self._index += 1
+            rule_list.append(self.rule())
+        if self._peek()[0] != END_TOKEN:
+            self._error('end of text')
+        return rule_list
+
+    def rule(self):
+        '''
+        [<condition-term>] <preference-term> [<indifferent-list>]
+        '''
+        condition = []
+        # 'IF' followed by an operator is an attribute (the condition of
+        # TheoryGrammar is optional, so it is backtracked)
+        if self._is_keyword(IF_SYM) and \
+                self._token_list[self._index + 1][0] != OPERATOR_TOKEN:
+            self._index += 1
+            condition.append(self.predicate())
+            while self._is_keyword(AND_SYM):
+                self._index += 1
+                condition.append(self.predicate())
+            self._expect_keyword(THEN_SYM)
+        best = self.predicate()
+        if self._is_keyword(BETTER_SYM) or self._is_symbol(GREATER_OP):
+            self._index += 1
+        else:
+            self._error('"' + BETTER_SYM + '" or "' + GREATER_OP + '"')
+        worst = self.predicate()
+        indifferent = []
+        if self._is_symbol(LEFT_BRA):
+            indifferent = self.indifferent_list(RIGHT_BRA)
+        elif self._is_symbol(LEFT_PAR):
+            indifferent = self.indifferent_list(RIGHT_PAR)
+        return ParsedRule(condition, best, worst, indifferent)
+
+    def indifferent_list(self, closing_symbol):
+        '''
+        '[' <attribute> (, <attribute>)* ']'
+        '(' <attribute> (, <attribute>)* ')'
+        '''
+        self._index += 1
+        att_list = [self._identifier()]
+        while self._is_symbol(COMMA):
+            self._index += 1
+            att_list.append(self._identifier())
+        self._expect_symbol(closing_symbol)
+        return att_list
+
+    def predicate(self):
+        '''
+        <simple-predicate> | '(' <simple-predicate> ')'
+        '''
+        if self._is_symbol(LEFT_PAR):
+            self._index += 1
+            predicate = self.simple_predicate()
+            self._expect_symbol(RIGHT_PAR)
+            return predicate
+        return self.simple_predicate()
+
+    def simple_predicate(self):
+        '''
+        <attribute> {'<' | '<=' | '>' | '>=' | '=' | '<>'} <value>
+        <value> {'<' | '<='} <attribute> {'<' | '<='} <value>
+        '''
+        if self._peek()[0] in VALUE_TOKEN_SET:
+            left_value = self._value()
+            left_operator = self._operator(INTERVAL_OP_SET)
+            attribute = self._identifier()
+            right_operator = self._operator(INTERVAL_OP_SET)
+            right_value = self._value()
+            term = PredicateTerm(attribute, left_value=left_value,
+                                 left_operator=left_operator,
+                                 right_operator=right_operator,
+                                 right_value=right_value)
+        else:
+            attribute = self._identifier()
+            operator = self._operator(COMPARISON_OP_SET)
+            value = self._value()
+            term = PredicateTerm(attribute, operator, value)
+        return ParsedPredicate(term)
+
+
+class DescentTheoryGrammar(object):
+    '''
+    Class for cp-theory recursive-descent parser
+    (same grammar of TheoryGrammar)
+    '''
+
+    @classmethod
+    def parse(cls, string):
+        '''Parse a string (return a list of parsed rules)'''
+        try:
+            return _DescentParser(string).theory()
+        except DescentParseError as p_e:
+            print('Invalid code: %s' % string)
+            print('Invalid line: %s' % p_e.line)
+            print('Parsing error: %s' % p_e)
+            return None
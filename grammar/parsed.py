@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+'''
+Module for parsed items of grammars
+
+Parsed items do not depend on pyparsing, so they are shared by all parsers
+'''
+
+from preference.interval import parse_interval, get_str_predicate
+
+
+class PredicateTerm(object):
+    '''
+    Class to represent the tokens of a predicate
+    (with the same names of pyparsing results)
+    '''
+
+    def __init__(self, attribute, operator='', value=None,
+                 left_value=None, left_operator='',
+                 right_operator='', right_value=None):
+        # Comparison: <attribute> <operator> <value>
+        self.attribute = attribute
+        self.operator = operator
+        self.value = value
+        # Interval: <left_value> <left_operator> <attribute>
+        #     <right_operator> <right_value>
+        self.left_value = left_value
+        self.left_operator = left_operator
+        self.right_operator = right_operator
+        self.right_value = right_value
+
+
+class ParsedPredicate(object):
+    '''
+    Class to represent parsed predicates
+    '''
+
+    def __init__(self, term):
+        self._attribute = term.attribute
+        self._interval = parse_interval(term)
+
+    def __str__(self):
+        return get_str_predicate(self._attribute, self._interval)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def get_attribute(self):
+        '''
+        Return the predicate attribute
+        '''
+        return self._attribute
+
+    def get_interval(self):
+        '''
+        Return the predicate interval
+        '''
+        return self._interval
+
+
+class ParsedRule(object):
+    '''
+    Class to represent parsed rules
+    (with the same names of pyparsing results)
+    '''
+
+    def __init__(self, condition, best, worst, indifferent):
+        # List of condition predicates
+        self.condition = condition
+        # Preferred and non preferred predicates
+        self.best = best
+        self.worst = worst
+        # List of indifferent attributes
+        self.indifferent = indifferent
+
+    def __str__(self):
+        return str(self.condition + [self.best, self.worst] +
+                   self.indifferent)
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Module to select the parser of cp-theories
+
+Parsers (backends):
+    pyparsing: TheoryGrammar (default)
+    descent: DescentTheoryGrammar (recursive-descent, without pyparsing)
+Both parsers produce the same parsed rules.
+The parsers are imported on first use, so the descent backend does not
+import pyparsing (faster startup).
+The initial backend can be set by the environment variable CPTHEORY_PARSER
+'''
+
+import os
+
+# Environment variable of initial backend
+BACKEND_VARIABLE = 'CPTHEORY_PARSER'
+# Parser backends
+PYPARSING_BACKEND = 'pyparsing'
+DESCENT_BACKEND = 'descent'
+BACKEND_LIST = [PYPARSING_BACKEND, DESCENT_BACKEND]
+
+# Current backend
+_BACKEND = os.environ.get(BACKEND_VARIABLE, PYPARSING_BACKEND)
+if _BACKEND not in BACKEND_LIST:
+    _BACKEND = PYPARSING_BACKEND
+
+
+def get_parser_backend():
+    '''
+    Get the current parser backend
+    '''
+    return _BACKEND
+
+
+def set_parser_backend(backend):
+    '''
+    Set the current parser backend
+    '''
+    global _BACKEND  # IGNORE:global-statement
+    if backend not in BACKEND_LIST:
+        raise ValueError('Invalid parser backend: ' + str(backend))
+    _BACKEND = backend
+
+
+def get_theory_grammar(backend=None):
+    '''
+    Get the grammar class of a backend (default is current backend)
+
+    The class has the method parse(string), which returns the list of
+    parsed rules or None for invalid strings
+    '''
+    if backend is None:
+        backend = _BACKEND
+    if backend == PYPARSING_BACKEND:
+        from grammar.theory_grammar import TheoryGrammar
+        return TheoryGrammar
+    elif backend == DESCENT_BACKEND:
+        from grammar.descent_grammar import DescentTheoryGrammar
+        return DescentTheoryGrammar
+    raise ValueError('Invalid parser backend: ' + str(backend))
@@ -3,8 +3,10 @@
 Module for conditional preference theory grammar
 '''
 
+from threading import Lock
+
 from pyparsing import Suppress, Optional, delimitedList, Group, \
-    ParseException
+    ParseException, ParserElement
 from grammar.basic import predicate_term, identifier_token
 from grammar.symbols import GREATER_OP, IF_KEYWORD, AND_KEYWORD, \
     THEN_KEYWORD, BETTER_KEYWORD
@@ -30,14 +32,31 @@ class TheoryGrammar(object):
         <value> {'<' | '<='} <attribute> {'<' | '<='} <value>
     '''
 
+    # Grammar (built on first use and shared by all parses)
+    _grammar = None
+    _lock = Lock()
+
     @classmethod
     def grammar(cls):
         '''
         Return grammar for cp-theories
         '''
-        rule = rule_term()
-        grammar = delimitedList(rule, AND_KEYWORD)
-        return grammar
+        if cls._grammar is None:
+            with cls._lock:
+                if cls._grammar is None:
+                    rule = rule_term()
+                    cls._grammar = delimitedList(rule, AND_KEYWORD)
+        return cls._grammar
+
+    @classmethod
+    def enable_packrat(cls, cache_size_limit=128):
+        '''
+        Enable packrat memoization (for all pyparsing grammars)
+
+        Grammar alternatives fail on their first tokens, so memoization
+        makes parsing slower for usual theories (see bench_grammar.py)
+        '''
+        ParserElement.enablePackrat(cache_size_limit)
 
     @classmethod
     def parse(cls, string):
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module to verify that all parser backends produce the same theories
+
+Usage: verify_parsers.py [<file> ...]
+Every file (default is every file in grammar/examples and the texts of
+TEXT_LIST) is parsed by all backends (see grammar.parsers). The parsed
+rules (including value types) and the built cp-theories (rules, formulas
+and comparisons) must be equal, invalid texts must be invalid for all
+backends
+'''
+
+import contextlib
+import glob
+import io
+import os
+import sys
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Directory of example files
+EXAMPLES_DIR = os.path.join(PATH, 'examples')
+
+# Texts of corner cases (keywords as attributes, keywords after values)
+TEXT_LIST = [
+    'if = 1 > if = 2',
+    'IF if = 1 AND if <> 2 THEN a = 1 > a = 2',
+    'a = 1 > a = 2 AND if = 1 > if = 2',
+    'IF a = 1 AND and = 2 THEN then = 1 > then = 2',
+    'better = 1 BETTER better = 2',
+    'IF a = 1AND b = 2 THEN c = 1 > c = 2',
+    'IF att0 <= 99THEN c = 1 > c = 2',
+    'a = 1.5BETTER a = 2',
+    'a = 1 > a = 2AND b = 1 > b = 2',
+    'a = 1 > a = 2 (b)AND c = 1 > c = 2',
+    "IF a = 'x'AND b = 1 THEN c = 1 > c = 2",
+    '3<=a<5>a>=6[b]',
+    'IF a = 1 THEN b = 1x > b = 2',
+    'if > 1 > if < 1']
+
+
+def describe_predicate(predicate):
+    '''
+    Get a description of a parsed predicate (values keep their types)
+    '''
+    interval = predicate.get_interval()
+    return (str(predicate), predicate.get_attribute(),
+            repr(interval.to_tuple()))
+
+
+def describe_parsed(parsed):
+    '''
+    Get a description of a list of parsed rules
+    '''
+    if parsed is None:
+        return None
+    return [([describe_predicate(pred) for pred in parsed_rule.condition],
+             describe_predicate(parsed_rule.best),
+             describe_predicate(parsed_rule.worst),
+             list(parsed_rule.indifferent))
+            for parsed_rule in parsed]
+
+
+def describe_theory(theory):
+    '''
+    Get a description of a built cp-theory
+    '''
+    return ([str(rule) for rule in theory.get_rule_list()],
+            theory.is_consistent(),
+            [str(formula) for formula in theory.get_formula_list()],
+            [str(comp) for comp in theory.get_comparison_list()])
+
+
+def verify_text(text):
+    '''
+    Verify a preference text, return the list of backends with
+    differences to the first backend
+    '''
+    from grammar.parsers import BACKEND_LIST, get_theory_grammar
+    from preference.theory import build_cptheory
+    description_list = []
+    for backend in BACKEND_LIST:
+        # Parsers print errors of invalid texts
+        with contextlib.redirect_stdout(io.StringIO()):
+            parsed = get_theory_grammar(backend).parse(text)
+        theory_description = None
+        if parsed is not None:
+            theory_description = describe_theory(
+                build_cptheory(text, backend))
+        description_list.append((describe_parsed(parsed),
+                                 theory_description))
+    return [backend
+            for backend, description in zip(BACKEND_LIST, description_list)
+            if description != description_list[0]]
+
+
+if __name__ == '__main__':
+    CASE_LIST = []
+    FILE_LIST = sys.argv[1:]
+    if not FILE_LIST:
+        FILE_LIST = sorted(glob.glob(os.path.join(EXAMPLES_DIR, '*')))
+    for file_name in FILE_LIST:
+        with open(file_name) as pref_file:
+            CASE_LIST.append((file_name, pref_file.read()))
+    if not sys.argv[1:]:
+        CASE_LIST += [(repr(text), text) for text in TEXT_LIST]
+    DIFFERENT_NUMBER = 0
+    for case_name, case_text in CASE_LIST:
+        DIFF_LIST = verify_text(case_text)
+        if DIFF_LIST:
+            DIFFERENT_NUMBER += 1
+            print('different: ' + case_name + ' (' +
+                  ', '.join(DIFF_LIST) + ')')
+        else:
+            print('same: ' + case_name)
+    print('%d of %d cases with differences' % (DIFFERENT_NUMBER,
+                                               len(CASE_LIST)))
+    if DIFFERENT_NUMBER:
+        exit(1)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+'''
+Module to store compiled theories in files (compiled theory artifacts)
+
+An artifact has a header line followed by the pickled compiled theory:
+    CPTHEORY <version> <payload sha256> <preference text sha256>
+The payload hash detects corrupted files and the text hash detects
+artifacts out of date with their preference file.
+
+This module does not import the grammar (nor pyparsing), so compiled
+theories are loaded without parsing.
+Artifacts are pickles, so only load files from trusted sources
+'''
+
+import hashlib
+import os
+import pickle
+
+# Artifact header magic string
+ARTIFACT_MAGIC = b'CPTHEORY'
+# Artifact format version (changed when CompiledTheory changes)
+ARTIFACT_VERSION = 1
+# Default artifact file extension
+ARTIFACT_EXTENSION = '.cpt'
+# Pickle protocol of artifacts
+_PICKLE_PROTOCOL = 2
+
+
+class ArtifactError(ValueError):
+    '''
+    Exception for invalid compiled theory artifacts
+    '''
+    pass
+
+
+def get_text_digest(preference_text):
+    '''
+    Get the hash of a preference text
+    '''
+    return hashlib.sha256(preference_text.encode('utf-8')).hexdigest()
+
+
+def dump_compiled_theory(compiled_theory, preference_text):
+    '''
+    Get the artifact (bytes) of a compiled theory
+    '''
+    payload = pickle.dumps(compiled_theory, _PICKLE_PROTOCOL)
+    header = ' '.join([ARTIFACT_MAGIC.decode('ascii'),
+                       str(ARTIFACT_VERSION),
+                       hashlib.sha256(payload).hexdigest(),
+                       get_text_digest(preference_text)])
+    return header.encode('ascii') + b'\n' + payload
+
+
+def loads_compiled_theory(artifact, preference_text=None):
+    '''
+    Get the compiled theory of an artifact (bytes)
+
+    Raise ArtifactError if artifact is invalid, has another version or
+    does not belong to 'preference_text' (when it is given)
+    '''
+    header, _, payload = artifact.partition(b'\n')
+    field_list = header.split(b' ')
+    if len(field_list) != 4 or field_list[0] != ARTIFACT_MAGIC:
+        raise ArtifactError('Not a compiled theory artifact')
+    if field_list[1] != str(ARTIFACT_VERSION).encode('ascii'):
+        raise ArtifactError('Artifact version ' +
+                            field_list[1].decode('ascii', 'replace') +
+                            ' is not ' + str(ARTIFACT_VERSION))
+    if hashlib.sha256(payload).hexdigest().encode('ascii') != field_list[2]:
+        raise ArtifactError('Corrupted artifact')
+    if preference_text is not None and \
+            get_text_digest(preference_text).encode('ascii') != field_list[3]:
+        raise ArtifactError('Artifact is out of date')
+    return pickle.loads(payload)
+
+
+def save_compiled_theory(compiled_theory, preference_text, file_name):
+    '''
+    Save a compiled theory artifact to a file
+    '''
+    with open(file_name, 'wb') as artifact_file:
+        artifact_file.write(dump_compiled_theory(compiled_theory,
+                                                 preference_text))
+
+
+def load_compiled_theory(file_name, preference_text=None):
+    '''
+    Load a compiled theory artifact from a file (see loads_compiled_theory)
+    '''
+    with open(file_name, 'rb') as artifact_file:
+        return loads_compiled_theory(artifact_file.read(), preference_text)
+
+
+def get_artifact_file_name(preference_file_name):
+    '''
+    Get the artifact file name of a preference file
+    (same name with artifact extension)
+    '''
+    return os.path.splitext(preference_file_name)[0] + ARTIFACT_EXTENSION
+
+
+def read_preference_file(file_name):
+    '''
+    Read a preference file
+
+    Return the preference text and its compiled theory, loaded from the
+    artifact of the file if it exists and is up to date (otherwise None)
+    '''
+    with open(file_name) as pref_file:
+        preference_text = pref_file.read()
+    artifact_file_name = get_artifact_file_name(file_name)
+    compiled_theory = None
+    if os.path.exists(artifact_file_name):
+        try:
+            compiled_theory = load_compiled_theory(artifact_file_name,
+                                                   preference_text)
+        except ArtifactError:
+            pass
+    return preference_text, compiled_theory
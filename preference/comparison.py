@@ -26,7 +26,7 @@ class Comparison(object):
         comp_str = get_string_formula(self._best_formula_dict)
         comp_str += ' > '
         comp_str += get_string_formula(self._worst_formula_dict)
-        str_list = [str(att) for att in self._indifferent_set]
+        str_list = [str(att) for att in sorted(self._indifferent_set)]
         comp_str += '[' + ','.join(str_list) + ']'
         return comp_str
 
@@ -42,7 +42,7 @@ class Comparison(object):
             len(self.get_notpreferred_formula())
         len_other_form = len(other.get_preferred_formula()) + \
             len(other.get_notpreferred_formula())
-        return not (len_self_form > len_other_form)
+        return len_self_form < len_other_form
 
     def __eq__(self, other):
         return isinstance(self, Comparison) and \
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+'''
+Module to manipulate compiled conditional preference theories
+
+A compiled theory is a frozen snapshot of a cp-theory with its split rules,
+formulas, comparisons and levels of max formulas. It is not changed by
+queries, so it can be shared by concurrent queries and pickled to worker
+processes. It is deeply frozen: formulas are read-only mappings, indifferent
+sets are frozensets and rules are frozen copies.
+
+Compiled theories of preference texts are kept in a process-wide LRU cache.
+
+The cp-theory module (and the grammar) are imported on first use, so
+loading precompiled theories does not import them
+'''
+
+from collections import OrderedDict
+from threading import Lock
+from types import MappingProxyType
+
+# Default number of compiled theories in cache
+DEFAULT_CACHE_SIZE = 256
+
+
+class CompiledTheory(object):
+    '''
+    Class to represent a compiled (frozen) conditional preference theory
+    '''
+
+    __slots__ = ('_consistent', '_rule_tuple', '_formula_tuple',
+                 '_comparison_tuple', '_max_formula_tuple', '_level_tuple')
+
+    def __init__(self, consistent, rule_tuple, formula_tuple,
+                 comparison_tuple, max_formula_tuple, level_tuple):
+        rule_tuple, formula_tuple, comparison_tuple, max_formula_tuple = \
+            _freeze_items(rule_tuple, formula_tuple, comparison_tuple,
+                          max_formula_tuple)
+        # Theory consistency
+        object.__setattr__(self, '_consistent', consistent)
+        # Split rules
+        object.__setattr__(self, '_rule_tuple', rule_tuple)
+        # Formulas
+        object.__setattr__(self, '_formula_tuple', formula_tuple)
+        # Comparisons (sorted as in cp-theory)
+        object.__setattr__(self, '_comparison_tuple', comparison_tuple)
+        # Max formulas
+        object.__setattr__(self, '_max_formula_tuple', max_formula_tuple)
+        # Levels of max formulas (tuples of max formula indexes)
+        object.__setattr__(self, '_level_tuple', level_tuple)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CompiledTheory is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('CompiledTheory is immutable')
+
+    def __len__(self):
+        return len(self._rule_tuple)
+
+    def __str__(self):
+        rule_str_list = [str(rule) for rule in self._rule_tuple]
+        return '\n'.join(rule_str_list)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __reduce__(self):
+        # Formulas are stored once, other items refer to their indexes
+        index_dict = {}
+        formula_list = []
+        for index, formula in enumerate(self._formula_tuple):
+            index_dict[id(formula)] = index
+            formula_list.append(tuple(formula.items()))
+        comparison_list = []
+        for comp in self._comparison_tuple:
+            comparison_list.append(
+                (index_dict[id(comp.get_preferred_formula())],
+                 index_dict[id(comp.get_notpreferred_formula())],
+                 tuple(sorted(comp.get_indifferent_set()))))
+        max_formula_list = [index_dict[id(formula)]
+                            for formula in self._max_formula_tuple]
+        # Frozen rules are not picklable, mutable copies are pickled
+        # (they are frozen again on load)
+        rule_tuple = tuple([rule.copy() for rule in self._rule_tuple])
+        return (_load_compiled_theory,
+                (self._consistent, rule_tuple, tuple(formula_list),
+                 tuple(comparison_list), tuple(max_formula_list),
+                 self._level_tuple))
+
+    def is_consistent(self):
+        '''
+        Return theory consistency
+        '''
+        return self._consistent
+
+    def get_rule_list(self):
+        '''
+        Return the split rules
+        '''
+        return self._rule_tuple
+
+    def get_formula_list(self):
+        '''
+        Return the formulas
+        '''
+        return self._formula_tuple
+
+    def get_comparison_list(self):
+        '''
+        Return the comparisons
+        '''
+        return self._comparison_tuple
+
+    def get_max_formulas(self):
+        '''
+        Return the max formulas
+        '''
+        return self._max_formula_tuple
+
+    def get_max_formula_levels(self):
+        '''
+        Return the levels of max formulas
+        (tuples of max formula indexes)
+        '''
+        return self._level_tuple
+
+    def dominates(self, record1, record2):
+        '''
+        Returns True if record1 dominates (is preferred to) record2
+        according to theory (dominance test by search)
+        '''
+        if record1 != record2:
+            from preference.theory import _dominates_by_search
+            return _dominates_by_search(list(self._rule_tuple),
+                                        record1, record2)
+        return False
+
+
+def _freeze_items(rule_tuple, formula_tuple, comparison_tuple,
+                  max_formula_tuple):
+    '''
+    Return frozen copies of rules, formulas, comparisons and max formulas
+
+    Formulas shared by comparisons and max formulas remain shared
+    '''
+    from preference.comparison import Comparison
+    frozen_dict = {}
+    for formula in formula_tuple:
+        frozen_dict[id(formula)] = MappingProxyType(dict(formula))
+    comparison_list = []
+    for comp in comparison_tuple:
+        comparison_list.append(
+            Comparison(frozen_dict[id(comp.get_preferred_formula())],
+                       frozen_dict[id(comp.get_notpreferred_formula())],
+                       frozenset(comp.get_indifferent_set())))
+    return (tuple([rule.freeze() for rule in rule_tuple]),
+            tuple([frozen_dict[id(formula)] for formula in formula_tuple]),
+            tuple(comparison_list),
+            tuple([frozen_dict[id(formula)]
+                   for formula in max_formula_tuple]))
+
+
+def _load_compiled_theory(consistent, rule_tuple, formula_tuple,
+                          comparison_tuple, max_formula_tuple, level_tuple):
+    '''
+    Rebuild a compiled theory from its pickled items
+    '''
+    from preference.comparison import Comparison
+    formula_list = [dict(item_tuple) for item_tuple in formula_tuple]
+    comparison_list = []
+    for index1, index2, indiff_tuple in comparison_tuple:
+        comp = Comparison(formula_list[index1], formula_list[index2],
+                          set(indiff_tuple))
+        comparison_list.append(comp)
+    max_formula_list = [formula_list[index] for index in max_formula_tuple]
+    return CompiledTheory(consistent, rule_tuple, tuple(formula_list),
+                          tuple(comparison_list), tuple(max_formula_list),
+                          level_tuple)
+
+
+def compile_cptheory(theory):
+    '''
+    Compile a cp-theory
+
+    Rules are split and, if theory is consistent, formulas, comparisons and
+    levels of max formulas are built. The cp-theory itself is changed
+    '''
+    theory.split_rules()
+    rule_tuple = tuple(theory.get_rule_list())
+    if not theory.is_consistent():
+        return CompiledTheory(False, rule_tuple, (), (), (), ())
+    theory.build_formulas()
+    theory.build_comparisons()
+    level_list = theory.get_max_formula_levels()
+    level_tuple = tuple([tuple(sorted(level)) for level in level_list])
+    return CompiledTheory(True, rule_tuple,
+                          tuple(theory.get_formula_list()),
+                          tuple(theory.get_comparison_list()),
+                          tuple(theory.get_max_formulas()),
+                          level_tuple)
+
+
+class TheoryCache(object):
+    '''
+    Class to represent a LRU cache of compiled theories
+
+    Theories are keyed by a canonical form of the parsed rules, so texts
+    differing only in spaces, keywords or rule order share the same entry.
+    The keys of the last preference texts are also kept to avoid parsing
+    '''
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        # Max number of compiled theories (0 disables cache)
+        self._maxsize = maxsize
+        # Compiled theories by theory key (least recently used first)
+        self._theory_dict = OrderedDict()
+        # Theory keys by preference text (least recently used first)
+        self._key_dict = OrderedDict()
+        # Statistics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._theory_dict)
+
+    def get(self, preference_text):
+        '''
+        Get the compiled theory of a preference text
+        (the theory is compiled and stored on a miss)
+        '''
+        with self._lock:
+            key = self._key_dict.get(preference_text)
+            if key is not None and key in self._theory_dict:
+                self._key_dict.move_to_end(preference_text)
+                self._theory_dict.move_to_end(key)
+                self._hits += 1
+                return self._theory_dict[key]
+        from preference.theory import build_cptheory
+        theory = build_cptheory(preference_text)
+        key = get_theory_key(theory)
+        with self._lock:
+            if key in self._theory_dict:
+                self._hits += 1
+                self._theory_dict.move_to_end(key)
+                self._store_key(preference_text, key)
+                return self._theory_dict[key]
+            self._misses += 1
+        compiled = compile_cptheory(theory)
+        with self._lock:
+            if self._maxsize > 0:
+                self._theory_dict[key] = compiled
+                self._theory_dict.move_to_end(key)
+                self._store_key(preference_text, key)
+                self._evict()
+        return compiled
+
+    def _store_key(self, preference_text, key):
+        '''
+        Store the theory key of a preference text
+        '''
+        self._key_dict[preference_text] = key
+        self._key_dict.move_to_end(preference_text)
+        while len(self._key_dict) > self._maxsize:
+            self._key_dict.popitem(last=False)
+
+    def _evict(self):
+        '''
+        Remove least recently used theories over max size
+        '''
+        while len(self._theory_dict) > self._maxsize:
+            self._theory_dict.popitem(last=False)
+            self._evictions += 1
+        while len(self._key_dict) > self._maxsize:
+            self._key_dict.popitem(last=False)
+
+    def clear(self):
+        '''
+        Remove all theories and reset statistics
+        '''
+        with self._lock:
+            self._theory_dict.clear()
+            self._key_dict.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def get_maxsize(self):
+        '''
+        Get max number of theories
+        '''
+        return self._maxsize
+
+    def set_maxsize(self, maxsize):
+        '''
+        Set max number of theories (0 disables cache)
+        '''
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def get_stats(self):
+        '''
+        Get cache statistics
+        '''
+        with self._lock:
+            return {'hits': self._hits,
+                    'misses': self._misses,
+                    'evictions': self._evictions,
+                    'size': len(self._theory_dict),
+                    'maxsize': self._maxsize}
+
+
+# Process-wide cache of compiled theories
+_THEORY_CACHE = TheoryCache()
+
+
+def get_theory_cache():
+    '''
+    Get the process-wide cache of compiled theories
+    '''
+    return _THEORY_CACHE
+
+
+def get_predicate_key(attribute, interval):
+    '''
+    Get a canonical string of a predicate (values are written by repr(),
+    so values of different types have different strings)
+    '''
+    return repr(interval.get_low()) + interval.get_left_operator() + \
+        attribute + interval.get_right_operator() + \
+        repr(interval.get_high())
+
+
+def get_rule_key(rule):
+    '''
+    Get a canonical string of a rule (condition attributes are sorted)
+    '''
+    rule_str = ''
+    cond = rule.get_condition()
+    if cond:
+        cond_dict = cond.get_condition_dict()
+        rule_str = ' AND '.join([get_predicate_key(att, cond_dict[att])
+                                 for att in sorted(cond_dict)])
+    pref = rule.get_preference()
+    att = pref.get_preference_attribute()
+    return rule_str + ' THEN ' + \
+        get_predicate_key(att, pref.get_best_interval()) + ' BETTER THAN ' + \
+        get_predicate_key(att, pref.get_worst_interval()) + \
+        '[' + ', '.join(sorted(pref.get_indifferent_set())) + ']'
+
+
+def get_theory_key(theory):
+    '''
+    Get a canonical key of a (not split) cp-theory (rules are sorted)
+    '''
+    return tuple(sorted([get_rule_key(rule)
+                         for rule in theory.get_rule_list()]))
+
+
+def get_compiled_theory(preference):
+    '''
+    Get a compiled theory from a preference text (using cache)
+    (a compiled theory is returned as it is)
+    '''
+    if isinstance(preference, CompiledTheory):
+        return preference
+    return _THEORY_CACHE.get(preference)
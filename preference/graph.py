@@ -4,7 +4,7 @@ Module to build preference graphs
 
 This graphs are used in theory consistency tests
 '''
-from preference.interval import intersect
+from preference.interval import IntervalIndex
 
 
 class Graph(object):
@@ -58,9 +58,9 @@ class Graph(object):
         The search start at 'star_vertex' and try reach at 'goal_vertex'
         '''
         # Visited vertex
-        visited_list = [start_vertex]
-        # Next vertices to be visited_list
-        waiting_list = self._graph_dict[start_vertex]
+        visited_set = set([start_vertex])
+        # Next vertices to be visited (copy, graph must not be changed)
+        waiting_list = list(self._graph_dict[start_vertex])
         # While there is vertex to be visited
         while waiting_list != []:
             # Get next vertex
@@ -70,40 +70,80 @@ class Graph(object):
             if goal_vertex == next_vertex:
                 return True
             # Check if 'next_vertex' was be visited
-            if next_vertex not in visited_list:
-                # Add 'next_vertex' to 'visited_list'
-                visited_list.append(next_vertex)
+            if next_vertex not in visited_set:
+                # Add 'next_vertex' to 'visited_set'
+                visited_set.add(next_vertex)
                 # Next vertices to be visited
                 waiting_list += self._graph_dict[next_vertex]
         # Return false if 'goal_vertex' was not reached
         return False
 
+    def find_cycle(self):
+        '''
+        Find a cycle in the graph (iterative three-colour depth first search)
+
+        Vertices are white (not visited), grey (in current search path)
+        or black (finished). An edge to a grey vertex closes a cycle.
+        Return the cycle as a vertex list [v1, v2, ..., v1]
+        or None if the graph is acyclic
+        '''
+        # Finished (black) vertices
+        finished_set = set()
+        for start_vertex in self._graph_dict:
+            if start_vertex in finished_set:
+                continue
+            # Current search path (grey vertices) and their positions
+            path_list = [start_vertex]
+            position_dict = {start_vertex: 0}
+            # Iterators over edges of path vertices
+            edge_iter_list = [iter(self._graph_dict[start_vertex])]
+            while path_list:
+                for next_vertex in edge_iter_list[-1]:
+                    # Edge to grey vertex: path from it is a cycle
+                    if next_vertex in position_dict:
+                        cycle_list = \
+                            path_list[position_dict[next_vertex]:]
+                        cycle_list.append(next_vertex)
+                        return cycle_list
+                    # Edge to white vertex: go deeper
+                    if next_vertex not in finished_set:
+                        position_dict[next_vertex] = len(path_list)
+                        path_list.append(next_vertex)
+                        edge_iter_list.append(
+                            iter(self._graph_dict[next_vertex]))
+                        break
+                else:
+                    # All edges were visited, vertex is finished
+                    vertex = path_list.pop()
+                    edge_iter_list.pop()
+                    del position_dict[vertex]
+                    finished_set.add(vertex)
+        return None
+
     def is_acyclic(self):
         '''
         Check if the graph is acyclic
         '''
-
-        # Call depth first search form each vertex to itself
-        for vertex in self._graph_dict:
-            if self.depth_first_search(vertex, vertex):
-                return False
-        return True
+        return self.find_cycle() is None
 
     def update_intersections(self):
         '''
         Update interval intersections
+
+        Vertices must be intervals, the intersecting vertices of every
+        edge target are found by an interval index
         '''
+        index = IntervalIndex(list(self._graph_dict))
         # For every vertex ve1
         for ve1 in self._graph_dict:
             # New list of vertex do create edges from ve1
             new_list = []
             # For every vertex ve2 in edges ve1 -> ve2
             for ve2 in self._graph_dict[ve1]:
-                # For every vertex ve3
-                for ve3 in self._graph_dict:
+                # For every vertex ve3 with intersection in their intervals
+                for ve3 in index.search(ve2):
                     # Check if ve2 is different of ve3
-                    # And if there is intersection in their intervals
-                    if ve2 != ve3 and intersect(ve2, ve3):
+                    if ve2 != ve3:
                         new_list.append(ve3)
             # Create edges from ve1 to vertices in new list
             self._graph_dict[ve1] += new_list
@@ -134,21 +174,40 @@ class Graph(object):
         where each position of the list is populated with formulas of the same
         preference level
         '''
+        preference_list, _ = self.get_topological_levels()
+        return preference_list
 
-        preference_list = []
+    def get_topological_levels(self):
+        '''
+        Topological sorting by levels (Kahn algorithm)
 
+        Return the list of levels (sets of nodes) and a dictionary with
+        the level of each node, computed in one pass using in-degree
+        counters. Nodes in cycles (or after them) have no level.
+        The graph is not changed
+        '''
+        # Number of edges arriving at each node
+        in_degree_dict = dict.fromkeys(self._graph_dict, 0)
+        for index_node in self._graph_dict:
+            for node in self._graph_dict[index_node]:
+                in_degree_dict[node] += 1
+        preference_list = []
+        level_dict = {}
         # get first nodes
-        top_nodes = self.get_top_vertex()
-
-        while len(top_nodes) > 0:
+        top_list = [node for node in self._graph_dict
+                    if in_degree_dict[node] == 0]
+        while top_list:
+            level = len(preference_list)
             # append nodes to the list
-            preference_list.append(top_nodes)
-
-            # remove edges from graph for given nodes
-            for node in top_nodes:
-                self._graph_dict.pop(node)
-
-            # get next level of nodes
-            top_nodes = self.get_top_vertex()
-
-        return preference_list
+            preference_list.append(set(top_list))
+            # remove edges of given nodes, next level nodes
+            # are the ones without edges arriving
+            next_list = []
+            for index_node in top_list:
+                level_dict[index_node] = level
+                for node in self._graph_dict[index_node]:
+                    in_degree_dict[node] -= 1
+                    if in_degree_dict[node] == 0:
+                        next_list.append(node)
+            top_list = next_list
+        return preference_list, level_dict
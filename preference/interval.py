@@ -3,196 +3,335 @@
 Module to manipulate intervals of values.
 
 
-The intervals are stored as tuples.
+The intervals are stored as Interval objects.
 The intervals are associated to comparisons as:
 (A = x), (A <> x), (A < x), (A <= x), )A > x), (A >= x)
 (x OP A OP x') where OP is < or <=
+
+The old tuple format (x, OP, OP, x') is still readable by to_interval()
+and can be written by Interval.to_tuple()
 '''
 
 
-from grammar.symbols import EQUAL_OP, DIFFERENT_OP, LESS_OP,\
+from bisect import bisect_left
+
+from preference.symbols import EQUAL_OP, DIFFERENT_OP, LESS_OP,\
     LESS_EQUAL_OP, GREATER_OP
 
 # Values for infinity limits of intervals
 MINUS_INF = float('-inf')
 PLUS_INF = float('+inf')
 
+# Kinds of intervals
+# Range: (x OP A OP x'), (A < x), (A <= x), (A > x), (A >= x)
+RANGE_KIND = 'range'
+# Equality: (A = x)
+EQUAL_KIND = 'equality'
+# Inequality: (A <> x)
+DIFFERENT_KIND = 'inequality'
 
-def parse_interval(term):
+
+def _value_position(value):
     '''
-    Parse a token term to interval
+    Get the sort position of a value
+
+    Infinite values are placed before and after every other value
     '''
-    # Check if parsed expression is a simple comparison
-    if term.operator:
-        # Comparisons: A = x, A <> x
-        # Interval: (x, =, =, x), (x, <>, <> x)
-        if term.operator in [EQUAL_OP, DIFFERENT_OP]:
-            return (term.value, term.operator, term.operator, term.value)
-        # Comparisons: A < x or A <= x
-        # Intervals: (-inf, <=, <, x) or (-inf, <=, <=, x)
-        elif term.operator in [LESS_OP, LESS_EQUAL_OP]:
-            return (MINUS_INF, LESS_EQUAL_OP, term.operator, term.value)
-        # Comparison: A > x
-        # Interval: (x, <, <=, +inf)
-        elif term.operator == GREATER_OP:
-            return (term.value, LESS_OP, LESS_EQUAL_OP, PLUS_INF)
-        # Comparison: A >= x
-        # Interval: (x, <=, <=, +inf)
-        return (term.value, LESS_EQUAL_OP, LESS_EQUAL_OP, PLUS_INF)
-    # Comparisons: x OP A OP x'
-    # Intervals: (x, OP, OP, x')
-    return (term.left_value, term.left_operator,
-            term.right_operator, term.right_value)
+    if value == MINUS_INF:
+        return (0,)
+    elif value == PLUS_INF:
+        return (2,)
+    return (1, value)
 
 
-def _equal_different_intersect(interval1, interval2):
+def _limit_position(value, closed, left):
     '''
-    Check for overlap on equality and different comparisons
+    Get the sort position of an interval limit
+
+    A limit stands just before or just after its value,
+    according to the limit side and if it is closed or open
     '''
-    # Check if intervals are the same
-    if interval1 == interval2:
-        return True
-    # Check if interval1 is (v, <>, <>, v)
-    if interval1[1] == DIFFERENT_OP:
-        # Unique condition for no overlap
-        # interval1  ------[ ]------
-        # interval2        [X]
-        if interval2[1] == EQUAL_OP and interval1[0] == interval2[0]:
-            return False
-        return True
-    # Check if interval2 is (v, <>, <>, v)
-    if interval2[1] == DIFFERENT_OP:
-        # Unique condition for no overlap
-        # interval2  ------[ ]------
-        # interval1        [X]
-        if interval1[1] == EQUAL_OP and interval1[0] == interval2[0]:
-            return False
-        return True
-    return False
+    # Closed left limit and open right limit stand before the value
+    if closed == left:
+        return (_value_position(value), 0)
+    return (_value_position(value), 1)
 
 
-def _interval_intersect(interval1, interval2):
+class Interval(object):
     '''
-    Check if there is interval intersection
-    '''
-    # Check for overlap between = and <> operators
-    if _equal_different_intersect(interval1, interval2):
-        return True
-    # interval1       [x] or [x]-------
-    # interval2    |---------------|
-    # or
-    # interval1  ------[x] or [x]
-    # interval2    |---------------|
-    if (EQUAL_OP in interval1[1]
-        and _is_inside_interval(interval1[0], interval2)) \
-            or (EQUAL_OP in interval1[2]
-                and _is_inside_interval(interval1[3], interval2)):
-        return True
-    # interval2       [x] or [x]-------
-    # interval1    |---------------|
-    # or
-    # interval2  ------[x] or [x]
-    # interval1    |---------------|
-    if (EQUAL_OP in interval2[1]
-        and _is_inside_interval(interval2[0], interval1)) \
-        or (EQUAL_OP in interval2[2]
-            and _is_inside_interval(interval2[3], interval1)):
-        return True
-    # interval1      |------|
-    # interval2  |--------|
-    if _before(interval1[0], interval2[3]) \
-            and _after(interval1[3], interval2[0]):
-        return True
-    # interval2      |------|
-    # interval1  |--------|
-    if _before(interval2[0], interval1[3]) \
-            and _after(interval2[3], interval1[0]):
-        return True
-    return False
+    Class to represent an interval of values
 
+    The limits are stored as values and closed flags. The sort position of
+    each limit is computed once, so intersection and split are O(1)
+    '''
 
-def _after(value1, value2):
+    __slots__ = ('_low', '_high', '_low_closed', '_high_closed', '_kind',
+                 '_low_position', '_high_position')
+
+    def __init__(self, low, high, low_closed=True, high_closed=True,
+                 kind=RANGE_KIND):
+        # Left and right limit values
+        self._low = low
+        self._high = high
+        # Closed (<=) or open (<) limits
+        self._low_closed = low_closed
+        self._high_closed = high_closed
+        # Interval kind (range, equality or inequality)
+        self._kind = kind
+        # Sort positions of limits
+        self._low_position = _limit_position(low, low_closed, True)
+        self._high_position = _limit_position(high, high_closed, False)
+
+    def __str__(self):
+        return str(self.to_tuple())
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __eq__(self, other):
+        return isinstance(other, Interval) and \
+            self._kind == other._kind and \
+            self._low == other._low and \
+            self._high == other._high and \
+            self._low_closed == other._low_closed and \
+            self._high_closed == other._high_closed
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self._kind, self._low, self._high,
+                     self._low_closed, self._high_closed))
+
+    def __reduce__(self):
+        return (Interval, (self._low, self._high, self._low_closed,
+                           self._high_closed, self._kind))
+
+    def get_low(self):
+        '''
+        Get left limit value
+        '''
+        return self._low
+
+    def get_high(self):
+        '''
+        Get right limit value
+        '''
+        return self._high
+
+    def is_low_closed(self):
+        '''
+        Check if left limit is closed
+        '''
+        return self._low_closed
+
+    def is_high_closed(self):
+        '''
+        Check if right limit is closed
+        '''
+        return self._high_closed
+
+    def get_kind(self):
+        '''
+        Get interval kind (range, equality or inequality)
+        '''
+        return self._kind
+
+    def get_left_operator(self):
+        '''
+        Get operator string of left limit
+        '''
+        if self._kind == EQUAL_KIND:
+            return EQUAL_OP
+        elif self._kind == DIFFERENT_KIND:
+            return DIFFERENT_OP
+        elif self._low_closed:
+            return LESS_EQUAL_OP
+        return LESS_OP
+
+    def get_right_operator(self):
+        '''
+        Get operator string of right limit
+        '''
+        if self._kind == EQUAL_KIND:
+            return EQUAL_OP
+        elif self._kind == DIFFERENT_KIND:
+            return DIFFERENT_OP
+        elif self._high_closed:
+            return LESS_EQUAL_OP
+        return LESS_OP
+
+    def to_tuple(self):
+        '''
+        Convert interval to tuple format (x, OP, OP, x')
+        '''
+        return (self._low, self.get_left_operator(),
+                self.get_right_operator(), self._high)
+
+    def contains(self, value):
+        '''
+        Check if a value is inside the interval
+        '''
+        # for inequality intervals, only v is not in the interval
+        if self._kind == DIFFERENT_KIND:
+            return value != self._low
+        position = _value_position(value)
+        return self._low_position <= (position, 0) and \
+            (position, 1) <= self._high_position
+
+    def intersects(self, other):
+        '''
+        Check if there is intersection with another interval
+        '''
+        if self._kind == DIFFERENT_KIND or other._kind == DIFFERENT_KIND:
+            return _different_intersect(self, other)
+        return max(self._low_position, other._low_position) < \
+            min(self._high_position, other._high_position)
+
+    def intersection(self, other):
+        '''
+        Get the intersection with another interval
+        (None if there is no intersection)
+        '''
+        if self._kind == DIFFERENT_KIND or other._kind == DIFFERENT_KIND:
+            if self == other:
+                return self
+            return None
+        if not self.intersects(other):
+            return None
+        low = max(self, other, key=_get_low_position)
+        high = min(self, other, key=_get_high_position)
+        return _build_interval(low._low, low._low_closed,
+                               high._high, high._high_closed)
+
+    def split(self, fixed):
+        '''
+        Split interval by a 'fixed' interval
+
+        Return the part inside 'fixed' and the parts before and after it
+        ([] if there is no split)
+        '''
+        if self == fixed or not self.intersects(fixed) \
+                or self._kind == DIFFERENT_KIND \
+                or fixed._kind == DIFFERENT_KIND:
+            return []
+        interval_list = [self.intersection(fixed)]
+        # Part before 'fixed':
+        #  fixed:   |----
+        #  self:  -----|
+        #  part:  --|
+        if self._low_position < fixed._low_position:
+            interval_list.append(
+                _build_interval(self._low, self._low_closed,
+                                fixed._low, not fixed._low_closed))
+        # Part after 'fixed':
+        #  fixed: ----|
+        #  self:   |-----
+        #  part:      |--
+        if fixed._high_position < self._high_position:
+            interval_list.append(
+                _build_interval(fixed._high, not fixed._high_closed,
+                                self._high, self._high_closed))
+        if len(interval_list) == 1:
+            return []
+        return interval_list
+
+    def split_neq(self):
+        '''
+        Split inequality interval (A <> x) in (A < x) and (A > x)
+        ([] for other intervals)
+        '''
+        if self._kind != DIFFERENT_KIND:
+            return []
+        return [Interval(MINUS_INF, self._low, True, False),
+                Interval(self._low, PLUS_INF, False, True)]
+
+
+def _get_low_position(interval):
     '''
-    Check if value2 is after value1
+    Get position of interval left limit
     '''
-    # Check if value2 is +infinite (nothing can be after +infinite)
-    if value2 == PLUS_INF:
-        return False
-    # Check if value2 is +infinite and value1 is not +infinite
-    if value1 == PLUS_INF and value2 != PLUS_INF:
-        return True
-    if value1 == MINUS_INF:
-        return False
-    if value2 == MINUS_INF and value1 != MINUS_INF:
-        return True
-    return value1 > value2
+    return interval._low_position  # IGNORE:protected-access
 
 
-def _before(value1, value2):
+def _get_high_position(interval):
     '''
-    Check if value1 appears before value 2
+    Get position of interval right limit
     '''
-    # Check if value2 is -infinite (nothing can be before -infinite)
-    if value2 == MINUS_INF:
-        return False
-    if value1 == MINUS_INF and value2 != MINUS_INF:
-        return True
-    if value1 == PLUS_INF:
-        return False
-    if value2 == PLUS_INF and value1 != PLUS_INF:
-        return True
+    return interval._high_position  # IGNORE:protected-access
 
-    return value1 < value2
 
+def _build_interval(low, low_closed, high, high_closed):
+    '''
+    Build an interval from its limits
+    (intervals with the same limit values are equality intervals)
+    '''
+    if low == high:
+        return Interval(low, high, True, True, EQUAL_KIND)
+    return Interval(low, high, low_closed, high_closed)
 
-def _after_left(value, interval):
+
+def _different_intersect(interval1, interval2):
     '''
-    Check if value appears after left interval limit
+    Check for overlap on inequality intervals
     '''
-    # Check if left limit is no -infinite and value is -infinite
-    if interval[0] != MINUS_INF \
-            and value == MINUS_INF:
-        return False
-    # Check if left limit is -infinite or value is +infinite
-    # or value is after left limit
-    if interval[0] == MINUS_INF \
-            or value == PLUS_INF \
-            or interval[0] < value \
-            or (interval[0] <= value and
-                EQUAL_OP in interval[1]):
+    # Check if intervals are the same
+    if interval1 == interval2:
         return True
-    return False
+    # Unique condition for no overlap
+    # interval1  ------[ ]------
+    # interval2        [X]
+    # (or the opposite)
+    if interval1.get_kind() == EQUAL_KIND \
+            or interval2.get_kind() == EQUAL_KIND:
+        return interval1.get_low() != interval2.get_low()
+    return True
 
 
-def _before_right(value, interval):
+def to_interval(item):
     '''
-    Check if value appears before right interval limit
+    Convert a tuple (x, OP, OP, x') to interval
+    (intervals are returned as they are)
     '''
-    # Check if right limit is no +infinite and value is +infinite
-    if interval[3] != PLUS_INF \
-            and value == PLUS_INF:
-        return False
-    # Check if right limit is -infinite or value is +infinite
-    # or value is before right limit
-    if interval[3] == PLUS_INF \
-            or value == MINUS_INF \
-            or interval[3] > value \
-            or (interval[3] >= value and
-                EQUAL_OP in interval[2]):
-        return True
-    return False
+    if isinstance(item, Interval):
+        return item
+    if item[1] == EQUAL_OP:
+        return Interval(item[0], item[3], True, True, EQUAL_KIND)
+    elif item[1] == DIFFERENT_OP:
+        return Interval(item[0], item[3], False, False, DIFFERENT_KIND)
+    return Interval(item[0], item[3], item[1] == LESS_EQUAL_OP,
+                    item[2] == LESS_EQUAL_OP)
 
 
-def _is_inside_interval(value, interval):
+def parse_interval(term):
     '''
-    Check if a value is inside an interval
+    Parse a token term to interval
     '''
-    # for intervals (v, <>, <>, v), only v is not in the interval
-    if interval[1] == DIFFERENT_OP and value != interval[0]:
-        return True
-    elif _after_left(value, interval) and _before_right(value, interval):
-        return True
-    return False
+    # Check if parsed expression is a simple comparison
+    if term.operator:
+        # Comparisons: A = x, A <> x
+        if term.operator == EQUAL_OP:
+            return Interval(term.value, term.value, True, True, EQUAL_KIND)
+        elif term.operator == DIFFERENT_OP:
+            return Interval(term.value, term.value, False, False,
+                            DIFFERENT_KIND)
+        # Comparisons: A < x or A <= x
+        # Intervals: (-inf, <=, <, x) or (-inf, <=, <=, x)
+        elif term.operator in [LESS_OP, LESS_EQUAL_OP]:
+            return Interval(MINUS_INF, term.value, True,
+                            term.operator == LESS_EQUAL_OP)
+        # Comparison: A > x
+        # Interval: (x, <, <=, +inf)
+        elif term.operator == GREATER_OP:
+            return Interval(term.value, PLUS_INF, False, True)
+        # Comparison: A >= x
+        # Interval: (x, <=, <=, +inf)
+        return Interval(term.value, PLUS_INF, True, True)
+    # Comparisons: x OP A OP x'
+    # Intervals: (x, OP, OP, x')
+    return Interval(term.left_value, term.right_value,
+                    term.left_operator == LESS_EQUAL_OP,
+                    term.right_operator == LESS_EQUAL_OP)
 
 
 def intersect(item1, item2):
@@ -200,17 +339,17 @@ def intersect(item1, item2):
     Check if there is interval or value intersection
     '''
     # Check if item1 is interval
-    if isinstance(item1, tuple):
+    if isinstance(item1, Interval):
         # Check if item2 is interval
-        if isinstance(item2, tuple):
+        if isinstance(item2, Interval):
             # Check if there is interval intersection (both intervals)
-            return _interval_intersect(item1, item2)
+            return item1.intersects(item2)
         # Check if item2 is inside item1 (interval)
-        return _is_inside_interval(item2, item1)
+        return item1.contains(item2)
     # Check if item2 is interval
-    elif isinstance(item2, tuple):
+    elif isinstance(item2, Interval):
         # Check if item1 is inside item2 (interval)
-        return _is_inside_interval(item1, item2)
+        return item2.contains(item1)
     # Check if items are the same (both are none intervals)
     return item1 == item2
 
@@ -219,8 +358,9 @@ def get_str_predicate(attribute, interval):
     '''
     Get string for attribute and interval
     '''
-    return str(interval[0]) + interval[1] + attribute + interval[2] + \
-        str(interval[3])
+    return str(interval.get_low()) + interval.get_left_operator() + \
+        attribute + interval.get_right_operator() + \
+        str(interval.get_high())
 
 
 def split_neq_interval(interval):
@@ -230,196 +370,174 @@ def split_neq_interval(interval):
             ('-inf','<=', '<', Value)
             (Value, '<', '<=', '+inf')
     '''
-    interval_list = []
-
-    # verify if it's neq interval
-    if (interval[1] == DIFFERENT_OP) and (interval[2] == DIFFERENT_OP):
-        interval1 = (MINUS_INF, LESS_EQUAL_OP, LESS_OP, interval[0])
-        interval2 = (interval[0], LESS_OP, LESS_EQUAL_OP, PLUS_INF)
-        interval_list.append(interval1)
-        interval_list.append(interval2)
+    return interval.split_neq()
 
-    return interval_list
 
-
-def _left_equal(interval1, interval2):
+def split_interval(split_interval, fixed_interval):
     """
-    Check if 'interval1' left limit is equal 'interval2' left limit
+    Split 'split_interval' if 'fixed_interval' overlaps 'split_interval'
     """
-    if interval1[1] == interval2[1] and interval1[0] == interval2[0]:
-        return True
-    elif interval1[1] in ('=', '<=') and interval2[1] in ('=', '<=') \
-            and interval1[0] == interval2[0]:
-        return True
-    else:
-        return False
-
+    return split_interval.split(fixed_interval)
 
-def _right_equal(interval1, interval2):
-    """
-    Check if 'interval1' right limit is equal 'interval2' right limit
-    """
-    if interval1[2] == interval2[2] and interval1[3] == interval2[3]:
-        return True
-    elif interval1[2] in ('=', '<=') and interval2[2] in ('=', '<=') \
-            and interval1[3] == interval2[3]:
-        return True
-    else:
-        return False
 
+def get_elementary_limits(interval_list):
+    '''
+    Sweep the limits of a list of intervals over the same attribute
 
-def _left_after(interval1, interval2):
-    """
-    Check if 'interval1' left limit is after 'interval2' left limit
-    """
-    # interval1: |---
-    # interval2: <---
-    if interval2[0] == MINUS_INF and interval1[0] != MINUS_INF:
-        return True
-    # interval1:  |---
-    # interval2: |---
-    elif interval2[1] in ('<', '<=') and interval1[1] in ('<', '<=', '=') \
-            and interval2[0] < interval1[0]:
-        return True
-    # interval1: []---
-    # interval2:  |---
-    elif interval2[1] == '<=' and interval1[1] == '<' \
-            and interval2[0] == interval1[0]:
-        return True
-    else:
-        return False
+    Return the sorted limit positions and their values.
+    Every pair of consecutive limits bounds an elementary interval
+    (neq intervals are swept as their two split intervals)
+    '''
+    limit_dict = {}
+    for interval in interval_list:
+        for part in interval.split_neq() or [interval]:
+            limit_dict[_get_low_position(part)] = part.get_low()
+            limit_dict[_get_high_position(part)] = part.get_high()
+    position_list = sorted(limit_dict)
+    value_list = [limit_dict[position] for position in position_list]
+    return position_list, value_list
 
 
-def _right_before(interval1, interval2):
-    """
-    Check if 'interval1' right limit is before 'interval2' right limit
-    """
-    # interval1: ---|
-    # interval2: --->
-    if interval2[3] == PLUS_INF and interval1[3] != PLUS_INF:
-        return True
-    # interval1: ---|
-    # interval2:  ---|
-    elif interval2[2] in ('<', '<=') and interval1[2] in ('<', '<=', '=') \
-            and interval2[3] > interval1[3]:
-        return True
-    # interval1: ---[]
-    # interval2: ---|
-    elif interval2[2] == '<=' and interval1[2] == '<' \
-            and interval2[3] == interval1[3]:
-        return True
-    else:
-        return False
+def split_elementary_interval(interval, elementary_limits):
+    '''
+    Split 'interval' in the elementary intervals covered by it
 
+    Return [] when 'interval' is already an elementary interval
+    '''
+    position_list, value_list = elementary_limits
+    # neq intervals are always split
+    part_list = interval.split_neq() or [interval]
+    new_interval_list = []
+    for part in part_list:
+        first = bisect_left(position_list, _get_low_position(part))
+        last = bisect_left(position_list, _get_high_position(part))
+        for index in range(first, last):
+            # Left limit before value is closed,
+            # right limit after value is closed
+            new_interval_list.append(
+                _build_interval(value_list[index],
+                                position_list[index][1] == 0,
+                                value_list[index + 1],
+                                position_list[index + 1][1] == 1))
+    # Interval is already elementary
+    if len(new_interval_list) == 1 and part_list[0] is interval:
+        return []
+    return new_interval_list
+
+
+class IntervalIndex(object):
+    '''
+    Static index to search the intervals that intersect an interval
 
-def _right_after_equal_left(interval1, interval2):
-    """
-    Check if 'interval1' right limit is after or equal 'interval2' left limit
-    """
-    # interval1: ---|
-    # interval2:  |---
-    if interval1[3] != PLUS_INF and interval2[0] != MINUS_INF \
-            and interval1[3] > interval2[0]:
-        return True
-    # interval1: ---|
-    # interval2: <---
-    elif interval1[3] != PLUS_INF and interval2[0] == MINUS_INF:
-        return True
-    # interval1: --->
-    # interval2:  |---
-    elif interval1[3] == PLUS_INF and interval2[0] != MINUS_INF:
-        return True
-    # interval1: ---|
-    # interval2:    |---
-    elif interval1[2] in ('<=', '=') and interval2[1] in ('=', '<=') \
-            and interval1[3] == interval2[0]:
-        return True
-    else:
-        return False
+    Range and equality intervals are sorted by left limit in an implicit
+    binary tree where each node has the greatest right limit of its
+    intervals. A search takes O(log n) for each interval found.
+    Inequality intervals intersect almost every interval
+    and are just kept in a list
+    '''
 
+    def __init__(self, interval_list):
+        # Inequality intervals
+        self._different_list = []
+        # Range and equality intervals sorted by left limit
+        self._interval_list = []
+        for interval in interval_list:
+            if interval.get_kind() == DIFFERENT_KIND:
+                self._different_list.append(interval)
+            else:
+                self._interval_list.append(interval)
+        self._interval_list.sort(key=_get_low_position)
+        self._low_list = [_get_low_position(interval)
+                          for interval in self._interval_list]
+        # Number of tree leaves (power of 2)
+        self._size = 1
+        while self._size < len(self._interval_list):
+            self._size *= 2
+        # Greatest right limit of each tree node (node 1 is the root)
+        self._high_list = [None] * (2 * self._size)
+        for index, interval in enumerate(self._interval_list):
+            self._high_list[self._size + index] = \
+                _get_high_position(interval)
+        for node in range(self._size - 1, 0, -1):
+            child_list = [high for high in self._high_list[2 * node:
+                                                           2 * node + 2]
+                          if high is not None]
+            if child_list:
+                self._high_list[node] = max(child_list)
+
+    def __len__(self):
+        return len(self._interval_list) + len(self._different_list)
+
+    def search(self, interval):
+        '''
+        Get the indexed intervals that intersect 'interval'
+        '''
+        if interval.get_kind() == DIFFERENT_KIND:
+            return [other for other in self._interval_list +
+                    self._different_list if interval.intersects(other)]
+        found_list = [other for other in self._different_list
+                      if interval.intersects(other)]
+        if not self._interval_list:
+            return found_list
+        low = _get_low_position(interval)
+        # Only intervals starting before the end of 'interval'
+        end = bisect_left(self._low_list, _get_high_position(interval))
+        # Stack of (node, first leaf, last leaf + 1)
+        node_list = [(1, 0, self._size)]
+        while node_list:
+            node, first, last = node_list.pop()
+            high = self._high_list[node]
+            # Skip nodes after 'end' or ending before 'interval'
+            if first >= end or high is None or high <= low:
+                continue
+            if last - first == 1:
+                found_list.append(self._interval_list[first])
+            else:
+                middle = (first + last) // 2
+                node_list.append((2 * node + 1, middle, last))
+                node_list.append((2 * node, first, middle))
+        return found_list
+
+
+class ValueIndex(object):
+    '''
+    Static index of values to check if an interval contains any of them
 
-def split_interval(split_interval, fixed_interval):
-    """
-    Split 'split_interval' if 'fixed_interval' overlaps 'split_interval'
-    """
-    new_interval_list = []
+    Values are sorted by position, so a check takes O(log n).
+    Values that can not be sorted together (different types) are not
+    indexed and every interval may contain them
+    '''
 
-    # Get part of 'fixed_interval' that overlaps 'split_interval'
-    # First possibility, 'fixed_interval' inside
-    # (at least one side) 'split_interval'
-    # just copy fixed_interval
-
-    #                   fixed_interval:   |--|
-    #                   split_interval: |------|
-    # split_interval' = fixed_interval:   |--|
-    if _left_after(fixed_interval, split_interval) \
-            and _right_before(fixed_interval, split_interval):
-        new_interval_list.append(fixed_interval)
-
-    #                   split_interval: |------|
-    #                   fixed_interval: |--|
-    # split_interval' = fixed_interval: |--|
-    elif _left_equal(fixed_interval, split_interval) \
-            and _right_before(fixed_interval, split_interval):
-        new_interval_list.append(fixed_interval)
-    #          fixed_interval:    |--|
-    #          split_interval: |-----|
-    # split_interval' = fixed_interval:    |--|
-    elif _left_after(fixed_interval, split_interval) \
-            and _right_equal(fixed_interval, split_interval):
-        new_interval_list.append(fixed_interval)
-
-    # Second possibility, 'fixed_interval' right limit
-    # overlaps 'split_interval' left limit
-
-    #  fixed_interval: ----|
-    #  split_interval:  |-----
-    # split_interval':  |--|
-    elif _right_after_equal_left(fixed_interval, split_interval) \
-            and _right_before(fixed_interval, split_interval):
-        new_interval_list.append((split_interval[0], split_interval[1],
-                                  fixed_interval[2], fixed_interval[3]))
-
-    # Third possibility, 'fixed_interval' left limit
-    # overlaps 'split_interval' right limit
-
-    #  fixed_interval:  |-----
-    #  split_interval: ----|
-    # split_interval':  |--|
-    elif _right_after_equal_left(split_interval, fixed_interval) \
-            and _left_after(fixed_interval, split_interval):
-        new_interval_list.append((fixed_interval[0], fixed_interval[1],
-                                  split_interval[2], split_interval[3]))
-
-    # Get part of 'split_interval' before 'fixed_interval'
-    #  fixed_interval:   |----
-    #  split_interval: -----|
-    # split_interval': --|
-    if _right_after_equal_left(split_interval, fixed_interval) \
-            and _left_after(fixed_interval, split_interval):
-        if fixed_interval[1] in ('=', '<='):
-            new_interval_list.append((split_interval[0], split_interval[1],
-                                      '<', fixed_interval[0]))
-        else:
-            new_interval_list.append((split_interval[0], split_interval[1],
-                                      '<=', fixed_interval[0]))
-
-    # Get part of 'split_interval' after 'fixed_interval'
-    #  fixed_interval: ----|
-    #  split_interval:  |-----
-    # split_interval':     |--
-    if _right_after_equal_left(fixed_interval, split_interval) \
-            and _right_before(fixed_interval, split_interval):
-        if fixed_interval[2] in ('=', '<='):
-            new_interval_list.append((fixed_interval[3], '<',
-                                      split_interval[2], split_interval[3]))
-        else:
-            new_interval_list.append((fixed_interval[3], '<=',
-                                      split_interval[2], split_interval[3]))
-
-    interval_list = []
-    for interval in new_interval_list:
-        if interval[0] == interval[3]:
-            interval = (interval[0], '=', '=', interval[3])
-        interval_list.append(interval)
-    return interval_list
+    def __init__(self, value_list):
+        # Distinct values
+        self._value_set = set(value_list)
+        # Sorted positions of values (None for values not sortable)
+        try:
+            self._position_list = sorted([(_value_position(value), 0)
+                                          for value in self._value_set])
+        except TypeError:
+            self._position_list = None
+
+    def __len__(self):
+        return len(self._value_set)
+
+    def contains_any(self, interval):
+        '''
+        Check if 'interval' contains any indexed value
+        (always True for values not sortable)
+        '''
+        if self._position_list is None:
+            return True
+        if interval.get_kind() == DIFFERENT_KIND:
+            return len(self._value_set) > 1 or \
+                (len(self._value_set) == 1 and
+                 interval.get_low() not in self._value_set)
+        # First value after left limit must be before right limit
+        try:
+            index = bisect_left(self._position_list,
+                                _get_low_position(interval))
+            return index < len(self._position_list) and \
+                (self._position_list[index][0], 1) <= \
+                _get_high_position(interval)
+        except TypeError:
+            return True
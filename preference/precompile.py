@@ -0,0 +1,53 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module to precompile a directory of preference files
+
+Usage: precompile.py <directory> [<pattern>]
+Every preference file (default pattern '*.txt') gets a compiled theory
+artifact with the same name and extension '.cpt'.
+Artifacts up to date with their preference files are not compiled again
+'''
+
+import glob
+import os
+import sys
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+
+if __name__ == '__main__':
+    from preference.artifact import ArtifactError, get_artifact_file_name, \
+        load_compiled_theory, save_compiled_theory
+    from preference.compiled import compile_cptheory
+    from preference.theory import build_cptheory
+    if len(sys.argv) not in [2, 3]:
+        print(__doc__)
+        exit(0)
+    PATTERN = '*.txt'
+    if len(sys.argv) == 3:
+        PATTERN = sys.argv[2]
+    for pref_file_name in sorted(glob.glob(os.path.join(sys.argv[1],
+                                                        PATTERN))):
+        ARTIFACT_FILE_NAME = get_artifact_file_name(pref_file_name)
+        with open(pref_file_name) as pref_file:
+            PREF_TEXT = pref_file.read()
+        if os.path.exists(ARTIFACT_FILE_NAME):
+            try:
+                load_compiled_theory(ARTIFACT_FILE_NAME, PREF_TEXT)
+                print('up to date: ' + ARTIFACT_FILE_NAME)
+                continue
+            except ArtifactError:
+                pass
+        try:
+            COMPILED = compile_cptheory(build_cptheory(PREF_TEXT))
+        except Exception as exception:  # IGNORE:broad-except
+            print('error: ' + pref_file_name + ': ' + str(exception))
+            continue
+        save_compiled_theory(COMPILED, PREF_TEXT, ARTIFACT_FILE_NAME)
+        STATUS = 'compiled: '
+        if not COMPILED.is_consistent():
+            STATUS = 'compiled (inconsistent): '
+        print(STATUS + ARTIFACT_FILE_NAME)
@@ -3,9 +3,11 @@
 Module to manipulate conditional preference rules (cp-rules)
 '''
 
-from grammar.symbols import IF_SYM, THEN_SYM
+from types import MappingProxyType
+
+from preference.symbols import IF_SYM, THEN_SYM
 from preference.interval import get_str_predicate, intersect, \
-    split_neq_interval, split_interval
+    split_neq_interval, split_interval, split_elementary_interval
 
 
 class CPCondition(object):
@@ -40,6 +42,15 @@ class CPCondition(object):
 
         return copy_cond
 
+    def freeze(self):
+        '''
+        Create a frozen copy (its condition dictionary can not be changed)
+        '''
+        frozen_cond = self.copy()
+        frozen_cond._condition_dict = MappingProxyType(
+            frozen_cond._condition_dict)
+        return frozen_cond
+
     def get_condition_dict(self):
         '''
         Get condition dictionary
@@ -88,6 +99,9 @@ class CPPreference(object):
     '''
     Class to represent rule preference
     '''
+    # Frozen preferences can not be changed
+    _frozen = False
+
     def __init__(self, parsed_best, parsed_worst, indifferent_list):
         '''
         Initialize rule by a ParsedRule
@@ -112,7 +126,8 @@ class CPPreference(object):
         pref_str = get_str_predicate(self._attribute, self._best_interval)
         pref_str += ' BETTER THAN ' + \
             get_str_predicate(self._attribute, self._worst_interval)
-        indiff_str_list = [str(att) for att in self._indifferent_attribute_set]
+        indiff_str_list = [str(att) for att in
+                           sorted(self._indifferent_attribute_set)]
         pref_str += '[' + ', '.join(indiff_str_list) + ']'
         return pref_str
 
@@ -144,20 +159,30 @@ class CPPreference(object):
         '''
         Get preferred value for preference attribute
         '''
+        self._check_not_frozen()
         self._best_interval = interval
 
     def set_worst_interval(self, interval):
         '''
         Get non preferred value for preference attribute
         '''
+        self._check_not_frozen()
         self._worst_interval = interval
 
     def set_indifferent_set(self, ind_set):
         '''
         Get indifferent attribute set
         '''
+        self._check_not_frozen()
         self._indifferent_attribute_set = ind_set
 
+    def _check_not_frozen(self):
+        '''
+        Raise an error if preference is frozen
+        '''
+        if self._frozen:
+            raise AttributeError('frozen preference can not be changed')
+
     def is_best_satisfied_by(self, record):
         '''
         Check if a record satisfies the best interval
@@ -178,8 +203,21 @@ class CPPreference(object):
         '''
         copy_pref = CPPreference(None, None, None)
         copy_pref.__dict__.update(self.__dict__)
+        copy_pref._frozen = False
+        copy_pref._indifferent_attribute_set = \
+            set(self._indifferent_attribute_set)
         return copy_pref
 
+    def freeze(self):
+        '''
+        Create a frozen copy (it can not be changed)
+        '''
+        frozen_pref = self.copy()
+        frozen_pref._indifferent_attribute_set = \
+            frozenset(frozen_pref._indifferent_attribute_set)
+        frozen_pref._frozen = True
+        return frozen_pref
+
 
 class CPRule(object):
     '''
@@ -247,11 +285,22 @@ class CPRule(object):
         '''
         copy_rule = CPRule(None)
         copy_rule.__dict__.update(self.__dict__)
-        if self._condition:
+        if self._condition is not None:
             copy_rule._condition = self._condition.copy()
         copy_rule._preference = self._preference.copy()
         return copy_rule
 
+    def freeze(self):
+        '''
+        Create a frozen copy (its condition and preference can not be
+        changed), copies of a frozen rule are not frozen
+        '''
+        frozen_rule = CPRule(None)
+        if self._condition is not None:
+            frozen_rule._condition = self._condition.freeze()
+        frozen_rule._preference = self._preference.freeze()
+        return frozen_rule
+
     def change_record(self, record):
         '''
         Generate a worst record when it is possible,
@@ -404,6 +453,63 @@ class CPRule(object):
 
         return new_rules_list
 
+    def get_interval_list(self):
+        '''
+        Get (attribute, interval) pairs of conditions and preference
+        '''
+        interval_list = []
+        if self._condition:
+            interval_list += self._condition.get_condition_dict().items()
+        pref = self._preference
+        interval_list.append((pref.get_preference_attribute(),
+                              pref.get_best_interval()))
+        interval_list.append((pref.get_preference_attribute(),
+                              pref.get_worst_interval()))
+        return interval_list
+
+    def split_elementary_rule(self, limits_dict):
+        """
+        Split 'self' over the first interval that covers more than one
+        elementary interval ('limits_dict' has the elementary limits
+        of each attribute)
+        """
+        new_rules_list = []
+        # Try split on condition intervals of 'self'
+        if self.get_condition():
+            condition_dict = self.get_condition().get_condition_dict()
+            for att in condition_dict:
+                new_intervals = \
+                    split_elementary_interval(condition_dict[att],
+                                              limits_dict[att])
+                for interval in new_intervals:
+                    new_rule = self.copy()
+                    new_rule.get_condition().get_condition_dict()[att] = \
+                        interval
+                    new_rules_list.append(new_rule)
+                if new_rules_list:
+                    return new_rules_list
+
+        # Try split on preferred interval of 'self'
+        pref = self.get_preference()
+        limits = limits_dict[pref.get_preference_attribute()]
+        new_intervals = \
+            split_elementary_interval(pref.get_best_interval(), limits)
+        for interval in new_intervals:
+            new_rule = self.copy()
+            new_rule.get_preference().set_best_interval(interval)
+            new_rules_list.append(new_rule)
+        if new_rules_list:
+            return new_rules_list
+
+        # Try split on not preferred interval of 'self'
+        new_intervals = \
+            split_elementary_interval(pref.get_worst_interval(), limits)
+        for interval in new_intervals:
+            new_rule = self.copy()
+            new_rule.get_preference().set_worst_interval(interval)
+            new_rules_list.append(new_rule)
+        return new_rules_list
+
     def split_rule(self, rule):
         """
         Split 'self' if there is attribute with intervals that
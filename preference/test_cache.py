@@ -0,0 +1,42 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+'''
+Module for compiled theory cache testing
+
+Theories differing only in value types (as a = '1' and a = 1) must have
+different cache entries, each one must select the best records of records
+with values of its type
+'''
+
+import os
+import sys
+
+# Required to relative package imports
+PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
+
+# Theories with same values of different types
+STR_THEORY = "(a = '1') > (a = '2')"
+INT_THEORY = '(a = 1) > (a = 2)'
+
+
+if __name__ == '__main__':
+    from preference.compiled import TheoryCache
+    from algorithms.partition import partition_best
+    CACHE = TheoryCache()
+    ERROR_NUMBER = 0
+    for PREF_TEXT, VALUE_TYPE in [(STR_THEORY, str), (INT_THEORY, int),
+                                  (STR_THEORY, str), (INT_THEORY, int)]:
+        THEORY = CACHE.get(PREF_TEXT)
+        REC_LIST = [{'a': VALUE_TYPE(2)}, {'a': VALUE_TYPE(1)}]
+        BEST_LIST = partition_best(THEORY, REC_LIST)
+        print(PREF_TEXT, BEST_LIST)
+        if BEST_LIST != [{'a': VALUE_TYPE(1)}]:
+            ERROR_NUMBER += 1
+            print('wrong best records: ' + PREF_TEXT)
+    print(CACHE.get_stats())
+    if CACHE.get_stats()['size'] != 2:
+        ERROR_NUMBER += 1
+        print('theories must have different cache entries')
+    if ERROR_NUMBER:
+        exit(1)
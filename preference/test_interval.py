@@ -14,7 +14,8 @@ sys.path.append(os.path.realpath(os.path.join(PATH, '..')))
 
 
 if __name__ == '__main__':
-    from preference.interval import intersect, get_str_predicate
+    from preference.interval import intersect, get_str_predicate, \
+        to_interval
     # Interval list
     INTERV_LIST = []
     # Value list
@@ -27,7 +28,7 @@ if __name__ == '__main__':
     for VAL in VAL_LIST:
         for OP in EQUAL_OP_LIST:
             INTERV = (VAL, OP, OP, VAL)
-            INTERV_LIST.append(INTERV)
+            INTERV_LIST.append(to_interval(INTERV))
     # Generate intervals comparisons
     for VAL1 in VAL_LIST:
         for OP1 in INTERV_OP_LIST:
@@ -35,15 +36,16 @@ if __name__ == '__main__':
                 for VAL2 in VAL_LIST:
                     if VAL1 < VAL2:
                         INTERV = (VAL1, OP1, OP2, VAL2)
-                        INTERV_LIST.append(INTERV)
+                        INTERV_LIST.append(to_interval(INTERV))
     # Generate intervals having infinity limits
     for VAL in VAL_LIST:
         for OP in INTERV_OP_LIST:
             INTERV = (VAL, OP, '<=', float('inf'))
-            INTERV_LIST.append(INTERV)
+            INTERV_LIST.append(to_interval(INTERV))
             INTERV = (float('-inf'), '<=', OP, VAL)
-            INTERV_LIST.append(INTERV)
-    INTERV_LIST.append((float('-inf'), '<=', '<=', float('inf')))
+            INTERV_LIST.append(to_interval(INTERV))
+    INTERV = (float('-inf'), '<=', '<=', float('inf'))
+    INTERV_LIST.append(to_interval(INTERV))
     # Print intersection (overlap) for each pair of intervals
     for INTERV1 in INTERV_LIST:
         for INTERV2 in INTERV_LIST:
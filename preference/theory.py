@@ -4,10 +4,11 @@
 Module to manipulate conditional preference theories (cp-theories)
 '''
 
-from preference.comparison import build_comparison, Comparison
-from preference.interval import intersect
+from itertools import combinations
+
+from preference.comparison import Comparison
+from preference.interval import intersect, get_elementary_limits
 from preference.rule import CPRule
-from grammar.theory_grammar import TheoryGrammar
 from preference.graph import Graph
 
 
@@ -20,8 +21,28 @@ class CPTheory(object):
     def __init__(self, rule_list):
         # List of rules
         self._rule_list = rule_list
+        # List of original (not split) rules
+        self._source_rule_list = list(rule_list)
+        # List of split rules of each original rule
+        self._split_list = None
+        # Elementary interval limits by attribute (None before split)
+        self._limits_dict = None
+        # Local consistency of compatible sets by preference attribute
+        self._consistency_dict = {}
+        # Preference attributes whose compatible sets must be rechecked
+        self._changed_attribute_set = set()
+        # Attributes touched by rules added or removed since last
+        # comparisons build
+        self._touched_attribute_set = set()
         # List of formulas (used by partition method)
         self._formula_list = []
+        # Formulas by key (set of attribute and interval pairs)
+        self._formula_dict = {}
+        # Direct comparisons by pair of formula keys
+        # (None before comparisons build)
+        self._direct_dict = None
+        # Transitive closure of direct comparisons by graph component
+        self._closure_dict = {}
         # List of maximal formulas (used by maxpref method)
         self._max_formula_list = []
         # List of comparisons (used by partition method)
@@ -87,10 +108,20 @@ class CPTheory(object):
         rules_list = []
         for rule in self._rule_list:
             # separate rules on the same attribute
-            if rule.get_preference_attribute() == attribute:
+            if rule.get_preference().get_preference_attribute() == attribute:
                 rules_list.append(rule)
         return rules_list
 
+    def _get_rule_ids_by_attribute(self):
+        '''
+        Get a dictionary of rule indexes by preference attribute
+        '''
+        rule_id_dict = {}
+        for rule_id, rule in enumerate(self._rule_list):
+            att = rule.get_preference().get_preference_attribute()
+            rule_id_dict.setdefault(att, []).append(rule_id)
+        return rule_id_dict
+
     def _is_local_consistent_rule_rewriting(self):
         '''
         Check if theory is local consistent
@@ -98,18 +129,51 @@ class CPTheory(object):
 
         A theory is local inconsistent if there are a set of compatible rules
         such that an interval is preferred than itself
-        '''
-        # build sets of compatible rules
-        for rule_set in self._get_compatible_sets():
-            # build graph with rule sets
-            rule_list = [self._rule_list[index] for index in rule_set]
-            graph = _build_interval_graph(rule_list)
 
-            # verify that there are no cycles on the graph created
-            if not graph.is_acyclic():
+        Rules over different attributes are never compatible,
+        so every preference attribute is checked independently.
+        The compatible sets of attributes not changed by add_rule and
+        remove_rule since last check are not checked again
+        '''
+        rule_id_dict = self._get_rule_ids_by_attribute()
+        for att in list(self._consistency_dict):
+            if att not in rule_id_dict:
+                del self._consistency_dict[att]
+        for att in rule_id_dict:
+            if att in self._changed_attribute_set \
+                    or att not in self._consistency_dict:
+                self._consistency_dict[att] = \
+                    self._check_attribute_local_consistency(
+                        rule_id_dict[att], self._consistency_dict.get(att, {}))
+                self._changed_attribute_set.discard(att)
+            if not all(self._consistency_dict[att].values()):
                 return False
         return True
 
+    def _check_attribute_local_consistency(self, rule_id_list, checked_dict):
+        '''
+        Check local consistency of the rules over a preference attribute
+
+        Return a dictionary of compatible sets (as sets of rules)
+        to their consistency, stopping at first inconsistent set.
+        Sets already in 'checked_dict' are not checked again
+        '''
+        consistency_dict = {}
+        # build sets of compatible rules
+        for rule_set in self._get_attribute_compatible_sets(rule_id_list):
+            rule_list = [self._rule_list[index] for index in rule_set]
+            key = frozenset(rule_list)
+            if key in checked_dict:
+                consistency_dict[key] = checked_dict[key]
+            else:
+                # build graph with rule sets and
+                # verify that there are no cycles on the graph created
+                graph = _build_interval_graph(rule_list)
+                consistency_dict[key] = graph.is_acyclic()
+            if not consistency_dict[key]:
+                break
+        return consistency_dict
+
     def _is_local_consistent(self):
         '''
         Check if theory is local consistent
@@ -131,12 +195,19 @@ class CPTheory(object):
     def build_formulas(self):
         '''
         Generate a list of formulas combining all intervals of attributes
+
+        Formulas are always generated from current rules, so the list
+        after add_rule or remove_rule is the same of a new theory
         '''
+        self._formula_list = []
+        self._formula_dict = {}
         # Get atomic formulas in all rules
         atomic_formula_list = []
         for rule in self._rule_list:
             for formula in rule.get_atomic_formulas_list():
-                if formula not in self._formula_list:
+                key = _get_formula_key(formula)
+                if key not in self._formula_dict:
+                    self._formula_dict[key] = formula
                     self._formula_list.append(formula)
                     atomic_formula_list.append(formula)
         # Combined formulas
@@ -147,83 +218,125 @@ class CPTheory(object):
                 if att not in formula:
                     formula_copy = formula.copy()
                     formula_copy[att] = atomic[att]
-                    if formula_copy not in self._formula_list \
-                            and formula_copy not in new_formula_list:
+                    key = _get_formula_key(formula_copy)
+                    if key not in self._formula_dict:
+                        self._formula_dict[key] = formula_copy
                         new_formula_list.append(formula_copy)
             self._formula_list += new_formula_list
 
     def _clean_comparisons(self):
         '''
         Remove not essential comparisons
-        '''
-        # Copy comparison list
-        initial_list = self._comparison_list[:]
+
+        A comparison is more generic than another one only if its formulas
+        are subformulas of the formulas of the other one,
+        so comparisons are indexed by their formulas
+        '''
+        # Formula keys by formula identity
+        formula_key_dict = {}
+        for key, formula in self._formula_dict.items():
+            formula_key_dict[id(formula)] = key
+        pair_dict = {}
+        key_list = []
+        for comp in self._comparison_list:
+            key_pair = \
+                (formula_key_dict[id(comp.get_preferred_formula())],
+                 formula_key_dict[id(comp.get_notpreferred_formula())])
+            pair_dict.setdefault(key_pair, []).append(comp)
+            key_list.append(key_pair)
+        # Subformula keys by formula key
+        subkey_dict = {}
         # List of essential comparisons
         essential_list = []
-        # Run while there is comparisons to process
-        while initial_list:
-            # Take one comparison
-            comp = initial_list.pop()
-            # Suppose comparison is essential
-            essential = True
-            # Check all another comparisons
-            for other_comp in initial_list + essential_list:
-                # Check if other comparison is more generic
-                if other_comp.is_more_generic_than(comp):
-                    # So, comparison is not essential
-                    essential = False
-                    break
-            # If no one is more generic, comparison is essential
-            if essential:
+        for comp, key_pair in zip(self._comparison_list, key_list):
+            if not _has_more_generic_comparison(
+                    comp, _get_subpair_list(key_pair, pair_dict, subkey_dict),
+                    pair_dict):
                 essential_list.append(comp)
         self._comparison_list = essential_list
 
     def build_comparisons(self):
         '''
         Generate comparisons from formulas
-        '''
 
-        # Generate direct comparisons
-        comp_dict = {}
-        for idx1, formula1 in enumerate(self._formula_list):
-            comp_dict[idx1] = {}
-            for idx2, formula2 in enumerate(self._formula_list):
-                tmp_set = set()
-                if idx1 != idx2:
-                    for rule in self._rule_list:
-                        # Check if formula1 dominates formula2
-                        if rule.dominates(formula1, formula2):
-                            # Screen for intersections
-                            att = \
-                                rule.get_preference()\
-                                .get_preference_attribute()
-                            if not intersect(formula1[att], formula2[att]):
-                                comp = \
-                                    build_comparison(formula1, formula2, rule)
-                                tmp_set.add(comp)
-                comp_dict[idx1][idx2] = tmp_set
-        self._build_transitive_comparisons(comp_dict)
-
-    def _build_transitive_comparisons(self, comp_dict):
+        Direct comparisons are kept by pair of formulas, so after add_rule
+        or remove_rule only the ones over formulas with touched attributes
+        are generated again
+        '''
+        if self._direct_dict is None:
+            self._direct_dict = {}
+            touched_set = None
+        else:
+            touched_set = self._touched_attribute_set
+            # Remove comparisons over old or touched formulas
+            for key1, key2 in list(self._direct_dict):
+                if key1 not in self._formula_dict \
+                        or key2 not in self._formula_dict \
+                        or _is_touched_key(key1, touched_set) \
+                        or _is_touched_key(key2, touched_set):
+                    del self._direct_dict[(key1, key2)]
+        self._add_direct_comparisons(touched_set)
+        self._touched_attribute_set = set()
+        self._build_transitive_comparisons()
+
+    def _add_direct_comparisons(self, touched_set):
+        '''
+        Add direct comparisons between formulas
+
+        If 'touched_set' is not None, only pairs of formulas with some of
+        its attributes are compared
+        '''
+        formula_item_list = list(self._formula_dict.items())
+        for rule in self._rule_list:
+            att = rule.get_preference().get_preference_attribute()
+            indiff_set = frozenset([att]).union(
+                rule.get_preference().get_indifferent_set())
+            for best_list, worst_list in \
+                    _group_formulas_by_rule(rule, formula_item_list):
+                for key1 in best_list:
+                    touched1 = touched_set is None \
+                        or _is_touched_key(key1, touched_set)
+                    for key2 in worst_list:
+                        if key1 == key2 or not (
+                                touched1
+                                or _is_touched_key(key2, touched_set)):
+                            continue
+                        # Screen for intersections
+                        if not intersect(self._formula_dict[key1][att],
+                                         self._formula_dict[key2][att]):
+                            self._direct_dict.setdefault(
+                                (key1, key2), set()).add(indiff_set)
+
+    def _build_transitive_comparisons(self):
         '''
         Generate transitive comparisons (Floyd-Warshall Algorithm)
+
+        The algorithm runs over each component of the graph of direct
+        comparisons. Closure of components not changed since last build
+        are reused
         '''
-        # Generate transitive
-        for k in range(len(self._formula_list)):
-            for i in range(len(self._formula_list)):
-                for j in range(len(self._formula_list)):
-                    ik_set = comp_dict[i][k]
-                    kj_set = comp_dict[k][j]
-                    if ik_set and kj_set:
-                        comp_set = _combine_transitive(ik_set, kj_set)
-                        comp_set = comp_set.union(comp_dict[i][j])
-                        comp_dict[i][j] = comp_set
+        closure_dict = {}
         self._comparison_list = []
-        for i in range(len(self._formula_list)):
-            for j in range(len(self._formula_list)):
-                self._comparison_list += list(comp_dict[i][j])
+        for component_dict in _get_component_list(self._direct_dict):
+            component = frozenset([(pair, frozenset(component_dict[pair]))
+                                   for pair in component_dict])
+            if component in self._closure_dict:
+                transitive_dict = self._closure_dict[component]
+            else:
+                transitive_dict = _get_transitive_closure(component_dict)
+            closure_dict[component] = transitive_dict
+            for key1, key2 in transitive_dict:
+                for indiff_set in transitive_dict[(key1, key2)]:
+                    comp = Comparison(self._formula_dict[key1],
+                                      self._formula_dict[key2],
+                                      set(indiff_set))
+                    self._comparison_list.append(comp)
+        self._closure_dict = closure_dict
         # Remove non essential comparisons
         self._clean_comparisons()
+        # Sort by string first, so the order does not depend on
+        # the order comparisons were built
+        self._comparison_list.sort(key=str)
         self._comparison_list.sort()
 
     def dominates(self, record1, record2):
@@ -242,47 +355,40 @@ class CPTheory(object):
         Two CPRules are compatibles if they have the same preference attribute
         and their conditions are compatibles
         '''
-        # Initial list of sets (one rule per set)
-        set_list = [set([rule_id]) for rule_id in range(len(self._rule_list))]
-        change = True
-        # Suppose no changes
-        while change:
-            change = False
-            # New list of combined sets
-            new_set_list = []
-            for rule_set in set_list:
-                # Suppose no combination
-                combined = False
-                # For each rules
-                for rule_id in range(len(self._rule_list)):
-                    # Check if rule is compatible with set
-                    # and rule not in this set
-                    if self._is_cprule_compatible_to_list(rule_id, rule_set) \
-                            and rule_id not in rule_set:
-                        combined = True
-                        # Create new set and add this rule
-                        new_set = rule_set.copy()
-                        new_set.add(rule_id)
-                        # Check if set does not exists
-                        if new_set not in new_set_list:
-                            change = True
-                            new_set_list.append(new_set)
-                # if there was not combinations consider original set
-                if not combined:
-                    new_set_list.append(rule_set)
-            set_list = new_set_list
+        set_list = []
+        rule_id_dict = self._get_rule_ids_by_attribute()
+        for att in rule_id_dict:
+            set_list += self._get_attribute_compatible_sets(rule_id_dict[att])
         return set_list
 
-    def _is_cprule_compatible_to_list(self, rule_id, rule_id_list):
+    def _get_attribute_compatible_sets(self, rule_id_list):
         '''
-        Check if a cp-rule is compatible to every other cp-rule in a list
+        Get the maximal sets of compatible rules over a preference attribute
+        (maximal cliques of compatibility graph by Bron-Kerbosch algorithm)
         '''
-        cprule = self._rule_list[rule_id]
-        for other_id in rule_id_list:
-            other = self._rule_list[other_id]
-            if not cprule.is_compatible_to(other):
-                return False
-        return True
+        # Compatible rules of each rule
+        adjacency_dict = {}
+        for rule_id in rule_id_list:
+            adjacency_dict[rule_id] = set()
+        for index, rule_id in enumerate(rule_id_list):
+            cprule = self._rule_list[rule_id]
+            for other_id in rule_id_list[index + 1:]:
+                if cprule.is_compatible_to(self._rule_list[other_id]):
+                    adjacency_dict[rule_id].add(other_id)
+                    adjacency_dict[other_id].add(rule_id)
+        return _get_maximal_cliques(adjacency_dict)
+
+    def get_rule_list(self):
+        '''
+        Return the rule list
+        '''
+        return self._rule_list
+
+    def get_formula_list(self):
+        '''
+        Return the formula list
+        '''
+        return self._formula_list
 
     def get_comparison_list(self):
         '''
@@ -320,12 +426,14 @@ class CPTheory(object):
         Build HFG graph from max formulas
         '''
         graph = Graph()
+        formula_item_list = list(enumerate(formulas))
 
         # build BTG graph with the formulas
-        for index1, formula1 in enumerate(formulas):
-            for index2, formula2 in enumerate(formulas):
-                for rule in self._rule_list:
-                    if rule.dominates(formula1, formula2):
+        for rule in self._rule_list:
+            for best_list, worst_list in \
+                    _group_formulas_by_rule(rule, formula_item_list):
+                for index1 in best_list:
+                    for index2 in worst_list:
                         graph.add_edge(index1, index2)
 
         return graph
@@ -372,6 +480,22 @@ class CPTheory(object):
 
         return sorted_list
 
+    def get_max_formula_levels(self):
+        '''
+        Get the levels of max formulas by topological sorting of HFG graph
+
+        Return a list of sets of max formula indexes
+        (formulas must be built)
+        '''
+        self._build_max_formulas()
+        max_formula_list = self.get_max_formulas()
+        graph = self.build_hfg(max_formula_list)
+        # Formulas not compared are in first level
+        for index in range(len(max_formula_list)):
+            graph.add_edge(index, None)
+        level_list, _ = graph.get_topological_levels()
+        return level_list
+
     def split_rules(self):
         """
         Searches for rules with intersection in intervals.
@@ -381,58 +505,149 @@ class CPTheory(object):
             - Two intersected intervals: (1 < A < 9) and (2 < A < 10)
             - Three three new intervals: (1 < A <= 2) and (2 < A < 9)
         The original number of rules can be increased
+
+        The limits of all intervals over an attribute are swept once
+        to get the elementary intervals of the attribute,
+        then every rule is rewritten over them in a single worklist pass
         """
+        self._limits_dict = \
+            _get_elementary_limits_dict(self._source_rule_list)
+        self._split_list = [self._split_rule(rule)
+                            for rule in self._source_rule_list]
+        self._update_rule_list()
 
-        # first break neq intervals
-        while True:
-            # List of new rules
-            new_rules_list = []
-            # Get a rule
-            for rule in self._rule_list:
-                # 'new_rules_list' is rules originated by
-                # 'rule' with split in neq intervals
-                new_rules_list = rule.split_neq_rule()
-
-                # Check if there was split in 'rule' intervals
-                # Restart iteration
-                if new_rules_list:
-                    # Remove original rule
-                    self._rule_list.remove(rule)
-                    break
-
-            # Check if there was split in intervals
+    def _split_rule(self, rule):
+        """
+        Split a rule over the elementary intervals of its attributes
+        """
+        split_list = []
+        # Rules waiting to be split (stack in original order)
+        waiting_list = [rule]
+        while waiting_list:
+            rule = waiting_list.pop()
+            # 'new_rules_list' is rules originated by 'rule'
+            # with split over one of its intervals
+            new_rules_list = rule.split_elementary_rule(self._limits_dict)
             if new_rules_list:
-                # Add new rules
-                self._rule_list += new_rules_list
+                waiting_list += new_rules_list[::-1]
             else:
-                # Stop, when there wasn't split
-                break
+                # Rule has only elementary intervals
+                split_list.append(rule)
+        return split_list
 
-        # split rules where intersections happen
-        while True:
-            # List of new rules
-            new_rules_list = []
-            # Get pair of rules
-            for cpr1 in self._rule_list:
-                for cpr2 in self._rule_list:
-                    # 'new_rules_list' is rules originated by
-                    # 'cpr1' with split in intervals by 'cpr2'
-                    new_rules_list = cpr1.split_rule(cpr2)
-                    # Check if there was split in 'cpr1' intervals
-                    if new_rules_list:
-                        # Remove original rule
-                        self._rule_list.remove(cpr1)
-                        break
-                # Restart iteration
-                if new_rules_list:
-                    break
-            # Check if there was split in intervals
-            if new_rules_list:
-                # Add new rules
-                self._rule_list += new_rules_list
-            else:
-                # Stop, when there wasn't split
-                break
+    def _update_rule_list(self):
+        """
+        Join the split rules of all original rules
+        """
+        self._rule_list = [rule
+                           for split_list in self._split_list
+                           for rule in split_list]
+
+    def add_rule(self, rule):
+        """
+        Add a rule to theory
+
+        If theory was split, only rules over attributes whose elementary
+        intervals were changed by the new rule are split again.
+        Next calls of is_consistent and build_comparisons check and compare
+        only what was touched by added and removed rules
+        """
+        self._source_rule_list.append(rule)
+        if self._split_list is not None:
+            self._split_list.append(None)
+        self._update_rules(rule)
+
+    def remove_rule(self, rule):
+        """
+        Remove a rule from theory (see add_rule)
+
+        Raise ValueError if rule is not in theory
+        """
+        index = self._source_rule_list.index(rule)
+        del self._source_rule_list[index]
+        if self._split_list is not None:
+            del self._split_list[index]
+        self._update_rules(rule)
+
+    def _update_rules(self, changed_rule):
+        """
+        Update rules after a rule was added or removed
+        """
+        att_set = set([att for att, _ in changed_rule.get_interval_list()])
+        self._touched_attribute_set.update(att_set)
+        self._changed_attribute_set.add(
+            changed_rule.get_preference().get_preference_attribute())
+        if self._split_list is None:
+            self._rule_list = list(self._source_rule_list)
+            return
+        # Update limits of the attributes of changed rule
+        limits_dict = \
+            _get_elementary_limits_dict(self._source_rule_list, att_set)
+        changed_set = set()
+        for att in att_set:
+            if limits_dict.get(att) != self._limits_dict.get(att):
+                changed_set.add(att)
+            if att in limits_dict:
+                self._limits_dict[att] = limits_dict[att]
+            elif att in self._limits_dict:
+                del self._limits_dict[att]
+        # Split again new rules and rules over changed attributes
+        for index, rule in enumerate(self._source_rule_list):
+            if self._split_list[index] is None \
+                    or any([att in changed_set
+                            for att, _ in rule.get_interval_list()]):
+                self._split_list[index] = self._split_rule(rule)
+                self._changed_attribute_set.add(
+                    rule.get_preference().get_preference_attribute())
+        self._update_rule_list()
+
+
+def _get_elementary_limits_dict(rule_list, att_set=None):
+    '''
+    Get the elementary interval limits of every attribute in a rule list
+    (or only of attributes in 'att_set')
+    '''
+    interval_dict = {}
+    for rule in rule_list:
+        for att, interval in rule.get_interval_list():
+            if att_set is None or att in att_set:
+                interval_dict.setdefault(att, []).append(interval)
+    limits_dict = {}
+    for att in interval_dict:
+        limits_dict[att] = get_elementary_limits(interval_dict[att])
+    return limits_dict
+
+
+def _group_formulas_by_rule(rule, formula_item_list):
+    '''
+    Group formulas that can be compared by a rule
+
+    'formula_item_list' is a list of pairs (id, formula).
+    Formulas satisfying rule conditions are grouped by the intervals of
+    attributes which are not preference or indifferent attributes of the
+    rule, since only formulas in the same group can be compared by it.
+    Return a list of pairs (best ids, worst ids) with the ids of formulas
+    satisfying rule best and worst intervals in each group
+    '''
+    pref = rule.get_preference()
+    cond = rule.get_condition()
+    att = pref.get_preference_attribute()
+    indiff_set = set([att]).union(pref.get_indifferent_set())
+    group_dict = {}
+    for formula_id, formula in formula_item_list:
+        # Check if formula satisfies rule conditions
+        if att not in formula \
+                or (cond and not cond.is_satisfied_by(formula)):
+            continue
+        group = frozenset([(other_att, formula[other_att])
+                           for other_att in formula
+                           if other_att not in indiff_set])
+        best_list, worst_list = group_dict.setdefault(group, ([], []))
+        if pref.is_best_satisfied_by(formula):
+            best_list.append(formula_id)
+        if pref.is_worst_satisfied_by(formula):
+            worst_list.append(formula_id)
+    return list(group_dict.values())
 
 
 def _build_interval_graph(rule_list):
@@ -451,6 +666,36 @@ def _build_interval_graph(rule_list):
     return graph
 
 
+def _get_maximal_cliques(adjacency_dict):
+    '''
+    Get the maximal cliques of a graph
+    (Bron-Kerbosch algorithm with pivoting, using a stack of calls)
+
+    Each call has the clique R, the candidates P and the excluded X
+    '''
+    clique_list = []
+    call_list = [(set(), set(adjacency_dict), set())]
+    while call_list:
+        clique, candidate_set, excluded_set = call_list.pop()
+        if not candidate_set:
+            # Clique can not be extended
+            if clique and not excluded_set:
+                clique_list.append(clique)
+            continue
+        # Pivot with most neighbors in candidates
+        pivot = max(candidate_set | excluded_set,
+                    key=lambda vertex:
+                    len(adjacency_dict[vertex] & candidate_set))
+        for vertex in list(candidate_set - adjacency_dict[pivot]):
+            neighbor_set = adjacency_dict[vertex]
+            call_list.append((clique | set([vertex]),
+                              candidate_set & neighbor_set,
+                              excluded_set & neighbor_set))
+            candidate_set = candidate_set - set([vertex])
+            excluded_set = excluded_set | set([vertex])
+    return clique_list
+
+
 def is_goal_record(curren_record, goal_record):
     '''
     Check if first record reaches goal record
@@ -468,23 +713,132 @@ def is_goal_record(curren_record, goal_record):
     return True
 
 
-def _combine_transitive(set1, set2):
+def _get_formula_key(formula):
+    '''
+    Get a hashable key of a formula (set of attribute and interval pairs)
+    '''
+    return frozenset(formula.items())
+
+
+def _is_touched_key(formula_key, att_set):
+    '''
+    Check if a formula key has some attribute in 'att_set'
+    '''
+    for att, _ in formula_key:
+        if att in att_set:
+            return True
+    return False
+
+
+def _get_subkey_list(formula_key):
+    '''
+    Get the keys of all subformulas of a formula key
+    '''
+    item_list = list(formula_key)
+    subkey_list = []
+    for size in range(len(item_list) + 1):
+        for item_tuple in combinations(item_list, size):
+            subkey_list.append(frozenset(item_tuple))
+    return subkey_list
+
+
+def _get_subpair_list(key_pair, pair_dict, subkey_dict):
     '''
-    Combine two set of transitive comparisons
-    b: f1 > f2[W] and b': f1' > f2'[W'] are transitive if
-    f2 = f1'
-    The combination of then is b'': f1 > f2' [W + W']
+    Get the pairs of formula keys in 'pair_dict' that are pairs of
+    subformulas of 'key_pair'
+
+    Subformulas are enumerated (and stored in 'subkey_dict') only if their
+    pairs are not more than the pairs in 'pair_dict', otherwise each pair
+    in 'pair_dict' is checked, so wide formulas are not enumerated
+    '''
+    best_key, worst_key = key_pair
+    if 2 ** (len(best_key) + len(worst_key)) > len(pair_dict):
+        return [pair for pair in pair_dict
+                if pair[0] <= best_key and pair[1] <= worst_key]
+    for key in key_pair:
+        if key not in subkey_dict:
+            subkey_dict[key] = _get_subkey_list(key)
+    return [(best_subkey, worst_subkey)
+            for best_subkey in subkey_dict[best_key]
+            for worst_subkey in subkey_dict[worst_key]
+            if (best_subkey, worst_subkey) in pair_dict]
+
+
+def _has_more_generic_comparison(comp, pair_list, pair_dict):
     '''
-    result_set = set()
-    for comp1 in set1:
-        for comp2 in set2:
-            indiff_set = comp1.get_indifferent_set()
-            indiff_set = indiff_set.union(comp2.get_indifferent_set())
-            comp = Comparison(comp1.get_preferred_formula(),
-                              comp2.get_notpreferred_formula(),
-                              indiff_set)
-            result_set.add(comp)
-    return result_set
+    Check if some comparison in 'pair_dict' (comparisons by formula keys)
+    with formula keys in 'pair_list' is more generic than 'comp'
+    '''
+    for key_pair in pair_list:
+        for other_comp in pair_dict[key_pair]:
+            if other_comp is not comp \
+                    and other_comp.is_more_generic_than(comp):
+                return True
+    return False
+
+
+def _get_component_list(direct_dict):
+    '''
+    Split direct comparisons (by pair of formula keys) by the connected
+    components of the graph of formulas
+    '''
+    # Union-find over formula keys
+    parent_dict = {}
+
+    def find(key):
+        parent_dict.setdefault(key, key)
+        while parent_dict[key] != key:
+            parent_dict[key] = parent_dict[parent_dict[key]]
+            key = parent_dict[key]
+        return key
+
+    for key1, key2 in direct_dict:
+        root1 = find(key1)
+        root2 = find(key2)
+        if root1 != root2:
+            parent_dict[root1] = root2
+    component_dict = {}
+    for pair in direct_dict:
+        component_dict.setdefault(find(pair[0]), {})[pair] = \
+            direct_dict[pair]
+    return list(component_dict.values())
+
+
+def _get_transitive_closure(direct_dict):
+    '''
+    Generate transitive comparisons of a component (Floyd-Warshall)
+
+    Comparisons between two formulas are represented by their
+    indifferent sets. The combination of b: f1 > f2[W] and b': f2 > f3[W']
+    is b'': f1 > f3[W + W'].
+    Only existing comparisons to and from each formula are combined
+    '''
+    # Comparisons by preferred and not preferred formula keys
+    successor_dict = {}
+    # Preferred formula keys by not preferred formula key
+    predecessor_dict = {}
+    for key1, key2 in direct_dict:
+        successor_dict.setdefault(key1, {})[key2] = \
+            set(direct_dict[(key1, key2)])
+        successor_dict.setdefault(key2, {})
+        predecessor_dict.setdefault(key2, set()).add(key1)
+        predecessor_dict.setdefault(key1, set())
+    for key_k in successor_dict:
+        kj_dict = successor_dict[key_k]
+        for key_i in list(predecessor_dict[key_k]):
+            ik_set = successor_dict[key_i][key_k]
+            ij_dict = successor_dict[key_i]
+            for key_j, kj_set in list(kj_dict.items()):
+                combined_set = set([indiff1.union(indiff2)
+                                    for indiff1 in ik_set
+                                    for indiff2 in kj_set])
+                ij_dict.setdefault(key_j, set()).update(combined_set)
+                predecessor_dict[key_j].add(key_i)
+    closure_dict = {}
+    for key1 in successor_dict:
+        for key2 in successor_dict[key1]:
+            closure_dict[(key1, key2)] = successor_dict[key1][key2]
+    return closure_dict
 
 
 def _dominates_by_search(rule_list, record1, record2):
@@ -511,11 +865,17 @@ def _dominates_by_search(rule_list, record1, record2):
     return False
 
 
-def build_cptheory(preference_text):
+def build_cptheory(preference_text, backend=None):
     '''
     Build a cp-theory from a text
+
+    The parser backend (see grammar.parsers) is the current one when
+    'backend' is None.
+    The grammar is imported here, so theories can be used (and compiled
+    theories loaded) without importing pyparsing
     '''
-    parsed = TheoryGrammar.parse(preference_text)
+    from grammar.parsers import get_theory_grammar
+    parsed = get_theory_grammar(backend).parse(preference_text)
     if parsed is not None:
         rule_list = []
         for parsed_rule in parsed: